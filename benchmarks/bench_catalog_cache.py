@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: cold vs. warm catalog startup
+Scales items.json up (default 100x) in a temp directory and times
+  - plain json.load + build (what generate_json.py used to do every run)
+  - first run with the index (parse + write index)
+  - warm runs that only read the index
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from kenkoku.catalog import load_catalog  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def scale_items(items, factor):
+    """Copy the catalog factor times with fresh ids/keys/names."""
+    scaled = []
+    next_id = 1
+    for n in range(factor):
+        for item in items:
+            row = dict(item)
+            row['id'] = next_id
+            next_id += 1
+            if n:
+                row['key'] = f"{item['key']}_{n}"
+                if item.get('name'):
+                    row['name'] = f"{item['name']}_{n}"
+            scaled.append(row)
+    return scaled
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', default=os.path.join(REPO_ROOT, 'items.json'))
+    parser.add_argument('--scale', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.items, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'items.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(scale_items(items, args.scale), f, ensure_ascii=False)
+        size_mb = os.path.getsize(path) / (1 << 20)
+
+        # Every run resolves a sample of keys/names/rows, like generate_json.py does
+        keys = [row['key'] for row in items[::10]]
+        names = [row['name'] for row in items[::10] if row.get('name')]
+        ids = [row['id'] for row in items[::10]]
+
+        def run(**kwargs):
+            catalog = load_catalog(path, **kwargs)
+            for k in keys:
+                catalog.key_to_id.get(k)
+            for n in names:
+                catalog.name_to_id.get(n)
+            for i in ids:
+                catalog.all_items.get(i)
+            return catalog
+
+        cold = timed(lambda: run(use_cache=False), args.repeat)
+        first = timed(lambda: run(index_path=os.path.join(tmp, 'first.idx')), 1)
+        run()
+        warm = timed(run, args.repeat)
+        catalog = load_catalog(path)
+
+    print(f"catalog: {len(catalog)} items ({args.scale}x, {size_mb:.1f} MB)")
+    print(f"  lookups per run           : {len(keys)} keys, {len(names)} names, {len(ids)} rows")
+    print(f"  cold  (json.load + build) : {cold * 1000:8.1f} ms")
+    print(f"  first (build + write idx) : {first * 1000:8.1f} ms")
+    print(f"  warm  (read index)        : {warm * 1000:8.2f} ms")
+    print(f"  speedup                   : {cold / warm:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: json.load vs. kenkoku.jsonstream on scaled exports
+Writes npcs.json and items.json repeated --scale times (fresh ids) to a temp
+directory. Each reader then runs in its own process, and the numbers are
+that process's peak RSS above its baseline after imports, plus wall time:
+  - json.load:     the whole document as dicts, then walked
+  - stream:        iter_array, each element walked and dropped
+  - stream+list:   load_array, everything kept, but with interned strings
+                   and shared npc_type / biome / profession / item rows
+  - find:          iter_array stopping at an element halfway through
+The walk counts trades (npcs.json) or original items (items.json), so every
+reader touches the same data.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from kenkoku.jsonstream import find, iter_array, load_array  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MODES = ('json.load', 'stream', 'stream+list', 'find')
+
+
+def write_scaled(src, dst, scale):
+    """src's array repeated scale times, ids offset per copy, written one element at a time."""
+    with open(src, 'r', encoding='utf-8') as f:
+        rows = json.load(f)
+    step = max(row['id'] for row in rows)
+    with open(dst, 'w', encoding='utf-8') as out:
+        out.write('[\n')
+        first = True
+        for n in range(scale):
+            for row in rows:
+                row = dict(row, id=row['id'] + n * step)
+                out.write(('' if first else ',\n') + json.dumps(row, ensure_ascii=False, indent=4))
+                first = False
+        out.write('\n]\n')
+    return len(rows) * scale
+
+
+def _walk(element):
+    if 'trades' in element:
+        return len(element['trades'])
+    return 1 if element.get('is_original') else 0
+
+
+def child(mode, path, target_id):
+    """Run one reader; prints {"seconds", "rss_kb", "count"} as JSON."""
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == 'json.load':
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+        count = sum(_walk(row) for row in rows)
+    elif mode == 'stream':
+        count = sum(_walk(row) for row in iter_array(path))
+    elif mode == 'stream+list':
+        rows = load_array(path)
+        count = sum(_walk(row) for row in rows)
+    else:
+        count = 1 if find(path, lambda row: row['id'] == target_id) else 0
+    seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": seconds, "rss_kb": peak - baseline, "count": count}))
+
+
+def measure(mode, path, target_id):
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, path, str(target_id)],
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--npcs', default=os.path.join(REPO_ROOT, 'npcs.json'))
+    parser.add_argument('--items', default=os.path.join(REPO_ROOT, 'items.json'))
+    parser.add_argument('--scales', default='10,100,500', help="comma-separated copies of each file")
+    parser.add_argument('--child', nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        mode, path, target_id = args.child
+        child(mode, path, int(target_id))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for src in (args.npcs, args.items):
+            name = os.path.basename(src)
+            for scale in (int(s) for s in args.scales.split(',')):
+                path = os.path.join(tmp, f'{scale}x_{name}')
+                elements = write_scaled(src, path, scale)
+                # find() targets the first element of the middle copy
+                with open(src, 'r', encoding='utf-8') as f:
+                    rows = json.load(f)
+                target_id = rows[0]['id'] + (scale // 2) * max(row['id'] for row in rows)
+                size_mb = os.path.getsize(path) / (1 << 20)
+                print(f"{name} x{scale}: {elements} elements, {size_mb:.1f} MB")
+                for mode in MODES:
+                    result = measure(mode, path, target_id)
+                    print(f"  {mode:<12} {result['seconds'] * 1000:9.1f} ms  peak RSS +{result['rss_kb'] / 1024:8.1f} MB"
+                          f"  (count {result['count']})")
+                os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: one UPDATE per money action vs. the write-behind ledger
+Replays the same wallet / bill / trade money actions from --clients
+concurrent clients against an SQLite stand-in, three ways:
+  - direct: what the scripts do now, UPDATE player_information SET money =
+    <new balance> per action, each its own transaction
+  - ledger: POST /ops with the delta to kenkoku.ledger over keep-alive HTTP,
+    acknowledged after the journal fsync; the ledger flushes grouped
+    transactions in the background
+  - ledger in-process: Ledger.submit() directly, i.e. the ledger without
+    the HTTP round trip
+Both sides run the database in WAL mode with synchronous=FULL (every commit
+is durable, like innodb_flush_log_at_trx_commit=1) and without
+checkpoints, so the WAL size is the database write volume. Final balances
+are compared.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from kenkoku.ledger import Ledger, sqlite_connector, start_ledger  # noqa: E402
+from kenkoku.sqlexport import connect_sqlite, create_standin  # noqa: E402
+
+START_MONEY = 100_000
+
+# (action, weight, amounts): withdraw from the wallet, deposit a bill, pay / get paid in a trade
+ACTIONS = (
+    ("withdraw", 4, (-1, -10, -100, -1000)),
+    ("deposit", 4, (1, 10, 100, 1000)),
+    ("trade_pay", 2, (-50, -200, -640)),
+    ("trade_reward", 1, (30, 120, 500)),
+)
+
+
+def workload(players, actions, seed):
+    """[(uuid, delta)] in order; a player's actions stay with one client (per-player ordering)."""
+    rng = random.Random(seed)
+    uuids = [f"bench-player-{n:05d}" for n in range(players)]
+    names = [a for a, _, _ in ACTIONS]
+    weights = [w for _, w, _ in ACTIONS]
+    amounts = {a: amts for a, _, amts in ACTIONS}
+    # a few busy traders produce most of the clicks
+    hot = [rng.paretovariate(1.2) for _ in uuids]
+    return [(rng.choices(uuids, hot)[0], rng.choice(amounts[rng.choices(names, weights)[0]]))
+            for _ in range(actions)]
+
+
+def setup(path, players):
+    conn = connect_sqlite(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    create_standin(conn)
+    conn.execute("BEGIN")
+    conn.executemany("INSERT INTO player_information (player_uuid, money) VALUES (?, ?)",
+                     ((f"bench-player-{n:05d}", START_MONEY) for n in range(players)))
+    conn.execute("COMMIT")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def _tune(conn):
+    conn.execute("PRAGMA synchronous = FULL")
+    conn.execute("PRAGMA wal_autocheckpoint = 0")
+    return conn
+
+
+def partition(ops, clients):
+    """Ops per client, keyed by player so each player's order is kept."""
+    shares = [[] for _ in range(clients)]
+    for uuid, delta in ops:
+        shares[hash(uuid) % clients].append((uuid, delta))
+    return shares
+
+
+def run_clients(shares, work):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(share):
+        mine = work(share)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client, args=(share,)) for share in shares]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def bench_direct(path, shares):
+    def work(share):
+        conn = _tune(sqlite3.connect(path, isolation_level=None, timeout=60))
+        balances = {}
+        latencies = []
+        for uuid, delta in share:
+            # the scripts keep the balance in player metadata and write it whole
+            balances[uuid] = balances.get(uuid, START_MONEY) + delta
+            start = time.perf_counter()
+            conn.execute("UPDATE player_information SET money = ? WHERE player_uuid = ?", (balances[uuid], uuid))
+            latencies.append(time.perf_counter() - start)
+        conn.close()
+        return latencies
+
+    wall, latencies = run_clients(shares, work)
+    ops = sum(len(s) for s in shares)
+    return wall, latencies, {"transactions": ops, "row_writes": ops, "journal_bytes": 0}
+
+
+def bench_ledger(path, journal_dir, shares, interval, batch):
+    base = sqlite_connector(path)
+    ledger = Ledger(lambda: _tune(base()), journal_dir, interval=interval, batch=batch).start()
+    server, url = start_ledger(ledger)
+    host, port = url.split("//")[1].split(":")
+
+    def work(share):
+        conn = http.client.HTTPConnection(host, int(port))
+        latencies = []
+        for uuid, delta in share:
+            body = json.dumps({"ops": [{"uuid": uuid, "delta": delta}]})
+            start = time.perf_counter()
+            conn.request("POST", "/ops", body, {"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            latencies.append(time.perf_counter() - start)
+            if response.status != 200:
+                raise RuntimeError(f"ledger answered {response.status}")
+        conn.close()
+        return latencies
+
+    wall, latencies = run_clients(shares, work)
+    server.shutdown()
+    ledger.close()
+    return wall, latencies, _ledger_volume(ledger)
+
+
+def bench_ledger_inprocess(path, journal_dir, shares, interval, batch):
+    base = sqlite_connector(path)
+    ledger = Ledger(lambda: _tune(base()), journal_dir, interval=interval, batch=batch).start()
+
+    def work(share):
+        latencies = []
+        for uuid, delta in share:
+            start = time.perf_counter()
+            ledger.submit([{"uuid": uuid, "delta": delta}])
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    wall, latencies = run_clients(shares, work)
+    ledger.close()
+    return wall, latencies, _ledger_volume(ledger)
+
+
+def _ledger_volume(ledger):
+    stats = ledger.counters()
+    return {"transactions": stats["flushes"], "row_writes": stats["rows"], "journal_bytes": stats["journal_bytes"]}
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def balances(path):
+    conn = sqlite3.connect(path)
+    try:
+        return dict(conn.execute("SELECT player_uuid, money FROM player_information"))
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--players', type=int, default=200)
+    parser.add_argument('--actions', type=int, default=5000)
+    parser.add_argument('--clients', type=int, default=8, help="concurrent clients (server threads firing events)")
+    parser.add_argument('--interval', type=float, default=0.25, help="ledger flush interval")
+    parser.add_argument('--batch', type=int, default=500, help="ledger flush batch")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--dir', help="directory for the databases and journals (default: a temp dir); "
+                                      "put it on the disk MySQL would use")
+    args = parser.parse_args()
+
+    ops = workload(args.players, args.actions, args.seed)
+    shares = partition(ops, args.clients)
+    expected = {f"bench-player-{n:05d}": START_MONEY for n in range(args.players)}
+    for uuid, delta in ops:
+        expected[uuid] += delta
+
+    results = {}
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        for label in ("direct", "ledger", "in-proc"):
+            path = os.path.join(tmp, f"{label}.db")
+            setup(path, args.players)
+            holder = sqlite3.connect(path)    # keeps the WAL file around until it is measured
+            holder.execute("SELECT COUNT(*) FROM player_information").fetchone()
+            journal = os.path.join(tmp, f"{label}.journal")
+            if label == "direct":
+                wall, latencies, volume = bench_direct(path, shares)
+            elif label == "ledger":
+                wall, latencies, volume = bench_ledger(path, journal, shares, args.interval, args.batch)
+            else:
+                wall, latencies, volume = bench_ledger_inprocess(path, journal, shares, args.interval, args.batch)
+            wal = path + "-wal"
+            volume["wal_bytes"] = os.path.getsize(wal) if os.path.exists(wal) else 0
+            holder.close()
+            volume["consistent"] = balances(path) == expected
+            results[label] = (wall, latencies, volume)
+
+    print(f"{args.actions} money actions, {args.players} players, {args.clients} clients")
+    print(f"  {'':8s} {'actions/s':>10s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} "
+          f"{'txns':>7s} {'rows':>7s} {'WAL KB':>9s} {'journal KB':>11s}  balances")
+    for label, (wall, latencies, volume) in results.items():
+        ms = [v * 1000 for v in latencies]
+        print(f"  {label:8s} {len(ms) / wall:10.0f} {_percentile(ms, 50):8.2f} {_percentile(ms, 95):8.2f} "
+              f"{_percentile(ms, 99):8.2f} {volume['transactions']:7d} {volume['row_writes']:7d} "
+              f"{volume['wal_bytes'] / 1024:9.0f} {volume['journal_bytes'] / 1024:11.0f}  "
+              f"{'ok' if volume['consistent'] else 'MISMATCH'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: npc-system.sk join queries vs. the denormalized snapshot tables
+Loads the generated requests (repeated --scale times) into an SQLite
+stand-in and times, per call,
+  - opening an NPC menu: the three trades / trade_costs / rewards joins
+    npc-system.sk runs, vs. one npc_snapshots primary-key lookup
+  - executeTrade: the npc type + costs + rewards queries, vs. one
+    trade_snapshots lookup
+Both sides include fetching the rows; the snapshot side is shown with and
+without json.loads. SQLite runs in-process, so the projection adds
+--rtt-ms per query to approximate MySQL over the docker network, where the
+number of round trips dominates.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from kenkoku.catalog import load_catalog  # noqa: E402
+from kenkoku.definitions import DEFINITIONS  # noqa: E402
+from kenkoku.generator import build_requests  # noqa: E402
+from kenkoku.snapshot import (  # noqa: E402
+    NPC_SNAPSHOT_TABLE,
+    TRADE_SNAPSHOT_TABLE,
+    fetch_npc,
+    fetch_trade,
+    load_snapshots,
+    snapshots_from_db,
+)
+from kenkoku.sqlexport import build_export, connect_sqlite, create_standin, load_sqlite  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# npc-system.sk, openTradeGUI
+OPEN_QUERIES = (
+    "SELECT t.id, t.content, t.slot as gui_slot, vi.key as view_item_key, nt.name as npc_type FROM trades t "
+    "LEFT JOIN items vi ON t.view_item_id = vi.id JOIN npcs n ON t.npc_id = n.id "
+    "JOIN npc_types nt ON n.npc_type_id = nt.id WHERE t.npc_id = ? ORDER BY t.slot",
+    "SELECT tc.trade_id, IFNULL(i.name, i.key) as item_name, tc.quantity, tc.price, i.is_original "
+    "FROM trade_costs tc JOIN trades t ON tc.trade_id = t.id LEFT JOIN items i ON tc.item_id = i.id "
+    "WHERE t.npc_id = ?",
+    "SELECT r.trade_id, IFNULL(i.name, i.key) as item_name, r.quantity, r.price, i.is_original "
+    "FROM rewards r JOIN trades t ON r.trade_id = t.id LEFT JOIN items i ON r.item_id = i.id "
+    "WHERE t.npc_id = ?",
+)
+
+# npc-system.sk, executeTrade
+TRADE_QUERIES = (
+    "SELECT t.name as npc_type FROM trades tr JOIN npcs n ON tr.npc_id = n.id "
+    "JOIN npc_types t ON n.npc_type_id = t.id WHERE tr.id = ? LIMIT 1",
+    "SELECT i.key as item_key, IFNULL(i.name, '') as item_name, i.nbt, i.is_original, tc.quantity, tc.price "
+    "FROM trade_costs tc LEFT JOIN items i ON tc.item_id = i.id WHERE tc.trade_id = ?",
+    "SELECT i.key as item_key, IFNULL(i.name, '') as item_name, i.nbt, i.is_original, r.quantity, r.price "
+    "FROM rewards r LEFT JOIN items i ON r.item_id = i.id WHERE r.trade_id = ?",
+)
+
+
+def per_call(fn, ids, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in ids:
+            fn(i)
+        elapsed = (time.perf_counter() - start) / len(ids)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', default=os.path.join(REPO_ROOT, 'items.json'))
+    parser.add_argument('--scale', type=int, default=50, help="copies of the generated NPCs to load")
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--rtt-ms', type=float, default=0.3, help="assumed DB round trip for the projection")
+    args = parser.parse_args()
+
+    catalog = load_catalog(args.items)
+    requests = build_requests(DEFINITIONS, catalog)
+    scaled = {}
+    for n in range(args.scale):
+        for filename, request in requests.items():
+            scaled[f"{n}:{filename}"] = request
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = connect_sqlite(os.path.join(tmp, 'kenkoku.db'))
+        create_standin(conn, catalog)
+        load_sqlite(conn, build_export(scaled, replace=True))
+
+        start = time.perf_counter()
+        npcs, trades = load_snapshots(conn, snapshots_from_db(conn))
+        build = time.perf_counter() - start
+
+        rng = random.Random(args.seed)
+        npc_ids = [row[0] for row in conn.execute("SELECT id FROM npcs")]
+        trade_ids = [row[0] for row in conn.execute("SELECT id FROM trades")]
+        npc_sample = [rng.choice(npc_ids) for _ in range(args.calls)]
+        trade_sample = [rng.choice(trade_ids) for _ in range(args.calls)]
+
+        def open_join(npc_id):
+            return [conn.execute(sql, (npc_id,)).fetchall() for sql in OPEN_QUERIES]
+
+        def trade_join(trade_id):
+            return [conn.execute(sql, (trade_id,)).fetchall() for sql in TRADE_QUERIES]
+
+        npc_sql = f"SELECT payload FROM {NPC_SNAPSHOT_TABLE} WHERE npc_id = ?"
+        trade_sql = f"SELECT npc_type, payload FROM {TRADE_SNAPSHOT_TABLE} WHERE trade_id = ?"
+        results = [
+            ("open NPC", len(OPEN_QUERIES),
+             per_call(open_join, npc_sample, args.repeat),
+             per_call(lambda i: conn.execute(npc_sql, (i,)).fetchone(), npc_sample, args.repeat),
+             per_call(lambda i: fetch_npc(conn, i), npc_sample, args.repeat)),
+            ("executeTrade", len(TRADE_QUERIES),
+             per_call(trade_join, trade_sample, args.repeat),
+             per_call(lambda i: conn.execute(trade_sql, (i,)).fetchone(), trade_sample, args.repeat),
+             per_call(lambda i: fetch_trade(conn, i), trade_sample, args.repeat)),
+        ]
+        conn.close()
+
+    rtt = args.rtt_ms / 1000
+    print(f"stand-in: {npcs} NPCs, {trades} trades ({args.scale}x), snapshot build + load {build * 1000:.1f} ms")
+    for label, queries, join, raw, decoded in results:
+        print(f"  {label}")
+        print(f"    joins ({queries} queries)          : {join * 1e6:8.1f} us")
+        print(f"    snapshot (1 PK)            : {raw * 1e6:8.1f} us   {join / raw:5.1f}x")
+        print(f"    snapshot + json.loads      : {decoded * 1e6:8.1f} us")
+        print(f"    with {args.rtt_ms:g} ms per round trip : "
+              f"{(join + queries * rtt) * 1000:.2f} ms vs {(raw + rtt) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
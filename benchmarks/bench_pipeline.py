@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: generate_json.py pipeline stages on scaled synthetic catalogs
+Copies items.json and the definitions --scales times over (1x, 10x, 100x,
+1000x by default; copy n renames keys to <key>_n and names to <name>_n, so
+every copy resolves to its own rows) and times each stage separately:
+  - load:      json.load of items.json
+  - index:     build_catalog (key / name / id tables); index-warm is
+               load_catalog from the .cache/ index
+  - resolve:   a fresh Resolver over every key, name and attribute spec the
+               definitions use
+  - build:*:   compiling each request file (one per NPC type) with the
+               resolver already warm
+  - serialize: dump_request of every file; write is write_requests
+Each stage is the median of --repeat runs (one run above 100x). Results are
+appended to a JSON lines history (--history), and every stage is compared
+with the last record for the same scale on the same machine; a stage more
+than --threshold percent slower is reported as a regression (--check makes
+that the exit status).
+"""
+
+import argparse
+import copy
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from kenkoku.catalog import build_catalog, load_catalog  # noqa: E402
+from kenkoku.definitions import DEFINITIONS  # noqa: E402
+from kenkoku.generator import REQUEST_FILES, build_requests, dump_request, write_requests  # noqa: E402
+from kenkoku.resolver import Resolver  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_HISTORY = os.path.join(REPO_ROOT, 'benchmarks', 'results', 'pipeline.jsonl')
+
+# Definition fields holding a key or an original item name (str) / attribute spec (dict)
+KEY_FIELDS = ('key', 'req_key')
+NAME_FIELDS = ('original_name', 'req_original', 'reward_original', 'cost_original')
+# Fields naming the NPC / lottery, suffixed so copies stay distinct
+LABEL_FIELDS = ('category', 'difficulty')
+
+
+# ------------------------------------------------------------
+# Synthetic data
+# ------------------------------------------------------------
+
+def scale_items(items, factor):
+    """items.json copied factor times: fresh ids, copy n keyed <key>_n / named <name>_n."""
+    scaled = []
+    next_id = 1
+    for n in range(factor):
+        for item in items:
+            row = dict(item)
+            row['id'] = next_id
+            next_id += 1
+            if n:
+                row['key'] = f"{item['key']}_{n}"
+                if item.get('name'):
+                    row['name'] = f"{item['name']}_{n}"
+            scaled.append(row)
+    return scaled
+
+
+def _rename(value, n, entry_level):
+    """Copy n of a definition entry (nested dicts / lists), its references pointing at copy n of the items."""
+    if isinstance(value, list):
+        return [_rename(v, n, entry_level) for v in value]
+    if not isinstance(value, dict):
+        return value
+    out = {}
+    for field, v in value.items():
+        if field in KEY_FIELDS and isinstance(v, str):
+            out[field] = f"{v}_{n}"
+        elif field in NAME_FIELDS and v:
+            out[field] = f"{v}_{n}" if isinstance(v, str) else dict(v, key=f"{v['key']}_{n}")
+        elif field in LABEL_FIELDS or (field == 'name' and entry_level):
+            out[field] = f"{v}_{n}"
+        elif field == 'id' and entry_level:
+            out[field] = v + n * 1000
+        else:
+            out[field] = _rename(v, n, False)
+    return out
+
+
+def scale_definitions(definitions, factor):
+    """Every definition list repeated factor times (copy 0 is the original)."""
+    scaled = {}
+    for def_name, entries in definitions.items():
+        entries = entries if isinstance(entries, list) else [entries]
+        scaled[def_name] = [copy.deepcopy(e) if n == 0 else _rename(e, n, True)
+                            for n in range(factor) for e in entries]
+    return scaled
+
+
+def references(definitions):
+    """(kind, value) of every lookup the definitions make, for the resolve stage."""
+    refs = []
+
+    def walk(value):
+        if isinstance(value, list):
+            for v in value:
+                walk(v)
+        elif isinstance(value, dict):
+            for field, v in value.items():
+                if field in KEY_FIELDS and isinstance(v, str):
+                    refs.append(('key', v))
+                elif field in NAME_FIELDS and v:
+                    refs.append(('attrs', v) if isinstance(v, dict) else ('name', v))
+                else:
+                    walk(v)
+
+    walk(list(definitions.values()))
+    return refs
+
+
+# ------------------------------------------------------------
+# Stages
+# ------------------------------------------------------------
+
+def _median(fn, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def _resolve(catalog, refs):
+    resolver = Resolver(catalog)
+    for kind, value in refs:
+        if kind == 'key':
+            resolver.get_id_by_key(value)
+        elif kind == 'attrs':
+            resolver.get_id_by_attrs(value)
+        else:
+            resolver.get_id_by_name(value)
+    return resolver
+
+
+def run_scale(items, factor, repeat, tmp):
+    """{stage: seconds} and sizes for one scale."""
+    path = os.path.join(tmp, f'items_{factor}x.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(scale_items(items, factor), f, ensure_ascii=False)
+    definitions = scale_definitions(DEFINITIONS, factor)
+    refs = references(definitions)
+    stages = {}
+
+    def load():
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    stages['load'], rows = _median(load, repeat)
+    stages['index'], catalog = _median(lambda: build_catalog(rows), repeat)
+    del rows
+    index_path = os.path.join(tmp, f'items_{factor}x.idx')
+    load_catalog(path, index_path=index_path)
+    stages['index-warm'], _ = _median(lambda: load_catalog(path, index_path=index_path), repeat)
+    stages['resolve'], resolver = _median(lambda: _resolve(catalog, refs), repeat)
+
+    requests = {}
+    for filename in REQUEST_FILES:
+        stage = 'build:' + filename[len('request_'):-len('.json')]
+        stages[stage], built = _median(
+            lambda: build_requests(definitions, catalog, resolver=resolver, only=[filename]), repeat)
+        requests.update(built)
+
+    stages['serialize'], dumped = _median(lambda: [dump_request(r) for r in requests.values()], repeat)
+    out_dir = os.path.join(tmp, f'out_{factor}x')
+    stages['write'], _ = _median(lambda: write_requests(requests, out_dir), repeat)
+    stages['total'] = sum(t for stage, t in stages.items() if stage != 'index-warm')
+
+    sizes = {
+        "items": len(catalog),
+        "items_mb": round(os.path.getsize(path) / (1 << 20), 2),
+        "lookups": len(refs),
+        "misses": len(resolver.misses),
+        "npcs": sum(len(r["store"]) + len(r["patch"]) for r in requests.values()),
+        "output_kb": round(sum(len(d.encode('utf-8')) for d in dumped) / 1024, 1),
+    }
+    os.remove(path)
+    return stages, sizes
+
+
+# ------------------------------------------------------------
+# History
+# ------------------------------------------------------------
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def machine():
+    return f"{platform.node()} {platform.machine()} py{platform.python_version()}"
+
+
+def load_history(path):
+    records = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def previous(history, factor, host):
+    for record in reversed(history):
+        if record["scale"] == factor and record["machine"] == host:
+            return record
+    return None
+
+
+def compare(stages, before, threshold, min_seconds=0.001):
+    """[(stage, before s, now s, percent)] of stages slower than threshold percent."""
+    regressions = []
+    for stage, now in stages.items():
+        then = before["stages"].get(stage)
+        if then is None or now < min_seconds:
+            continue
+        change = (now - then) / then * 100 if then else 0.0
+        if change > threshold:
+            regressions.append((stage, then, now, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', default=os.path.join(REPO_ROOT, 'items.json'))
+    parser.add_argument('--scales', default='1,10,100,1000', help="comma-separated scale factors")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="JSON lines file the results are appended to")
+    parser.add_argument('--no-history', action='store_true', help="do not append this run")
+    parser.add_argument('--threshold', type=float, default=25.0, help="percent slower that counts as a regression")
+    parser.add_argument('--check', action='store_true', help="exit 1 when a stage regressed")
+    parser.add_argument('--label', help="free-form note stored with the run (e.g. the change being measured)")
+    args = parser.parse_args()
+
+    with open(args.items, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    history = load_history(args.history)
+    host = machine()
+    commit = _git_commit()
+    when = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+    regressed = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for factor in (int(s) for s in args.scales.split(',')):
+            repeat = args.repeat if factor <= 100 else 1
+            stages, sizes = run_scale(items, factor, repeat, tmp)
+            record = {"when": when, "commit": commit, "machine": host, "label": args.label, "scale": factor,
+                      "repeat": repeat, "sizes": sizes, "stages": {k: round(v, 6) for k, v in stages.items()}}
+            before = previous(history, factor, host)
+            regressions = compare(record["stages"], before, args.threshold) if before else []
+            regressed = regressed or bool(regressions)
+
+            print(f"{factor}x: {sizes['items']} items ({sizes['items_mb']} MB), {sizes['lookups']} lookups, "
+                  f"{sizes['npcs']} NPCs, {sizes['output_kb']} KB of requests")
+            for stage, seconds in record["stages"].items():
+                then = before["stages"].get(stage) if before else None
+                delta = f"  {(seconds - then) / then * 100:+6.1f}%" if then else ""
+                flag = "  REGRESSION" if any(r[0] == stage for r in regressions) else ""
+                print(f"  {stage:<22} {seconds * 1000:10.2f} ms{delta}{flag}")
+            if before:
+                print(f"  (vs. {before['commit'] or '?'} at {before['when']})")
+            if not args.no_history:
+                os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+                with open(args.history, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                history.append(record)
+
+    if args.check and regressed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
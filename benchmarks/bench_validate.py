@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: kenkoku.validate on scaled request payloads
+Copies the request_*.json files of --requests --scales times over (NPC names
+suffixed per copy, so the duplicate-name check stays quiet) and times
+validate_payloads with the item id check against items.json. Reports the
+best of --repeat runs and the time per trade.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from kenkoku.catalog import load_catalog  # noqa: E402
+from kenkoku.validate import validate_payloads  # noqa: E402
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def scale_payloads(payloads, factor):
+    scaled = []
+    for n in range(factor):
+        for filename, payload in payloads:
+            payload = json.loads(json.dumps(payload))
+            for row in payload.get("store", ()):
+                row["name"] = f"{row['name']}_{n}"
+            scaled.append((f"{n}/{filename}", payload))
+    return scaled
+
+
+def count_trades(payloads):
+    return sum(len(row.get("trades", ())) + len(row.get("add_trades", ()))
+               for _, payload in payloads for section in ("store", "patch") for row in payload.get(section, ()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', default=os.path.join(REPO_ROOT, 'json_data', 'main'))
+    parser.add_argument('--items', default=os.path.join(REPO_ROOT, 'items.json'))
+    parser.add_argument('--scales', default='1,10,100', help="comma-separated copies of the payloads")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = []
+    for path in sorted(glob.glob(os.path.join(args.requests, 'request_*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            payloads.append((os.path.basename(path), json.load(f)))
+    item_ids = set(load_catalog(args.items).all_items)
+
+    for factor in (int(s) for s in args.scales.split(',')):
+        scaled = scale_payloads(payloads, factor)
+        trades = count_trades(scaled)
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            errors = validate_payloads(scaled, item_ids)
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        print(f"x{factor}: {len(scaled)} files, {trades} trades: {best * 1000:8.2f} ms "
+              f"({best / max(trades, 1) * 1e6:.2f} us/trade), {len(errors)} errors")
+
+
+if __name__ == '__main__':
+    main()
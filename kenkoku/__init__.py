@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+Kenkoku Server tooling
+Helpers shared by generate_json.py and the other maintenance scripts.
+"""
@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+"""
+Arbitrage / trade-cycle detector
+Builds a directed graph whose nodes are money and items and whose edges are
+trades (cost -> reward, rate = reward amount / cost amount). A loop that
+returns more than it consumed is a cycle whose rates multiply to > 1, i.e.
+a negative cycle under weight -log(rate); SPFA (queue-based Bellman-Ford)
+finds it in roughly O(trades) on these sparse graphs.
+
+Lottery tickets get an extra edge ticket -> money at the expected 買取屋
+value of their draws, so a quest paying tickets worth more than its input
+shows up as well.
+
+kenkoku.upload runs check_payloads on every upload (--no-arbitrage-check
+skips it); standalone it exits with status 1 when a loop exists:
+
+    python -m kenkoku.arbitrage                     # generated requests
+    python -m kenkoku.arbitrage --npcs npcs.json    # + live snapshot
+    python -m kenkoku.arbitrage --requests json_data/main --no-generate
+"""
+
+import argparse
+import math
+import os
+import sys
+from collections import deque
+from fractions import Fraction
+
+MONEY = 'money'
+EPSILON = 1e-12
+
+
+class Edge:
+    """One trade as a graph edge."""
+
+    def __init__(self, src, dst, cost_qty, reward_qty, label, source):
+        self.src = src
+        self.dst = dst
+        self.cost_qty = cost_qty
+        self.reward_qty = reward_qty
+        self.rate = reward_qty / cost_qty
+        self.weight = -math.log(self.rate)
+        self.label = label
+        self.source = source
+
+
+def _side(rows):
+    """(node, amount) for a single cost/reward row list, else None."""
+    if not rows or len(rows) != 1:
+        return None
+    row = rows[0]
+    if row.get("item_id"):
+        return row["item_id"], row.get("quantity") or 1
+    if row.get("price"):
+        return MONEY, row["price"]
+    return None
+
+
+def trade_edges(trades, npc_name, source):
+    edges = []
+    for trade in trades:
+        cost, reward = _side(trade.get("costs")), _side(trade.get("rewards"))
+        if cost is None or reward is None or cost[0] == reward[0]:
+            continue
+        label = f"{npc_name} / {trade.get('content', '')}"
+        edges.append(Edge(cost[0], reward[0], cost[1], reward[1], label, source))
+    return edges
+
+
+def edges_from_requests(requests, source="generated"):
+    edges = []
+    for filename, request in requests.items():
+        for npc in list(request.get("store", ())) + list(request.get("patch", ())):
+            trades = npc.get("trades") or npc.get("add_trades") or ()
+            name = npc.get("name") or f"NPC {npc.get('id')}"
+            edges.extend(trade_edges(trades, name, f"{source}:{filename}"))
+    return edges
+
+
+def edges_from_snapshot(snapshot, source="npcs.json"):
+    edges = []
+    for npc in snapshot:
+        edges.extend(trade_edges(npc.get("trades", ()), npc["name"], source))
+    return edges
+
+
+def lottery_edges(requests, catalog):
+    """
+    ticket -> money edges at the expected 買取屋 value of the ticket's draws,
+    each ticket priced by its own lottery (kenkoku.economy.ticket_lotteries).
+    """
+    from kenkoku.economy import ticket_draws, ticket_lotteries
+    from kenkoku.lottery import build_table
+
+    sell = {}
+    for edge in edges_from_requests(requests):
+        if edge.dst == MONEY:
+            sell[edge.src] = max(sell.get(edge.src, 0.0), edge.rate)
+
+    edges = []
+    per_draw = {}
+    for item_id, lottery in ticket_lotteries(requests, catalog).items():
+        if lottery["name"] not in per_draw:
+            table = build_table(lottery)
+            per_draw[lottery["name"]] = sum(float(o.weight) * o.quantity * sell.get(o.item_id, 0.0)
+                                            for o in table.outcomes if o.item_id is not None)
+        value = per_draw[lottery["name"]]
+        if value > 0:
+            draws = ticket_draws(catalog, item_id)
+            edges.append(Edge(item_id, MONEY, 1, draws * value,
+                              f"{lottery['name']} ({draws} draws, expected value)", "lottery"))
+    return edges
+
+
+# ------------------------------------------------------------
+# Negative cycle search
+# ------------------------------------------------------------
+
+def _spfa_cycle(nodes, out_edges):
+    """Return one negative cycle as a list of edges, or None."""
+    dist = {v: 0.0 for v in nodes}          # virtual source at distance 0 to everything
+    parent = {v: None for v in nodes}
+    queue = deque(nodes)
+    queued = set(nodes)
+    n = len(nodes)
+    relaxations = 0
+
+    while queue:
+        u = queue.popleft()
+        queued.discard(u)
+        du = dist[u]
+        for edge in out_edges.get(u, ()):
+            v = edge.dst
+            if du + edge.weight < dist[v] - EPSILON:
+                dist[v] = du + edge.weight
+                parent[v] = edge
+                relaxations += 1
+                # A cycle in the parent graph is a negative cycle; checking it
+                # every n relaxations keeps the search near O(V + E) per hit
+                if relaxations % n == 0:
+                    cycle = _parent_cycle(parent)
+                    if cycle:
+                        return cycle
+                if v not in queued:
+                    queue.append(v)
+                    queued.add(v)
+    return _parent_cycle(parent)
+
+
+def _parent_cycle(parent):
+    state = {}  # node -> walk id that visited it
+    for walk, start in enumerate(parent):
+        v = start
+        while v is not None and v not in state:
+            state[v] = walk
+            edge = parent[v]
+            v = edge.src if edge is not None else None
+        if v is None or state[v] != walk:
+            continue
+        # v is on a cycle found during this walk
+        cycle = []
+        u = v
+        while True:
+            edge = parent[u]
+            cycle.append(edge)
+            u = edge.src
+            if u == v:
+                break
+        cycle.reverse()
+        return cycle
+    return None
+
+
+def find_cycles(edges, max_cycles=20):
+    """
+    Find up to max_cycles distinct profitable cycles. After each hit the
+    weakest edge of the cycle is removed and the search repeated.
+    """
+    active = list(edges)
+    cycles = []
+    while len(cycles) < max_cycles:
+        nodes = list({e.src for e in active} | {e.dst for e in active})
+        out_edges = {}
+        for edge in active:
+            out_edges.setdefault(edge.src, []).append(edge)
+        cycle = _spfa_cycle(nodes, out_edges)
+        if cycle is None:
+            break
+        cycles.append(cycle)
+        weakest = max(cycle, key=lambda e: e.weight)
+        active = [e for e in active if e is not weakest]
+    return cycles
+
+
+def cycle_profit(cycle):
+    """
+    Run the cycle with whole trades. Starts at money if the cycle touches it.
+    Returns (rotated cycle, amount in, amount out, executions per trade).
+    """
+    for i, edge in enumerate(cycle):
+        if edge.src == MONEY:
+            cycle = cycle[i:] + cycle[:i]
+            break
+
+    # Smallest number of runs of the first trade that keeps every later trade
+    # whole; leftovers that do not fill a trade are simply not converted
+    for runs in range(1, 10001):
+        start = amount = runs * Fraction(cycle[0].cost_qty)
+        executions = []
+        whole = True
+        for edge in cycle:
+            times = amount / Fraction(edge.cost_qty)
+            if times.denominator != 1:
+                whole = False
+                times = Fraction(math.floor(times))
+            executions.append(int(times))
+            amount = times * Fraction(edge.reward_qty)
+        if whole:
+            break
+    return cycle, float(start), float(amount), executions
+
+
+def describe_cycle(cycle, names):
+    cycle, amount_in, amount_out, executions = cycle_profit(cycle)
+    gain = math.prod(e.rate for e in cycle)
+
+    def label(node):
+        return "money" if node == MONEY else f"{names.get(node, node)} (#{node})"
+
+    lines = [f"profit x{gain:.4f} per loop; start {amount_in:g} {label(cycle[0].src)} -> {amount_out:g} "
+             f"(+{amount_out - amount_in:g} per iteration)"]
+    for edge, times in zip(cycle, executions):
+        lines.append(f"    {times} x [{edge.source}] {edge.label}: "
+                     f"{edge.cost_qty:g} {label(edge.src)} -> {edge.reward_qty:g} {label(edge.dst)}")
+    return "\n".join(lines)
+
+
+def cycle_names(cycles, catalog):
+    """{item id: name or key} for the item nodes of cycles."""
+    names = {}
+    for cycle in cycles:
+        for edge in cycle:
+            for node in (edge.src, edge.dst):
+                if node != MONEY and node in catalog.all_items:
+                    names[node] = catalog.all_items[node].get('name') or catalog.all_items[node].get('key')
+    return names
+
+
+def check_payloads(payloads, catalog=None, max_cycles=20):
+    """
+    (edges checked, cycles) for [(file name, payload)] as kenkoku.upload
+    loads them; lottery edges need the catalog and are left out without one.
+    """
+    requests = dict(payloads)
+    edges = edges_from_requests(requests, "req")
+    if catalog is not None:
+        edges += lottery_edges(requests, catalog)
+    return len(edges), find_cycles(edges, max_cycles)
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Find profitable trade loops before uploading")
+    parser.add_argument('--items', default=os.path.join(base_dir, 'items.json'))
+    parser.add_argument('--requests', action='append', default=[], help="request files or directories to include")
+    parser.add_argument('--npcs', help="include the live npcs.json snapshot")
+    parser.add_argument('--no-generate', action='store_true', help="do not include the generated requests")
+    parser.add_argument('--no-lottery', action='store_true', help="skip expected-value lottery edges")
+    parser.add_argument('--max-cycles', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    from kenkoku.catalog import load_catalog
+    from kenkoku.definitions import DEFINITIONS
+    from kenkoku.diff import load_snapshot
+    from kenkoku.generator import build_requests
+    from kenkoku.upload import load_payloads
+
+    catalog = load_catalog(args.items)
+    requests = {}
+    if not args.no_generate:
+        requests.update(build_requests(DEFINITIONS, catalog))
+    for name, payload in load_payloads(args.requests):
+        requests[f"file:{name}"] = payload
+
+    edges = edges_from_requests(requests, "req")
+    if args.npcs:
+        edges += edges_from_snapshot(load_snapshot(args.npcs))
+    if not args.no_lottery:
+        edges += lottery_edges(requests, catalog)
+
+    cycles = find_cycles(edges, args.max_cycles)
+    names = cycle_names(cycles, catalog)
+
+    print(f"Checked {len(edges)} trades")
+    if not cycles:
+        print("No profitable trade loops found.")
+        return 0
+    print(f"Found {len(cycles)} profitable trade loop(s):")
+    for i, cycle in enumerate(cycles, 1):
+        print(f"  #{i} {describe_cycle(cycle, names)}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
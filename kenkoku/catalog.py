@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Item catalog loader for items.json
+Builds the key/name lookup tables once and keeps them in an on-disk index
+that is reused until items.json changes.
+
+Index layout (.cache/<items file>.index, native byte order):
+    MAGIC | header length (u32) | header JSON | sections...
+Each lookup table is stored as sorted UTF-8 strings with an offset array and
+a matching id array, so opening the index is an mmap plus a few memoryview
+casts and lookups are a binary search. Item rows are stored as one JSON
+document per item and decoded on first access.
+"""
+
+import array
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from collections.abc import Mapping
+
+# Bump when the index layout changes so stale indexes are rebuilt
+INDEX_VERSION = 3
+INDEX_MAGIC = b'KKIX'
+CACHE_DIR_NAME = '.cache'
+
+_PREFIX = struct.Struct('<4sI')
+_ARRAY_CODE = 'q'
+
+
+class Catalog:
+    """Lookup tables built from items.json."""
+
+    def __init__(self, key_to_id, name_to_id, all_items, original_ids=()):
+        # key_to_id: minecraft:id -> db_id (for non-original items)
+        # name_to_id: item name -> db_id (last one wins, like the DB export order)
+        # all_items: db_id -> item row
+        # original_ids: ascending db_ids of the is_original rows
+        self.key_to_id = key_to_id
+        self.name_to_id = name_to_id
+        self.all_items = all_items
+        self.original_ids = original_ids
+
+    def __len__(self):
+        return len(self.all_items)
+
+
+def build_catalog(items_data):
+    """Build a Catalog from the parsed items.json list."""
+    key_to_id = {}
+    name_to_id = {}
+    all_items = {}
+    original_ids = []
+
+    for item in items_data:
+        db_id = item['id']
+        key = item.get('key', '')
+        name = item.get('name')
+
+        all_items[db_id] = item
+
+        # For non-original items, map the key
+        if item.get('is_original', 0) == 0:
+            if key and key not in key_to_id:
+                key_to_id[key] = db_id
+
+        else:
+            original_ids.append(db_id)
+
+        # For original items, map by name
+        if name:
+            name_to_id[name] = db_id
+
+    return Catalog(key_to_id, name_to_id, all_items, sorted(original_ids))
+
+
+# ------------------------------------------------------------
+# mmap-backed tables
+# ------------------------------------------------------------
+
+class _StringTable(Mapping):
+    """Read-only str -> id mapping over sorted UTF-8 strings."""
+
+    def __init__(self, blob, offsets, ids):
+        self._blob = blob
+        self._offsets = offsets
+        self._ids = ids
+
+    def _entry(self, i):
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]])
+
+    def _find(self, key):
+        if not isinstance(key, str):
+            return -1
+        # UTF-8 byte order is code point order, so compare encoded bytes
+        target = key.encode('utf-8')
+        lo, hi = 0, len(self._ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._ids) and self._entry(lo) == target:
+            return lo
+        return -1
+
+    def __getitem__(self, key):
+        i = self._find(key)
+        if i < 0:
+            raise KeyError(key)
+        return self._ids[i]
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+    def __iter__(self):
+        for i in range(len(self._ids)):
+            yield self._entry(i).decode('utf-8')
+
+    def __len__(self):
+        return len(self._ids)
+
+
+class _ItemTable(Mapping):
+    """Read-only db_id -> item row mapping; rows are decoded lazily."""
+
+    def __init__(self, blob, offsets, ids):
+        self._blob = blob
+        self._offsets = offsets
+        self._ids = ids
+        self._rows = {}
+
+    def __getitem__(self, db_id):
+        row = self._rows.get(db_id)
+        if row is not None:
+            return row
+        if not isinstance(db_id, int):
+            raise KeyError(db_id)
+        i = bisect.bisect_left(self._ids, db_id)
+        if i == len(self._ids) or self._ids[i] != db_id:
+            raise KeyError(db_id)
+        row = json.loads(bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]))
+        self._rows[db_id] = row
+        return row
+
+    def __contains__(self, db_id):
+        if db_id in self._rows:
+            return True
+        if not isinstance(db_id, int):
+            return False
+        i = bisect.bisect_left(self._ids, db_id)
+        return i < len(self._ids) and self._ids[i] == db_id
+
+    def __iter__(self):
+        return iter(self._ids.tolist())
+
+    def __len__(self):
+        return len(self._ids)
+
+
+# ------------------------------------------------------------
+# Index file
+# ------------------------------------------------------------
+
+def index_path_for(items_path):
+    """Default location of the index file for a catalog."""
+    items_path = os.path.abspath(items_path)
+    return os.path.join(os.path.dirname(items_path), CACHE_DIR_NAME,
+                        os.path.basename(items_path) + '.index')
+
+
+def file_hash(path):
+    """sha256 of a file, read in chunks."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _pack_ids(values):
+    return array.array(_ARRAY_CODE, values).tobytes()
+
+
+def _string_sections(mapping):
+    encoded = sorted((k.encode('utf-8'), v) for k, v in mapping.items())
+    offsets = [0]
+    for k, _ in encoded:
+        offsets.append(offsets[-1] + len(k))
+    return (_pack_ids(offsets), _pack_ids([v for _, v in encoded]),
+            b''.join(k for k, _ in encoded))
+
+
+def _item_sections(all_items):
+    ids = sorted(all_items)
+    rows = [json.dumps(all_items[i], ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            for i in ids]
+    offsets = [0]
+    for row in rows:
+        offsets.append(offsets[-1] + len(row))
+    return _pack_ids(offsets), _pack_ids(ids), b''.join(rows)
+
+
+def _write_index(index_path, meta, catalog):
+    sections = {}
+    sections['key_offsets'], sections['key_ids'], sections['key_blob'] = _string_sections(catalog.key_to_id)
+    sections['name_offsets'], sections['name_ids'], sections['name_blob'] = _string_sections(catalog.name_to_id)
+    sections['item_offsets'], sections['item_ids'], sections['item_blob'] = _item_sections(catalog.all_items)
+    sections['original_ids'] = _pack_ids(catalog.original_ids)
+
+    # Section offsets are relative to the end of the header and 8-byte aligned
+    layout = {}
+    pos = 0
+    for name, data in sections.items():
+        layout[name] = [pos, len(data)]
+        pos += len(data) + (-len(data) % 8)
+    header = dict(meta, byteorder=sys.byteorder, sections=layout)
+    header_bytes = json.dumps(header).encode('utf-8')
+    header_bytes += b' ' * (-(len(header_bytes) + _PREFIX.size) % 8)
+
+    # Write to a temp file first so a crash never leaves a half-written index
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_PREFIX.pack(INDEX_MAGIC, len(header_bytes)))
+            f.write(header_bytes)
+            for data in sections.values():
+                f.write(data)
+                f.write(b'\0' * (-len(data) % 8))
+        os.replace(tmp_path, index_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _open_index(index_path):
+    """Return (header, Catalog) for a valid index, or None."""
+    try:
+        with open(index_path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        magic, header_len = _PREFIX.unpack_from(mm, 0)
+        if magic != INDEX_MAGIC:
+            return None
+        header = json.loads(mm[_PREFIX.size:_PREFIX.size + header_len])
+    except (struct.error, ValueError):
+        return None
+    if header.get('version') != INDEX_VERSION or header.get('byteorder') != sys.byteorder:
+        return None
+
+    base = _PREFIX.size + header_len
+    view = memoryview(mm)
+
+    def section(name, cast=True):
+        start, length = header['sections'][name]
+        mv = view[base + start:base + start + length]
+        return mv.cast(_ARRAY_CODE) if cast else mv
+
+    catalog = Catalog(
+        _StringTable(section('key_blob', False), section('key_offsets'), section('key_ids')),
+        _StringTable(section('name_blob', False), section('name_offsets'), section('name_ids')),
+        _ItemTable(section('item_blob', False), section('item_offsets'), section('item_ids')),
+        section('original_ids'),
+    )
+    return header, catalog
+
+
+def load_catalog(items_path, index_path=None, use_cache=True):
+    """
+    Load the catalog for items_path.
+
+    The index is keyed by size and mtime; when those change the file is hashed
+    and only re-parsed if the content really differs (e.g. a fresh git checkout
+    touches mtime without changing anything).
+    """
+    if not use_cache:
+        with open(items_path, 'r', encoding='utf-8') as f:
+            return build_catalog(json.load(f))
+
+    if index_path is None:
+        index_path = index_path_for(items_path)
+
+    st = os.stat(items_path)
+    opened = _open_index(index_path)
+    if opened is not None:
+        header, catalog = opened
+        if header['size'] == st.st_size and header['mtime_ns'] == st.st_mtime_ns:
+            return catalog
+
+    digest = file_hash(items_path)
+    if opened is not None and opened[0]['sha256'] == digest:
+        catalog = opened[1]
+    else:
+        with open(items_path, 'r', encoding='utf-8') as f:
+            catalog = build_catalog(json.load(f))
+
+    meta = {'version': INDEX_VERSION, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+    _write_index(index_path, meta, catalog)
+    return catalog
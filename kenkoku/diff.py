@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Diff generated requests against the live NPC snapshot (npcs.json)
+Emits only what the manage service has to change instead of re-posting
+whole NPCs:
+
+    store:  NPCs that do not exist yet (full definition)
+    patch:  {"id": npc_id, "add_trades": [...]} for trades that are missing
+    delete: {"id": npc_id, "trade_ids": [...]} for trades that are no longer
+            generated, and {"id": npc_id} for whole NPCs (only those named in
+            prune_npcs, i.e. NPCs the generator itself produced before)
+
+NPCs in `incomplete` (build_requests(incomplete=...): a lookup missed, so
+some of their trades were skipped) never get deletes: a trade that could not
+be generated is not a trade that was removed.
+
+Trades are matched by a hashed signature of content, view item, costs and
+rewards, so one pass over each side is enough (O(number of trades)). A
+changed price therefore shows up as delete + add of that one trade.
+Lotteries are not part of npcs.json and are left out of the diff.
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+
+
+def _entries(rows):
+    # Request rows use {"price": p} / {"item_id", "quantity"}; the snapshot has
+    # all three columns with nulls, so normalize both to the same tuple
+    return sorted(
+        (row.get("item_id"), row.get("quantity"), row.get("price"))
+        for row in rows or ()
+        if row
+    )
+
+
+def trade_signature(trade):
+    """Stable hash of what a trade does (ignores ids, slots and timestamps)."""
+    canonical = [
+        trade.get("content"),
+        trade.get("view_item_id"),
+        _entries(trade.get("costs")),
+        _entries(trade.get("rewards")),
+    ]
+    data = json.dumps(canonical, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=12).hexdigest()
+
+
+def load_snapshot(path):
+    """
+    Load npcs.json (list of NPCs with nested trades/costs/rewards), streamed
+    with the repeated npc_type / biome / profession / item rows shared (see
+    kenkoku/jsonstream.py), so the nested objects are read-only.
+    """
+    from kenkoku.jsonstream import load_array
+
+    return load_array(path)
+
+
+class _Desired:
+    def __init__(self):
+        self.template = None   # generated store NPC, if any
+        self.npc_id = None     # patch target id, if any
+        self.trades = []
+        # Store NPCs define the whole trade list; patches only add to it
+        self.exclusive = False
+
+
+def _collect_desired(requests):
+    desired = {}
+    for request in requests.values():
+        for npc in request.get("store", ()):
+            if "trades" not in npc:
+                continue  # lottery
+            entry = desired.setdefault(("name", npc["name"]), _Desired())
+            if entry.template is None:
+                entry.template = npc
+            entry.exclusive = True
+            entry.trades.extend(npc["trades"])
+        for npc in request.get("patch", ()):
+            entry = desired.setdefault(("id", npc["id"]), _Desired())
+            entry.npc_id = npc["id"]
+            if entry.template is None and "name" in npc:
+                entry.template = npc
+            entry.trades.extend(npc.get("add_trades", ()))
+    return desired
+
+
+def _merge_patch_targets(desired, live_by_id):
+    # A patch by id and a store by name can point at the same live NPC
+    for key in [k for k in desired if k[0] == "id"]:
+        live = live_by_id.get(key[1])
+        if live is None or ("name", live["name"]) not in desired:
+            continue
+        patch = desired.pop(key)
+        desired[("name", live["name"])].trades.extend(patch.trades)
+
+
+def diff_requests(requests, snapshot, prune_npcs=(), incomplete=()):
+    """
+    Diff {file name: payload} (from build_requests) against a snapshot.
+
+    prune_npcs: names of NPCs that may be deleted when no longer generated
+                (hand-made NPCs must not be in it)
+    incomplete: ("name", name) / ("id", npc id) of NPCs with skipped trades
+
+    Returns a single payload with the minimal store/patch/delete arrays.
+    """
+    live_by_id = {}
+    live_by_name = {}
+    for npc in snapshot:
+        live_by_id[npc["id"]] = npc
+        live_by_name.setdefault(npc["name"], npc)
+
+    desired = _collect_desired(requests)
+    _merge_patch_targets(desired, live_by_id)
+
+    result = {"store": [], "patch": [], "delete": []}
+    matched_ids = set()
+    keep_ids = {live_by_id[value]["id"] if kind == "id" else live_by_name[value]["id"]
+                for kind, value in incomplete if (live_by_id if kind == "id" else live_by_name).get(value)}
+
+    for (kind, value), entry in desired.items():
+        live = live_by_name.get(value) if kind == "name" else live_by_id.get(value)
+
+        if live is None:
+            if kind == "name":
+                npc = {k: v for k, v in entry.template.items() if k != "trades"}
+                npc["trades"] = entry.trades
+                result["store"].append(npc)
+            else:
+                # Unknown id: nothing to compare against, pass the patch through
+                result["patch"].append({"id": value, "add_trades": entry.trades})
+            continue
+
+        matched_ids.add(live["id"])
+        live_trades = defaultdict(list)
+        for trade in live.get("trades", ()):
+            live_trades[trade_signature(trade)].append(trade)
+
+        add_trades = []
+        for trade in entry.trades:
+            bucket = live_trades.get(trade_signature(trade))
+            if bucket:
+                bucket.pop()
+            else:
+                add_trades.append(trade)
+
+        if add_trades:
+            result["patch"].append({"id": live["id"], "add_trades": add_trades})
+        if entry.exclusive and live["id"] not in keep_ids:
+            stale = sorted(t["id"] for bucket in live_trades.values() for t in bucket)
+            if stale:
+                result["delete"].append({"id": live["id"], "trade_ids": stale})
+
+    prune_npcs = set(prune_npcs)
+    for npc in snapshot:
+        if npc["name"] in prune_npcs and npc["id"] not in matched_ids and npc["id"] not in keep_ids:
+            result["delete"].append({"id": npc["id"]})
+
+    return result
+
+
+def summarize_diff(diff):
+    """Counts for progress output."""
+    return {
+        "new_npcs": len(diff["store"]),
+        "new_trades": sum(len(n["trades"]) for n in diff["store"])
+                      + sum(len(p["add_trades"]) for p in diff["patch"]),
+        "deleted_trades": sum(len(d.get("trade_ids", ())) for d in diff["delete"]),
+        "deleted_npcs": sum(1 for d in diff["delete"] if "trade_ids" not in d),
+    }
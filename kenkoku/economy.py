@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""
+Economy simulator
+Runs N players x T in-game days over the trades that build_requests()
+produces from the definitions, with every per-day step vectorized in NumPy:
+
+  1. gather:  each player gathers the items 買取屋 buy (Poisson, scaled by
+              the player's activity) and sells them -> money is minted
+  2. shop:    players visit a shop and buy one money-priced trade if they
+              can spare the price -> money is burned
+  3. quest:   some players complete a quest and hand in its cost items,
+              which they could otherwise have sold to a 買取屋 (that sale is
+              taken back); lottery ticket rewards are drawn through the alias
+              table (kenkoku/lottery.py) of the ticket's own lottery and
+              items the 買取屋 accept are sold right away
+
+Reports money supply per day, inflation (growth of money per player) and
+which trades dominate minting, spending and quest rewards. --sweep reruns
+the whole pipeline for alternative definition values:
+
+    python -m kenkoku.economy --players 100000 --days 30
+    python -m kenkoku.economy --sweep buy_prices_categories.0.items.2.price=500,1000,2000
+
+Needs NumPy (pip install numpy).
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+from kenkoku.definitions import NPC_TYPE_QUEST
+from kenkoku.lottery import build_table, item_values
+
+# Units gathered per active player-day (activity 1.0). Guesses from play
+# sessions; anything missing falls back to DEFAULT_INCOME / price.
+DEFAULT_GATHER_RATES = {
+    "minecraft:cobblestone": 600,
+    "minecraft:netherrack": 400,
+    "minecraft:cobbled_deepslate": 500,
+    "minecraft:raw_copper_block": 6,
+    "minecraft:raw_gold_block": 0.6,
+    "minecraft:diamond": 1.5,
+    "minecraft:redstone_block": 4,
+    "minecraft:lapis_block": 3,
+    "minecraft:carrot": 200,
+    "minecraft:potato": 200,
+    "minecraft:hay_block": 8,
+    "minecraft:beetroot": 60,
+    "minecraft:poisonous_potato": 1.5,
+    "minecraft:cod": 15,
+    "minecraft:salmon": 15,
+    "minecraft:pufferfish": 3,
+    "minecraft:tropical_fish": 3,
+    "minecraft:enchanted_golden_apple": 0.01,
+    "minecraft:heart_of_the_sea": 0.03,
+}
+DEFAULT_INCOME = 300
+
+_TICKET_COUNT = re.compile(r'itemType:"?lottery_ticket"?.*?count:(\d+)')
+_TICKET_LOTTERY = re.compile(r'itemType:"?lottery_ticket"?.*?lotteryName:"((?:[^"\\]|\\.)*)"')
+
+
+class EconomyParams:
+    """Tunable behaviour of the simulated players."""
+
+    def __init__(self, players=100_000, days=30, seed=None, activity_sigma=0.8,
+                 shop_visit=0.5, spend_fraction=0.5, quest_rate=0.15, gather_rates=None):
+        self.players = players
+        self.days = days
+        self.seed = seed
+        self.activity_sigma = activity_sigma    # lognormal spread of player activity
+        self.shop_visit = shop_visit            # chance to visit a shop per day
+        self.spend_fraction = spend_fraction    # share of money a player is willing to spend at once
+        self.quest_rate = quest_rate            # quests completed per active player-day
+        self.gather_rates = dict(DEFAULT_GATHER_RATES, **(gather_rates or {}))
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise SystemExit("numpy is required for the economy simulator (pip install numpy)")
+    return numpy
+
+
+def ticket_draws(catalog, item_id):
+    """Draws per lottery ticket item (count in its custom_data), or 0 if not a ticket."""
+    item = catalog.all_items.get(item_id) if item_id is not None else None
+    if not item or not item.get('nbt'):
+        return 0
+    match = _TICKET_COUNT.search(item['nbt'])
+    return int(match.group(1)) if match else 0
+
+
+def ticket_lotteries(requests, catalog):
+    """
+    {ticket item id: lottery row of requests} for every lottery ticket in the
+    catalog. A ticket draws from the lottery named by its custom_data
+    lotteryName (like lottery-system.sk); when that name is not a generated
+    lottery and only one lottery is generated, the ticket draws from that one
+    (the live 福引ガチャ tickets say 福引, the definition 通常福引).
+    """
+    lotteries = [row for r in requests.values() for row in r.get("store", ()) if "rarities" in row]
+    by_name = {lottery["name"]: lottery for lottery in lotteries}
+    fallback = lotteries[0] if len(lotteries) == 1 else None
+    tickets = {}
+    for item_id in catalog.original_ids:
+        if not ticket_draws(catalog, item_id):
+            continue
+        match = _TICKET_LOTTERY.search(catalog.all_items[item_id]['nbt'])
+        lottery = by_name.get(match.group(1)) if match else None
+        if lottery is None:
+            lottery = fallback
+        if lottery is not None:
+            tickets[item_id] = lottery
+    return tickets
+
+
+class _Trades:
+    """Flat arrays of the trades the simulation uses."""
+
+    def __init__(self, requests, catalog, params):
+        np = _numpy()
+        sell_ids, sell_prices, sell_labels, sell_rates = [], [], [], []
+        shop_prices, shop_labels = [], []
+        quest_tickets, quest_item_value, quest_labels, quest_lottery, quest_costs = [], [], [], [], []
+        values = item_values(requests)
+        # One alias table per lottery that some ticket draws from
+        self.lotteries = []
+        table_of = {}
+        for ticket, lottery in ticket_lotteries(requests, catalog).items():
+            if id(lottery) not in table_of:
+                table_of[id(lottery)] = len(self.lotteries)
+                self.lotteries.append(build_table(lottery))
+            table_of[ticket] = table_of[id(lottery)]
+
+        for request in requests.values():
+            for npc in request.get("store", ()) + request.get("patch", ()):
+                trades = npc.get("trades", npc.get("add_trades", ()))
+                npc_name = npc.get("name", f"NPC {npc.get('id')}")
+                for trade in trades:
+                    cost, reward = trade["costs"][0], trade["rewards"][0]
+                    label = f"{npc_name} / {trade['content']}"
+                    if "price" in reward:
+                        item = catalog.all_items.get(cost["item_id"], {})
+                        rate = params.gather_rates.get(item.get("key"))
+                        unit_price = reward["price"] / cost.get("quantity", 1)
+                        if rate is None:
+                            rate = DEFAULT_INCOME / max(unit_price, 1)
+                        sell_ids.append(cost["item_id"])
+                        sell_prices.append(unit_price)
+                        sell_rates.append(rate)
+                        sell_labels.append(label)
+                    elif "price" in cost:
+                        shop_prices.append(cost["price"])
+                        shop_labels.append(label)
+                    elif npc.get("npc_type_id") == NPC_TYPE_QUEST:
+                        draws = ticket_draws(catalog, reward.get("item_id"))
+                        if reward.get("item_id") not in table_of:
+                            draws = 0
+                        quest_tickets.append(draws * reward.get("quantity", 1))
+                        quest_lottery.append(table_of.get(reward.get("item_id"), -1))
+                        quest_costs.append((cost.get("item_id"), cost.get("quantity", 1)))
+                        quest_item_value.append(0.0 if draws else
+                                                values.get(reward.get("item_id"), 0.0) * reward.get("quantity", 1))
+                        quest_labels.append(label)
+
+        self.sell_prices = np.array(sell_prices, dtype=float)
+        self.sell_rates = np.array(sell_rates, dtype=float)
+        self.sell_labels = sell_labels
+        self.shop_prices = np.array(shop_prices, dtype=float)
+        self.shop_labels = shop_labels
+        self.quest_draws = np.array(quest_tickets, dtype=np.int64)
+        self.quest_item_value = np.array(quest_item_value, dtype=float)
+        self.quest_lottery = np.array(quest_lottery, dtype=np.int64)
+        self.quest_labels = quest_labels
+        # Lottery items are sold to a 買取屋 if one buys them, else kept
+        self.liquid_values = {i: p for i, p in zip(sell_ids, sell_prices)}
+        self.values = values
+        # Money a quest's cost items would have fetched at a 買取屋
+        self.quest_cost_value = np.array([quantity * self.liquid_values.get(item_id, 0.0)
+                                          for item_id, quantity in quest_costs], dtype=float)
+
+
+def simulate_economy(requests, catalog, params=None):
+    """Run the simulation. Returns a report dict."""
+    np = _numpy()
+    params = params or EconomyParams()
+    rng = np.random.default_rng(params.seed)
+    trades = _Trades(requests, catalog, params)
+    n = params.players
+
+    # (table, money per outcome, kept item value per outcome) per lottery
+    lotteries = []
+    for table in trades.lotteries:
+        liquid = np.array([o.quantity * trades.liquid_values.get(o.item_id, 0.0) for o in table.outcomes])
+        held = np.array([o.quantity * trades.values.get(o.item_id, 0.0) for o in table.outcomes]) - liquid
+        lotteries.append((table, liquid, held))
+
+    activity = rng.lognormal(0.0, params.activity_sigma, n)
+    activity /= activity.mean()
+    money = np.zeros(n)
+    item_wealth = np.zeros(n)
+
+    minted_by_trade = np.zeros(len(trades.sell_prices))
+    spent_by_trade = np.zeros(len(trades.shop_prices))
+    quests_by_trade = np.zeros(len(trades.quest_labels))
+    lottery_money = lottery_items = quest_costs = 0.0
+    days = []
+
+    start = time.perf_counter()
+    for day in range(params.days):
+        # 1. gather + sell to 買取屋
+        if len(trades.sell_prices):
+            units = rng.poisson(np.outer(activity, trades.sell_rates))
+            income = units @ trades.sell_prices
+            minted_by_trade += units.sum(axis=0) * trades.sell_prices
+            money += income
+            minted = float(income.sum())
+        else:
+            minted = 0.0
+
+        # 2. shop
+        spent = 0.0
+        if len(trades.shop_prices):
+            choice = rng.integers(0, len(trades.shop_prices), n)
+            price = trades.shop_prices[choice]
+            buys = (rng.random(n) < params.shop_visit) & (money * params.spend_fraction >= price)
+            money -= price * buys
+            spent_by_trade += np.bincount(choice, weights=price * buys, minlength=len(trades.shop_prices))
+            spent = float((price * buys).sum())
+
+        # 3. quests: cost items handed in instead of sold -> lottery tickets / items
+        lottery_minted = consumed = 0.0
+        if len(trades.quest_labels):
+            quest = rng.integers(0, len(trades.quest_labels), n)
+            cost = trades.quest_cost_value[quest]
+            # Only players who gathered (and so sold) enough of the cost items can hand them in
+            done = (rng.random(n) < np.clip(params.quest_rate * activity, 0, 1)) & (money >= cost)
+            money -= cost * done
+            consumed = float((cost * done).sum())
+            quest_costs += consumed
+            quests_by_trade += np.bincount(quest[done], minlength=len(trades.quest_labels))
+            item_wealth[done] += trades.quest_item_value[quest[done]]
+            for k, (table, liquid, held) in enumerate(lotteries):
+                draws = np.where(done & (trades.quest_lottery[quest] == k), trades.quest_draws[quest], 0)
+                total_draws = int(draws.sum())
+                if not total_draws:
+                    continue
+                outcome = table.sample(total_draws, rng)
+                owner = np.repeat(np.arange(n), draws)
+                cash = np.bincount(owner, weights=liquid[outcome], minlength=n)
+                money += cash
+                item_wealth += np.bincount(owner, weights=held[outcome], minlength=n)
+                lottery_minted += float(cash.sum())
+                lottery_money += float(cash.sum())
+                lottery_items += float(held[outcome].sum())
+
+        supply = float(money.sum())
+        days.append({
+            "day": day + 1,
+            "money_supply": supply,
+            "minted": minted + lottery_minted,
+            "spent": spent,
+            "quest_costs": consumed,
+            "money_per_player": supply / n,
+            "median_money": float(np.median(money)),
+        })
+    seconds = time.perf_counter() - start
+
+    for prev, cur in zip([None] + days[:-1], days):
+        base = prev["money_per_player"] if prev else 0.0
+        cur["inflation"] = (cur["money_per_player"] - base) / base if base else None
+
+    def ranked(labels, totals):
+        grand = float(totals.sum()) or 1.0
+        order = np.argsort(-totals)
+        return [{"trade": labels[i], "total": float(totals[i]), "share": float(totals[i]) / grand}
+                for i in order if totals[i] > 0]
+
+    sorted_money = np.sort(money)
+    cumulative = np.cumsum(sorted_money)
+    gini = float(1 - 2 * (cumulative.sum() / cumulative[-1] - 0.5) / n) if cumulative[-1] > 0 else 0.0
+    return {
+        "players": n,
+        "days": params.days,
+        "seconds": seconds,
+        "final_money_supply": days[-1]["money_supply"] if days else 0.0,
+        "gini": gini,
+        "lottery_money": lottery_money,
+        "lottery_item_value": lottery_items,
+        "quest_cost_value": quest_costs,
+        "quest_item_value": float(item_wealth.sum()) - lottery_items,
+        "daily": days,
+        "top_minting_trades": ranked(trades.sell_labels, minted_by_trade),
+        "top_spending_trades": ranked(trades.shop_labels, spent_by_trade),
+        "top_quests": ranked(trades.quest_labels, quests_by_trade),
+    }
+
+
+# ------------------------------------------------------------
+# Sweeps
+# ------------------------------------------------------------
+
+def set_path(definitions, path, value):
+    """Set e.g. 'shops.0.items.2.price' in a definitions dict."""
+    parts = path.split('.')
+    target = definitions
+    for part in parts[:-1]:
+        target = target[int(part)] if isinstance(target, list) else target[part]
+    last = parts[-1]
+    if isinstance(target, list):
+        target[int(last)] = value
+    else:
+        target[last] = value
+
+
+def parse_sweep(spec):
+    """'path=v1,v2,v3' -> (path, [values])"""
+    path, _, values = spec.partition('=')
+    return path, [json.loads(v) for v in values.split(',')]
+
+
+def _print_report(result, top):
+    print(f"{result['players']:,} players x {result['days']} days in {result['seconds']:.2f} s")
+    print(f"  final money supply: {result['final_money_supply']:,.0f} "
+          f"({result['final_money_supply'] / result['players']:,.0f} per player, gini {result['gini']:.2f})")
+    daily = result["daily"]
+    if len(daily) > 1:
+        last = daily[-1]
+        print(f"  last day: minted {last['minted']:,.0f}, spent {last['spent']:,.0f}, "
+              f"handed in for quests {last['quest_costs']:,.0f}, inflation {100 * (last['inflation'] or 0):.2f}%/day")
+    print(f"  lottery: {result['lottery_money']:,.0f} money, {result['lottery_item_value']:,.0f} in kept items")
+    for title, key in (("minting", "top_minting_trades"), ("spending", "top_spending_trades"),
+                       ("quests", "top_quests")):
+        print(f"  top {title}:")
+        for row in result[key][:top]:
+            print(f"    {100 * row['share']:5.1f}%  {row['total']:>16,.0f}  {row['trade']}")
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Simulate the server economy from the generator definitions")
+    parser.add_argument('--items', default=os.path.join(base_dir, 'items.json'))
+    parser.add_argument('--players', type=int, default=100_000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--shop-visit', type=float, default=0.5)
+    parser.add_argument('--spend-fraction', type=float, default=0.5)
+    parser.add_argument('--quest-rate', type=float, default=0.15)
+    parser.add_argument('--rates', help="JSON {minecraft key: units per player-day} overriding gather rates")
+    parser.add_argument('--sweep', action='append', default=[], metavar='PATH=V1,V2',
+                        help="rerun with definitions[PATH] set to each value (repeatable)")
+    parser.add_argument('--top', type=int, default=5)
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    from kenkoku.catalog import load_catalog
+    from kenkoku.definitions import load_definitions
+    from kenkoku.generator import build_requests
+    from kenkoku.resolver import Resolver
+
+    catalog = load_catalog(args.items)
+    resolver = Resolver(catalog)
+    rates = None
+    if args.rates:
+        with open(args.rates, 'r', encoding='utf-8') as f:
+            rates = json.load(f)
+
+    def run(definitions):
+        params = EconomyParams(args.players, args.days, args.seed, shop_visit=args.shop_visit,
+                               spend_fraction=args.spend_fraction, quest_rate=args.quest_rate,
+                               gather_rates=rates)
+        return simulate_economy(build_requests(definitions, catalog, resolver=resolver), catalog, params)
+
+    runs = [({}, run(load_definitions()))]
+    for spec in args.sweep:
+        path, values = parse_sweep(spec)
+        for value in values:
+            definitions = load_definitions()
+            set_path(definitions, path, value)
+            runs.append(({path: value}, run(definitions)))
+
+    if args.json:
+        print(json.dumps([dict(result, overrides=overrides) for overrides, result in runs],
+                         indent=2, ensure_ascii=False))
+        return 0
+    for overrides, result in runs:
+        label = ", ".join(f"{k}={v}" for k, v in overrides.items()) or "current definitions"
+        print(f"=== {label} ===")
+        _print_report(result, args.top)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-environment generation for generate_json.py --environments
+Builds the request files of several worlds (staging, production, past
+seasons kept for rollback, ...) in one run. Each environment is a profile in
+a JSON file:
+
+    [
+      {"name": "main", "items": "items.json", "output_dir": "json_data/main"},
+      {"name": "staging", "items": "catalogs/staging.json", "output_dir": "json_data/staging",
+       "biome_id": 2, "profession_id": 2, "lottery_ticket_id": 1610, "paper_id": 1402},
+      {"name": "season1", "items": "catalogs/season1.json", "output_dir": "json_data/season1"}
+    ]
+
+Relative paths are relative to the profile file. biome_id, profession_id and
+lottery_ticket_id default to the values in kenkoku/definitions.py; paper_id
+defaults to the catalog's minecraft:paper.
+
+Environments are regenerated concurrently on a process pool, each with the
+incremental manifest of its own output directory (kenkoku/manifest.py). The
+definitions are handed to every worker once, when it starts, not per
+environment. The summary lists the time taken by each environment. It also
+lists every definition lookup that resolves to different item ids (or is
+missing) in some environments, among the environments that make it, and the
+ids each environment was configured with (setting:paper_id etc.; paper_id is
+the minecraft:paper lookup unless the profile sets it).
+"""
+
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from kenkoku.definitions import BIOME_ID, LOTTERY_TICKET_ID, PAPER_KEY, PROFESSION_ID
+from kenkoku.manifest import load_manifest, regenerate
+from kenkoku.resolver import format_miss
+
+REQUIRED_FIELDS = ('name', 'items', 'output_dir')
+PROFILE_FIELDS = REQUIRED_FIELDS + ('biome_id', 'profession_id', 'lottery_ticket_id', 'paper_id')
+
+
+class Environment:
+    """One profile: catalog, output directory and the ids that differ between worlds."""
+
+    def __init__(self, name, items, output_dir, biome_id=BIOME_ID, profession_id=PROFESSION_ID,
+                 lottery_ticket_id=LOTTERY_TICKET_ID, paper_id=None):
+        self.name = name
+        self.items = items
+        self.output_dir = output_dir
+        self.biome_id = biome_id
+        self.profession_id = profession_id
+        self.lottery_ticket_id = lottery_ticket_id
+        self.paper_id = paper_id
+
+    def settings(self):
+        return {'biome_id': self.biome_id, 'profession_id': self.profession_id,
+                'lottery_ticket_id': self.lottery_ticket_id, 'paper_id': self.paper_id}
+
+
+def load_profiles(path):
+    """Environments listed in the JSON profile file at path (ValueError on a bad profile)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        profiles = json.load(f)
+    if isinstance(profiles, dict):
+        profiles = profiles.get('environments')
+    if not isinstance(profiles, list) or not profiles:
+        raise ValueError(f"{path}: expected a non-empty list of environment profiles")
+    base = os.path.dirname(os.path.abspath(path))
+    environments = []
+    names = set()
+    for n, profile in enumerate(profiles):
+        unknown = sorted(set(profile) - set(PROFILE_FIELDS))
+        if unknown:
+            raise ValueError(f"{path}: profile {n}: unknown fields {', '.join(unknown)}")
+        missing = [field for field in REQUIRED_FIELDS if not profile.get(field)]
+        if missing:
+            raise ValueError(f"{path}: profile {n}: missing {', '.join(missing)}")
+        if profile['name'] in names:
+            raise ValueError(f"{path}: duplicate environment {profile['name']!r}")
+        names.add(profile['name'])
+        kwargs = dict(profile)
+        kwargs['items'] = os.path.join(base, profile['items'])
+        kwargs['output_dir'] = os.path.join(base, profile['output_dir'])
+        environments.append(Environment(**kwargs))
+    return environments
+
+
+# ------------------------------------------------------------
+# Workers
+# ------------------------------------------------------------
+
+_definitions = None
+_summarize = None
+
+
+def _init_worker(definitions, summarize):
+    global _definitions, _summarize
+    _definitions = definitions
+    _summarize = summarize
+
+
+def _run(env, force=False, use_cache=True):
+    """Regenerate one environment; returns a JSON-ready outcome dict (errors included, never raised)."""
+    start = time.perf_counter()
+    outcome = {"name": env.name, "items": env.items, "output_dir": env.output_dir}
+    try:
+        result = regenerate(_definitions, env.items, env.output_dir, _summarize, force=force,
+                            use_cache=use_cache, **env.settings())
+    except Exception:
+        outcome.update(error=traceback.format_exc(), seconds=time.perf_counter() - start)
+        return outcome
+    # Lookups of every file, rebuilt now or earlier, as the manifest recorded them
+    lookups = {}
+    for entry in load_manifest(env.output_dir)['files'].values():
+        for kind, value, db_id in entry['lookups']:
+            lookups[f"{kind}:{value}"] = db_id
+    # The ids the generator was given; paper is only looked up without a paper_id
+    for name, value in env.settings().items():
+        if name == 'paper_id' and value is None:
+            value = lookups.get(f"key:{PAPER_KEY}")
+        lookups[f"setting:{name}"] = value
+    outcome.update(seconds=time.perf_counter() - start, error=None, rebuilt=result.rebuilt,
+                   written=result.written, summaries=result.summaries, dirty=result.dirty,
+                   misses=result.misses, lookups=lookups)
+    return outcome
+
+
+def generate_all(environments, definitions, summarize, workers=None, force=False, use_cache=True):
+    """Outcome dicts of every environment, in profile order."""
+    workers = min(workers or os.cpu_count() or 1, len(environments))
+    if workers == 1:
+        _init_worker(definitions, summarize)
+        return [_run(env, force, use_cache) for env in environments]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(definitions, summarize)) as pool:
+        futures = [pool.submit(_run, env, force, use_cache) for env in environments]
+        return [future.result() for future in futures]
+
+
+def resolution_differences(outcomes):
+    """
+    {lookup: {environment: db_id}} for lookups that do not resolve the same
+    in every environment that makes them (an environment that never made the
+    lookup has no entry); the ones missing in some environment come first.
+    """
+    done = [o for o in outcomes if not o["error"]]
+    differences = []
+    for lookup in {lookup for o in done for lookup in o["lookups"]}:
+        ids = {o["name"]: o["lookups"][lookup] for o in done if lookup in o["lookups"]}
+        if len(set(ids.values())) > 1:
+            differences.append((None not in ids.values(), lookup, ids))
+    return {lookup: ids for _, lookup, ids in sorted(differences, key=lambda d: d[:2])}
+
+
+def format_report(outcomes, seconds, differences, limit=50):
+    lines = []
+    for o in outcomes:
+        if o["error"]:
+            lines.append(f"  {o['name']:<12} FAILED after {o['seconds'] * 1000:.1f} ms")
+            lines.extend("    " + line for line in o["error"].rstrip().splitlines())
+            continue
+        lines.append(f"  {o['name']:<12} {o['seconds'] * 1000:8.1f} ms  rebuilt {len(o['rebuilt'])}, "
+                     f"wrote {len(o['written'])}, {len(o['misses'])} unresolved -> {o['output_dir']}")
+        for filename in o["written"]:
+            lines.append("  " + o["summaries"][filename])
+    lines.append(f"  total {seconds * 1000:.1f} ms")
+
+    done = [o for o in outcomes if not o["error"]]
+    names = [o["name"] for o in done]
+    # Misses of only some environments show up in the differences below
+    common = set.intersection(*(set(map(tuple, o["misses"])) for o in done)) if done else set()
+    if common:
+        lines.append("\nUnresolved in every environment:")
+        lines.extend(format_miss(miss) for miss in done[0]["misses"] if tuple(miss) in common)
+    if len(names) > 1:
+        if not differences:
+            lines.append("\nEvery lookup resolves to the same item id in all environments")
+        else:
+            lines.append(f"\n{len(differences)} lookups resolve differently:")
+            lines.append("  " + f"{'lookup':<50}" + "".join(f" {name:>12}" for name in names))
+            for lookup, ids in list(differences.items())[:limit]:
+                cells = "".join(f" {'n/a' if n not in ids else '-' if ids[n] is None else ids[n]:>12}"
+                                for n in names)
+                lines.append(f"  {lookup[:50]:<50}{cells}")
+            if len(differences) > limit:
+                lines.append(f"  ... {len(differences) - limit} more")
+    return "\n".join(lines)
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+Request JSON compiler for kenkoku-manage-service
+Turns the definition lists (kenkoku/definitions.py) into request payloads
+({"store": [...], "patch": [...], "delete": [...]}) in memory. Nothing here
+prints or touches the filesystem except write_requests().
+"""
+
+import json
+import os
+
+from kenkoku.definitions import (
+    BIOME_ID,
+    LOTTERY_TICKET_ID,
+    NPC_TYPE_PAWNSHOP,
+    NPC_TYPE_QUEST,
+    NPC_TYPE_SHOP,
+    PAPER_KEY,
+    PROFESSION_ID,
+)
+from kenkoku.profiling import NULL_PROFILER
+from kenkoku.resolver import Resolver
+
+
+class _Context:
+    """Per-build settings shared by every section compiler."""
+
+    def __init__(self, resolver, biome_id, profession_id, paper_id, lottery_ticket_id):
+        self.resolver = resolver
+        self.biome_id = biome_id
+        self.profession_id = profession_id
+        self.paper_id = paper_id
+        self.lottery_ticket_id = lottery_ticket_id
+        # Last NPC started by _npc(), to name entries that fail to compile
+        self.npc = None
+
+
+def _npc(ctx, name, npc_type_id, trades_key="trades", npc_id=None):
+    npc = {}
+    if npc_id is not None:
+        npc["id"] = npc_id
+    npc["name"] = name
+    npc["biome_id"] = ctx.biome_id
+    npc["profession_id"] = ctx.profession_id
+    npc["npc_type_id"] = npc_type_id
+    npc[trades_key] = []
+    ctx.npc = npc
+    return npc
+
+
+# ------------------------------------------------------------
+# Trades
+# ------------------------------------------------------------
+
+def _pawnshop_trade(item, ctx):
+    db_id = ctx.resolver.get_id_by_key(item["key"])
+    if not db_id:
+        return None
+    return {
+        "content": f"Buy {item['name']}",
+        "view_item_id": db_id,
+        "costs": [{"item_id": db_id, "quantity": 1}],
+        "rewards": [{"price": item["price"]}]
+    }
+
+
+def _shop_trade(item, ctx, cost_kinds):
+    db_id = ctx.resolver.get_id(item)
+    if not db_id:
+        return None
+
+    # Determine cost (money or ticket or original), in this order
+    if "price" in item and "price" in cost_kinds:
+        cost = {"price": item["price"]}
+    elif "ticket_cost" in item and "ticket_cost" in cost_kinds:
+        # Ticket-based exchange (use paper as ticket placeholder)
+        cost = {"item_id": ctx.paper_id, "quantity": item["ticket_cost"]}
+    elif "cost_original" in item and "cost_original" in cost_kinds:
+        cost_id = ctx.resolver.get_original(item["cost_original"])
+        if not cost_id:
+            return None
+        cost = {"item_id": cost_id, "quantity": 1}
+    else:
+        return None
+
+    return {
+        "content": f"Sell {item['name']}",
+        "view_item_id": db_id,
+        "costs": [cost],
+        "rewards": [{"item_id": db_id, "quantity": item.get("quantity", 1)}]
+    }
+
+
+def _quest_trade(quest, ctx, reward_kinds, default_reward):
+    # Requirement can be vanilla key or original item
+    req_id = None
+    if "req_key" in quest:
+        req_id = ctx.resolver.get_id_by_key(quest["req_key"])
+    elif "req_original" in quest:
+        req_id = ctx.resolver.get_original(quest["req_original"])
+    if not req_id:
+        return None
+
+    # Determine reward
+    if "reward_tickets" in quest and "reward_tickets" in reward_kinds:
+        reward = {"item_id": ctx.paper_id, "quantity": quest["reward_tickets"]}
+    elif "reward_lottery_tickets" in quest and "reward_lottery_tickets" in reward_kinds:
+        reward = {"item_id": ctx.lottery_ticket_id, "quantity": quest["reward_lottery_tickets"]}
+    elif quest.get("reward_original") and "reward_original" in reward_kinds:
+        reward_id = ctx.resolver.get_original(quest["reward_original"])
+        if not reward_id:
+            return None
+        reward = {"item_id": reward_id, "quantity": 1}
+    elif default_reward:
+        # Default to paper if not specified
+        reward = {"item_id": ctx.paper_id, "quantity": 1}
+    else:
+        return None
+
+    return {
+        "content": quest["name"],
+        "view_item_id": req_id,
+        "costs": [{"item_id": req_id, "quantity": quest["req_amount"]}],
+        "rewards": [reward]
+    }
+
+
+# ------------------------------------------------------------
+# Sections (one definition entry -> one NPC / lottery, or None)
+# ------------------------------------------------------------
+
+def _with_trades(npc, trades_key, trades):
+    npc[trades_key] = [t for t in trades if t is not None]
+    return npc if npc[trades_key] else None
+
+
+def _pawnshop_npc(cat, ctx):
+    npc = _npc(ctx, cat["category"], NPC_TYPE_PAWNSHOP)
+    return _with_trades(npc, "trades", (_pawnshop_trade(item, ctx) for item in cat["items"]))
+
+
+def _shop_npc(shop, ctx):
+    npc = _npc(ctx, shop["name"], NPC_TYPE_SHOP)
+    kinds = ("price", "ticket_cost", "cost_original")
+    return _with_trades(npc, "trades", (_shop_trade(item, ctx, kinds) for item in shop["items"]))
+
+
+def _exchange_shop_npc(shop, ctx):
+    # 防具交換所 / お食事処: ticket-for-item only
+    npc = _npc(ctx, shop["name"], NPC_TYPE_SHOP)
+    kinds = ("cost_original",)
+    return _with_trades(npc, "trades", (_shop_trade(item, ctx, kinds) for item in shop["items"]))
+
+
+def _quest_npc(cat, ctx):
+    npc = _npc(ctx, f"クエスト ({cat['difficulty']})", NPC_TYPE_QUEST)
+    kinds = ("reward_tickets", "reward_original")
+    return _with_trades(npc, "trades", (_quest_trade(q, ctx, kinds, True) for q in cat["list"]))
+
+
+def _quest_patch_npc(cat, ctx):
+    npc = _npc(ctx, f"クエスト ({cat['difficulty']})", NPC_TYPE_QUEST, "add_trades", cat["id"])
+    kinds = ("reward_tickets", "reward_lottery_tickets", "reward_original")
+    return _with_trades(npc, "add_trades", (_quest_trade(q, ctx, kinds, True) for q in cat["list"]))
+
+
+def _exchange_quest_npc(cat, ctx):
+    # 防具交換クエスト: must reward an original item
+    npc = _npc(ctx, f"クエスト ({cat['difficulty']})", NPC_TYPE_QUEST)
+    kinds = ("reward_original",)
+    return _with_trades(npc, "trades", (_quest_trade(q, ctx, kinds, False) for q in cat["list"]))
+
+
+def _lottery(lottery, ctx):
+    lottery_obj = {
+        "name": lottery["name"],
+        "rarities": []
+    }
+    for rarity in lottery["rarities"]:
+        rarity_obj = {
+            "name": rarity["name"],
+            "probability": rarity["probability"],
+            "items": []
+        }
+        for item in rarity["items"]:
+            item_id = ctx.resolver.get_id(item)
+            if item_id:
+                rarity_obj["items"].append(item_id)
+        lottery_obj["rarities"].append(rarity_obj)
+    return lottery_obj
+
+
+# Output file -> [(request array, definition name, section compiler)]
+REQUEST_FILES = {
+    "request_pawnshop.json": [("store", "buy_prices_categories", _pawnshop_npc)],
+    "request_shop.json": [("store", "shops", _shop_npc)],
+    "request_quest.json": [("store", "quests", _quest_npc)],
+    "request_quest_patch.json": [("patch", "vanilla_quest_patches", _quest_patch_npc)],
+    "request_lottery.json": [("store", "lottery_data", _lottery)],
+    "request_armor_trades.json": [
+        ("store", "armor_shops", _exchange_shop_npc),
+        ("store", "armor_quests", _exchange_quest_npc),
+    ],
+    "request_food_trades.json": [("store", "restaurant_shops", _exchange_shop_npc)],
+}
+
+
+def empty_request():
+    return {"store": [], "patch": [], "delete": []}
+
+
+def build_requests(definitions, catalog, resolver=None, biome_id=BIOME_ID,
+                   profession_id=PROFESSION_ID, lottery_ticket_id=LOTTERY_TICKET_ID,
+                   paper_id=None, only=None, traces=None, profiler=None, incomplete=None):
+    """
+    Compile every definition into request payloads in one pass.
+
+    definitions: dict like kenkoku.definitions.DEFINITIONS
+    catalog:     kenkoku.catalog.Catalog
+    resolver:    pass a Resolver to share its memo across many builds
+    only:        optional iterable of output file names to build
+    traces:      optional dict, filled with {file name: {(kind, value): db_id}}
+                 for every lookup each file made (see kenkoku/manifest.py)
+    profiler:    optional kenkoku.profiling.Profiler, one stage per file
+    incomplete:  optional set, filled with ("name", name) / ("id", npc id) of
+                 every NPC that lost trades (or was dropped) because a lookup
+                 missed, so callers do not read the gap as a removal
+
+    Returns {file name: payload} in REQUEST_FILES order.
+    """
+    if resolver is None:
+        resolver = Resolver(catalog)
+    if paper_id is None:
+        paper_id = resolver.get_id_by_key(PAPER_KEY)
+    ctx = _Context(resolver, biome_id, profession_id, paper_id, lottery_ticket_id)
+    wanted = set(only) if only is not None else None
+    profiler = profiler or NULL_PROFILER
+
+    requests = {}
+    for filename, sections in REQUEST_FILES.items():
+        if wanted is not None and filename not in wanted:
+            continue
+        request = empty_request()
+        trace = None
+        if traces is not None:
+            trace = traces[filename] = {}
+        with profiler.stage(f"build {filename}"):
+            for target, def_name, compile_entry in sections:
+                entries = definitions[def_name]
+                if isinstance(entries, dict):
+                    entries = [entries]
+                for entry in entries:
+                    # One trace per entry, to tell which NPC a miss belongs to
+                    resolver.trace = seen = {}
+                    ctx.npc = None
+                    obj = compile_entry(entry, ctx)
+                    if obj is not None:
+                        request[target].append(obj)
+                    if trace is not None:
+                        trace.update(seen)
+                    if incomplete is not None and ctx.npc is not None and None in seen.values():
+                        npc = ctx.npc
+                        incomplete.add(("id", npc["id"]) if "id" in npc else ("name", npc["name"]))
+        requests[filename] = request
+    resolver.trace = None
+    return requests
+
+
+def dump_request(request):
+    """Serialize a payload exactly like the request_*.json files."""
+    return json.dumps(request, indent=2, ensure_ascii=False)
+
+
+def atomic_write(path, data):
+    """Write bytes via a temp file + rename so readers never see half a file."""
+    directory = os.path.dirname(path) or '.'
+    import tempfile
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)  # mkstemp creates 0600
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_requests(requests, output_dir, profiler=None):
+    """Write {file name: payload} to output_dir. Returns the written paths."""
+    profiler = profiler or NULL_PROFILER
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for filename, request in requests.items():
+        path = os.path.join(output_dir, filename)
+        with profiler.stage(f"write {filename}") as stage:
+            data = dump_request(request).encode('utf-8')
+            atomic_write(path, data)
+        if stage is not None:
+            stage.info["bytes"] = len(data)
+        paths.append(path)
+    return paths
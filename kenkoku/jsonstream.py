@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming reader for the top-level arrays of items.json and npcs.json
+Yields one element at a time instead of json.load-ing the whole export:
+the file is read in chunks and each element is decoded with the stdlib
+decoder as soon as it is complete, so memory holds one chunk plus one
+element (an element larger than the chunk simply grows the buffer).
+
+Repeated values are shared across elements:
+
+  strings   values of INTERN_FIELDS (keys, names, timestamps) go through
+            sys.intern, so 10000 "minecraft:paper" are one string
+  objects   flat npc_type / biome / profession / item objects, which
+            npcs.json repeats for every NPC, trade cost and reward, are
+            pooled: each repeat is replaced by the first equal dict, so the
+            copies are freed right after decoding (treat them as read-only;
+            share=False gives private copies)
+
+Both happen in an object_pairs_hook, i.e. during decoding, not in a second
+pass over each element.
+
+Stopping early (break, or find()) closes the file without reading the rest.
+
+    for npc in iter_array('npcs.json'):
+        ...
+    ticket = find('items.json', lambda item: item['id'] == 1532)
+"""
+
+import json
+import re
+import sys
+
+CHUNK_SIZE = 1 << 16
+
+# String fields whose values repeat across elements
+INTERN_FIELDS = frozenset(('key', 'name', 'content', 'created_at', 'updated_at', 'nbt'))
+# Nested objects that are the same row each time they appear
+SHARED_FIELDS = frozenset(('npc_type', 'biome', 'profession', 'item'))
+# Distinct shared objects kept; past this, new ones are no longer pooled
+MAX_SHARED = 50000
+
+_WS = re.compile(r'[ \t\n\r]*')
+
+
+class StreamError(ValueError):
+    pass
+
+
+class _Compactor:
+    """object_pairs_hook that interns strings and pools flat nested rows while decoding."""
+
+    def __init__(self, share):
+        self.share = share
+        self.shared = {}
+
+    def __call__(self, pairs):
+        obj = {}
+        for field, value in pairs:
+            kind = type(value)
+            if kind is str:
+                if field in INTERN_FIELDS:
+                    value = sys.intern(value)
+            elif kind is dict and self.share and field in SHARED_FIELDS:
+                value = self._pooled(field, value)
+            obj[field] = value
+        return obj
+
+    def _pooled(self, field, obj):
+        if any(type(v) in (dict, list) for v in obj.values()):
+            return obj
+        signature = (field,) + tuple(obj.items())
+        pooled = self.shared.get(signature)
+        if pooled is not None:
+            return pooled
+        if len(self.shared) < MAX_SHARED:
+            self.shared[signature] = obj
+        return obj
+
+
+def iter_array(path, chunk_size=CHUNK_SIZE, intern=True, share=True):
+    """Elements of the JSON array at the top level of path, one at a time."""
+    decoder = json.JSONDecoder(object_pairs_hook=_Compactor(share) if intern else None)
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buf, eof = '', False
+        # Leading whitespace may fill whole chunks before the '['
+        while not eof and _WS.match(buf).end() == len(buf):
+            more = f.read(chunk_size)
+            eof = not more
+            buf += more
+        pos = _WS.match(buf).end()
+        if buf[pos:pos + 1] != '[':
+            raise StreamError(f"{path}: top level is not an array")
+        pos += 1
+        want_value = True
+        empty = True    # ']' may close the array in place of a value only before the first one
+        read_size = chunk_size
+        while True:
+            pos = _WS.match(buf, pos).end()
+            if pos >= len(buf) or not want_value:
+                if pos >= len(buf):
+                    if eof:
+                        raise StreamError(f"{path}: truncated array")
+                    more = f.read(read_size)
+                    eof = not more
+                    buf, pos = buf[pos:] + more, 0
+                    continue
+                char = buf[pos]
+                if char == ']':
+                    return
+                if char != ',':
+                    raise StreamError(f"{path}: expected ',' or ']' at {buf[pos:pos + 20]!r}")
+                pos += 1
+                want_value = True
+                continue
+            if buf[pos] == ']':
+                if not empty:
+                    raise StreamError(f"{path}: trailing ',' before ']'")
+                return
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                # A number ending exactly at the buffer end may continue in the next chunk
+                complete = end < len(buf) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                # Grow the read with the element, so a huge element costs O(n) rather than O(n^2)
+                read_size = max(chunk_size, len(buf) - pos)
+                more = f.read(read_size)
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+                continue
+            pos = end
+            want_value = False
+            empty = False
+            read_size = chunk_size
+            yield value
+
+
+def find(path, predicate, **kwargs):
+    """First element of the array in path matching predicate (the rest is not read), or None."""
+    for element in iter_array(path, **kwargs):
+        if predicate(element):
+            return element
+    return None
+
+
+def load_array(path, **kwargs):
+    """The whole array as a list, with repeated strings and rows shared (a leaner json.load)."""
+    return list(iter_array(path, **kwargs))
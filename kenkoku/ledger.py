@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+"""
+Write-behind money ledger for player_information
+money-system.sk, npc-system.sk and player-data-sync.sk write the whole
+balance with one UPDATE per wallet click, bill, trade and quit. This service
+takes the changes instead and writes them behind:
+
+  POST /ops      {"ops": [{"uuid": ..., "delta": n} | {"uuid": ..., "set": n}, ...]}
+                 answered once the ops are journaled (fsync); ops of one
+                 player apply in the order they arrive
+  GET  /balance  ?uuid=...  database value with the unflushed ops applied
+  POST /flush    flush now;  GET /stats  counters
+
+Ops are coalesced per player in memory (deltas summed, a set replaces what
+came before it) and flushed every --interval seconds or --batch ops, in one
+transaction of one upsert per player. The journal is a sequence of segment
+files; each flush records the last op it covers in ledger_state in the same
+transaction, so a restart replays exactly the journaled ops the database
+has not seen, and a segment is deleted once its ops are committed.
+
+    python -m kenkoku.ledger --sqlite /tmp/kenkoku.db --journal .cache/ledger --port 8765
+"""
+
+import argparse
+import glob
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger_state (id INTEGER NOT NULL PRIMARY KEY, last_seq BIGINT NOT NULL)
+"""
+DEFAULT_INTERVAL = 0.25
+DEFAULT_BATCH = 500
+
+_UPSERT = {
+    "sqlite": {
+        "delta": "INSERT INTO player_information (player_uuid, money, created_at, updated_at) "
+                 "VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP) ON CONFLICT(player_uuid) "
+                 "DO UPDATE SET money = money + excluded.money, updated_at = excluded.updated_at",
+        "set": "INSERT INTO player_information (player_uuid, money, created_at, updated_at) "
+               "VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP) ON CONFLICT(player_uuid) "
+               "DO UPDATE SET money = excluded.money, updated_at = excluded.updated_at",
+        "state": "INSERT INTO ledger_state (id, last_seq) VALUES (1, ?) "
+                 "ON CONFLICT(id) DO UPDATE SET last_seq = excluded.last_seq",
+        "balance": "SELECT money FROM player_information WHERE player_uuid = ?",
+    },
+    "mysql": {
+        "delta": "INSERT INTO player_information (player_uuid, money, created_at, updated_at) "
+                 "VALUES (%s, %s, NOW(), NOW()) ON DUPLICATE KEY UPDATE money = money + VALUES(money), "
+                 "updated_at = NOW()",
+        "set": "INSERT INTO player_information (player_uuid, money, created_at, updated_at) "
+               "VALUES (%s, %s, NOW(), NOW()) ON DUPLICATE KEY UPDATE money = VALUES(money), updated_at = NOW()",
+        "state": "INSERT INTO ledger_state (id, last_seq) VALUES (1, %s) "
+                 "ON DUPLICATE KEY UPDATE last_seq = VALUES(last_seq)",
+        "balance": "SELECT money FROM player_information WHERE player_uuid = %s",
+    },
+}
+
+
+class LedgerError(ValueError):
+    pass
+
+
+class Pending:
+    """Coalesced ops of one player: an optional absolute value, then a summed delta."""
+
+    __slots__ = ("set", "delta")
+
+    def __init__(self):
+        self.set = None
+        self.delta = 0
+
+    def apply(self, op):
+        if "set" in op:
+            self.set, self.delta = op["set"], 0
+        else:
+            self.delta += op["delta"]
+
+    def on(self, money):
+        return (self.set if self.set is not None else (money or 0)) + self.delta
+
+
+def check_op(op):
+    """A validated {"uuid", "delta"|"set"} dict (integers only: balances are whole G)."""
+    if not isinstance(op, dict) or not isinstance(op.get("uuid"), str) or not op["uuid"]:
+        raise LedgerError(f"op needs a uuid: {op!r}")
+    kinds = [k for k in ("delta", "set") if k in op]
+    if len(kinds) != 1:
+        raise LedgerError(f"op needs exactly one of delta / set: {op!r}")
+    value = op[kinds[0]]
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise LedgerError(f"{kinds[0]} must be an integer: {op!r}")
+    return {"uuid": op["uuid"], kinds[0]: value}
+
+
+# ------------------------------------------------------------
+# Journal
+# ------------------------------------------------------------
+
+class Journal:
+    """
+    Append-only JSON-lines segments (<dir>/<n>.journal). append() assigns
+    sequence numbers; sync() makes them durable, sharing one fsync between
+    the threads waiting at the same time. Lock order: sync_lock, then the
+    ledger lock.
+    """
+
+    def __init__(self, directory, fsync=True):
+        self.directory = directory
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self.segments = sorted(int(os.path.basename(p).split('.')[0])
+                               for p in glob.glob(os.path.join(directory, '*.journal')))
+        self.seq = 0
+        self.synced = 0
+        self.sync_lock = threading.Lock()
+        self._file = None
+        self.bytes_written = 0
+        self.fsyncs = 0
+
+    def _path(self, segment):
+        return os.path.join(self.directory, f"{segment:010d}.journal")
+
+    def replay(self):
+        """(seq, op) of every complete line in every segment; a torn last line is dropped."""
+        entries = []
+        for segment in self.segments:
+            with open(self._path(segment), 'rb') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    entries.append((entry.pop("seq"), entry))
+        if entries:
+            self.seq = self.synced = max(seq for seq, _ in entries)
+        return entries
+
+    def rotate(self):
+        """Start a new segment (caller holds sync_lock and the ledger lock); returns the segments before it."""
+        if self._file is not None:
+            self._flush_file()
+            self._file.close()
+            self.synced = self.seq
+        closed = list(self.segments)
+        segment = (self.segments[-1] + 1) if self.segments else 1
+        self.segments.append(segment)
+        self._file = open(self._path(segment), 'ab')
+        if self.fsync:
+            # make the new directory entry durable too
+            fd = os.open(self.directory, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        return closed
+
+    def remove(self, segments):
+        for segment in segments:
+            os.remove(self._path(segment))
+            self.segments.remove(segment)
+
+    def append(self, ops):
+        """Write ops (caller holds the ledger lock); returns their sequence numbers."""
+        seqs, lines = [], []
+        for op in ops:
+            self.seq += 1
+            seqs.append(self.seq)
+            lines.append(json.dumps(dict(op, seq=self.seq), separators=(',', ':')))
+        data = ("\n".join(lines) + "\n").encode('utf-8')
+        self._file.write(data)
+        self.bytes_written += len(data)
+        return seqs
+
+    def _flush_file(self):
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+            self.fsyncs += 1
+
+    def sync(self, seq, lock):
+        """Return once seq is durable. lock is the ledger lock guarding writes to the file."""
+        with self.sync_lock:
+            if self.synced >= seq:
+                return
+            with lock:
+                target = self.seq
+                self._file.flush()
+                fileno = self._file.fileno()
+            if self.fsync:
+                os.fsync(fileno)
+                self.fsyncs += 1
+            self.synced = target
+
+    def close(self):
+        if self._file is not None:
+            self._flush_file()
+            self._file.close()
+            self._file = None
+
+
+# ------------------------------------------------------------
+# Ledger
+# ------------------------------------------------------------
+
+def sqlite_connector(path):
+    """Connections for Ledger: used from the flush, HTTP and main threads, one at a time (flush_lock)."""
+    def connect():
+        conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+    return connect
+
+
+class Ledger:
+    def __init__(self, connect, journal_dir, dialect="sqlite", interval=DEFAULT_INTERVAL, batch=DEFAULT_BATCH,
+                 fsync=True):
+        self.connect = connect
+        self.dialect = dialect
+        self.sql = _UPSERT[dialect]
+        self.interval = interval
+        self.batch = batch
+        self.lock = threading.Lock()          # pending + journal writes
+        self.flush_lock = threading.Lock()    # one flush at a time; balance reads wait for it
+        self.pending = {}
+        self.pending_ops = 0
+        self.journal = Journal(journal_dir, fsync)
+        self.stats = {"ops": 0, "flushes": 0, "rows": 0, "recovered": 0}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.conn = connect()   # only used under flush_lock
+        self._execute_script(LEDGER_SCHEMA)
+        self._recover()
+
+    def _execute_script(self, script):
+        cursor = self.conn.cursor()
+        for statement in script.split(";"):
+            if statement.strip():
+                cursor.execute(statement)
+
+    def _last_seq(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT last_seq FROM ledger_state WHERE id = 1")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+
+    def _recover(self):
+        committed = self._last_seq()
+        entries = [(seq, op) for seq, op in self.journal.replay() if seq > committed]
+        self.journal.seq = max(self.journal.seq, committed)
+        self.journal.synced = self.journal.seq
+        for _, op in entries:
+            self.pending.setdefault(op["uuid"], Pending()).apply(op)
+        self.pending_ops = len(entries)
+        self.stats["recovered"] = len(entries)
+        self.journal.rotate()
+        if entries:
+            self.flush()
+        else:
+            self.journal.remove(self.journal.segments[:-1])
+
+    # --------------------------------------------------------
+
+    def submit(self, ops):
+        """Journal and apply ops; returns the last sequence number once it is durable."""
+        ops = [check_op(op) for op in ops]
+        if not ops:
+            return self.journal.synced
+        with self.lock:
+            seqs = self.journal.append(ops)
+            for op in ops:
+                self.pending.setdefault(op["uuid"], Pending()).apply(op)
+            self.pending_ops += len(ops)
+            self.stats["ops"] += len(ops)
+            full = self.pending_ops >= self.batch
+        self.journal.sync(seqs[-1], self.lock)
+        if full:
+            self._wake.set()
+        return seqs[-1]
+
+    def flush(self):
+        """Write every pending op in one transaction. Returns the number of players written."""
+        with self.flush_lock:
+            with self.journal.sync_lock, self.lock:
+                if not self.pending:
+                    return 0
+                batch, batch_ops = self.pending, self.pending_ops
+                self.pending, self.pending_ops = {}, 0
+                last_seq = self.journal.seq
+                closed = self.journal.rotate()
+            sets = [(uuid, p.set + p.delta) for uuid, p in batch.items() if p.set is not None]
+            deltas = [(uuid, p.delta) for uuid, p in batch.items() if p.set is None and p.delta]
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute("BEGIN")
+                if sets:
+                    cursor.executemany(self.sql["set"], sets)
+                if deltas:
+                    cursor.executemany(self.sql["delta"], deltas)
+                cursor.execute(self.sql["state"], (last_seq,))
+                cursor.execute("COMMIT")
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                # Put the batch back in front of anything that arrived meanwhile
+                with self.lock:
+                    for uuid, newer in self.pending.items():
+                        older = batch.setdefault(uuid, Pending())
+                        if newer.set is not None:
+                            older.set, older.delta = newer.set, newer.delta
+                        else:
+                            older.delta += newer.delta
+                    self.pending_ops += batch_ops
+                    self.pending = batch
+                raise
+            self.journal.remove(closed)
+            self.stats["flushes"] += 1
+            self.stats["rows"] += len(sets) + len(deltas)
+            return len(sets) + len(deltas)
+
+    def balance(self, uuid):
+        with self.flush_lock:
+            cursor = self.conn.cursor()
+            cursor.execute(self.sql["balance"], (uuid,))
+            row = cursor.fetchone()
+            with self.lock:
+                pending = self.pending.get(uuid)
+                money = row[0] if row else None
+                return pending.on(money) if pending else money
+
+    # --------------------------------------------------------
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"  WARNING: ledger flush failed, will retry: {e}", file=sys.stderr)
+                self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="ledger-flush", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        self.journal.close()
+        self.conn.close()
+
+    def counters(self):
+        with self.lock:
+            return dict(self.stats, pending_players=len(self.pending), pending_ops=self.pending_ops,
+                        last_seq=self.journal.seq, journal_bytes=self.journal.bytes_written,
+                        fsyncs=self.journal.fsyncs)
+
+
+# ------------------------------------------------------------
+# HTTP
+# ------------------------------------------------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    ledger = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        path = urlparse(self.path).path
+        if path == '/flush':
+            self._reply(200, {"written": self.ledger.flush()})
+            return
+        if path != '/ops':
+            self._reply(404, {"message": "not found"})
+            return
+        try:
+            ops = json.loads(body or b'{}').get("ops")
+            if not isinstance(ops, list):
+                raise LedgerError("'ops' must be an array")
+            seq = self.ledger.submit(ops)
+        except (LedgerError, ValueError, AttributeError) as e:
+            self._reply(422, {"message": str(e)})
+            return
+        self._reply(200, {"seq": seq})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/balance':
+            uuid = parse_qs(url.query).get('uuid', [None])[0]
+            if not uuid:
+                self._reply(422, {"message": "uuid is required"})
+                return
+            self._reply(200, {"uuid": uuid, "money": self.ledger.balance(uuid)})
+        elif url.path == '/stats':
+            self._reply(200, self.ledger.counters())
+        else:
+            self._reply(404, {"message": "not found"})
+
+
+def start_ledger(ledger, host='127.0.0.1', port=0):
+    """Serve a started Ledger on a background thread. Returns (server, base_url)."""
+    handler = type('LedgerHandler', (_Handler,), {'ledger': ledger})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Run the write-behind money ledger")
+    parser.add_argument('--sqlite', help="SQLite stand-in with player_information")
+    parser.add_argument('--mysql', metavar='HOST[:PORT]/DB', help="live MySQL server instead (needs pymysql)")
+    parser.add_argument('--user', default=os.environ.get('MYSQL_USER', 'root'))
+    parser.add_argument('--password', default=os.environ.get('MYSQL_PASSWORD', ''))
+    parser.add_argument('--journal', default=os.path.join(base_dir, '.cache', 'ledger'))
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help="seconds between flushes")
+    parser.add_argument('--batch', type=int, default=DEFAULT_BATCH, help="flush early after this many ops")
+    parser.add_argument('--no-fsync', action='store_true', help="skip fsync of the journal (not crash-safe)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    if args.mysql:
+        from kenkoku.loadreplay import mysql_connector
+        connect, dialect = mysql_connector(args.mysql, args.user, args.password), "mysql"
+    elif args.sqlite:
+        connect, dialect = sqlite_connector(args.sqlite), "sqlite"
+    else:
+        parser.error("one of --sqlite / --mysql is required")
+
+    ledger = Ledger(connect, args.journal, dialect, args.interval, args.batch, fsync=not args.no_fsync)
+    if ledger.stats["recovered"]:
+        print(f"Recovered {ledger.stats['recovered']} journaled ops")
+    ledger.start()
+    server, base_url = start_ledger(ledger, args.host, args.port)
+    print(f"Money ledger listening on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        ledger.close()
+    stats = ledger.counters()
+    print(f"{stats['ops']} ops in {stats['flushes']} transactions ({stats['rows']} row writes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
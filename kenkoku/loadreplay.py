@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+"""
+Concurrent player load replay for the NPC trade and lottery query paths
+Simulated players repeat what npc-system.sk and lottery-system.sk do against
+the database, with the SQL taken from the scripts themselves (through the
+kenkoku.sqlaudit parser, so the replay follows script edits):
+
+  open     openTradeMenu: trades, costs and rewards of one NPC
+  trade    executeTradeAndRefresh: npc type, costs, rewards, one money
+           UPDATE per priced cost / reward, then openTradeMenu again
+  lottery  right click with a ticket: lottery by name, rarities, then per
+           ticket a rarity roll (in the script), an item draw and an item fetch
+
+Every query goes through a shared worker pool of --pool connections, like
+skript-db's `thread-pool-size: 10`, so step latencies include the wait for a
+free connection. Players are threads or asyncio tasks (--mode). Each
+--players level runs for --duration seconds and reports throughput and
+p50 / p95 / p99 per step and per action.
+
+The default target is a fresh SQLite stand-in (WAL) seeded from items.json,
+npcs.json and the generated lottery requests. --sqlite reuses a stand-in;
+--mysql replays against a live server (needs pymysql, nothing is seeded).
+
+    python -m kenkoku.loadreplay --players 1,5,10,25,50 --duration 5
+    python -m kenkoku.loadreplay --mode asyncio --pool 4 --mix open=1,trade=1,lottery=0 --json replay.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from kenkoku.sqlaudit import normalize, parse_scripts, to_sqlite
+
+# (step, script, enclosing block, text of the normalized statement that identifies it)
+STEPS = (
+    ("open.trades", "npc-system.sk", "function openTradeMenu(", "FROM trades t LEFT JOIN"),
+    ("open.costs", "npc-system.sk", "function openTradeMenu(", "FROM trade_costs tc JOIN"),
+    ("open.rewards", "npc-system.sk", "function openTradeMenu(", "FROM rewards r JOIN"),
+    ("trade.type", "npc-system.sk", "function executeTrade(", "as npc_type FROM trades tr"),
+    ("trade.costs", "npc-system.sk", "function executeTrade(", "FROM trade_costs tc LEFT JOIN"),
+    ("trade.rewards", "npc-system.sk", "function executeTrade(", "FROM rewards r LEFT JOIN"),
+    ("trade.money_paid", "npc-system.sk", "function executeTrade(", "WHERE player_uuid = '?'"),
+    ("trade.money_received", "npc-system.sk", "function executeTrade(", "WHERE player_uuid = ?"),
+    ("lottery.lookup", "lottery-system.sk", "on rightclick", "FROM lotteries WHERE name"),
+    ("lottery.rarities", "lottery-system.sk", "on rightclick", "FROM rarities WHERE lottery_id"),
+    ("lottery.draw", "lottery-system.sk", "on rightclick", "FROM lottery_items WHERE"),
+    ("lottery.item", "lottery-system.sk", "on rightclick", "FROM items WHERE id"),
+)
+DEFAULT_MIX = {"open": 4, "trade": 3, "lottery": 1}
+TRADE_REFRESH_WAIT = 0.1    # executeTradeAndRefresh: two `wait 1 tick` before reopening the menu
+SEEDED_PLAYERS = 1000       # player_information rows in a fresh stand-in
+
+
+class Step:
+    """One replayed statement: SQL in the target's dialect and its %...% expressions in bind order."""
+
+    def __init__(self, name, where, sql, params, quoted):
+        self.name = name
+        self.where = where
+        self.sql = sql
+        self.params = [p for i, p in enumerate(params) if i not in quoted]
+
+    def args(self, values):
+        try:
+            return tuple(values[p] for p in self.params)
+        except KeyError as e:
+            raise KeyError(f"{self.where} ({self.name}) binds {e}, which the replay does not provide; "
+                           f"update kenkoku/loadreplay.py for the script change") from None
+
+
+def load_steps(scripts_dir, dialect="sqlite"):
+    """{step name: Step} from the scripts; LookupError when a statement has moved or changed."""
+    blocks = parse_scripts(scripts_dir)
+    steps = {}
+    for name, script, header, needle in STEPS:
+        found = [stmt for block in blocks if block.script == script and block.header.startswith(header)
+                 for stmt in block.statements if needle in stmt.sql]
+        if len(found) != 1:
+            raise LookupError(f"{name}: expected one statement containing {needle!r} in {script} "
+                              f"'{header}', found {len(found)}")
+        stmt = found[0]
+        if dialect == "mysql":
+            sql, params, quoted = normalize(stmt.raw, placeholder="%s")
+        else:
+            sql, params, quoted = to_sqlite(stmt.sql), stmt.params, stmt.quoted
+        steps[name] = Step(name, stmt.where, sql, params, set(quoted))
+    return steps
+
+
+# ------------------------------------------------------------
+# Targets
+# ------------------------------------------------------------
+
+def seed_standin(path, items_path, npcs_path, players=SEEDED_PLAYERS):
+    """Create an SQLite stand-in with items, the npcs.json NPCs, the generated lotteries and players."""
+    from kenkoku.catalog import load_catalog
+    from kenkoku.definitions import DEFINITIONS
+    from kenkoku.diff import load_snapshot
+    from kenkoku.generator import build_requests
+    from kenkoku.sqlexport import (IdState, build_export, connect_sqlite, create_standin,
+                                   export_from_snapshot, load_sqlite)
+
+    catalog = load_catalog(items_path)
+    conn = connect_sqlite(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    create_standin(conn, catalog)
+    load_sqlite(conn, export_from_snapshot(load_snapshot(npcs_path)))
+    lotteries = {filename: request for filename, request in build_requests(DEFINITIONS, catalog).items()
+                 if any("rarities" in row for row in request.get("store", ()))}
+    load_sqlite(conn, build_export(lotteries, IdState.from_sqlite(conn)))
+    conn.execute("BEGIN")
+    conn.executemany("INSERT OR IGNORE INTO player_information (player_uuid, player_name, money) VALUES (?, ?, ?)",
+                     ((str(uuid.uuid5(uuid.NAMESPACE_OID, f"kenkoku-replay-{n}")), f"replay{n}", 10 ** 9)
+                      for n in range(players)))
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def sqlite_connector(path):
+    def connect():
+        conn = sqlite3.connect(path, isolation_level=None, timeout=30)
+        conn.execute("PRAGMA journal_mode = WAL")
+        return conn
+    return connect
+
+
+def _pymysql():
+    try:
+        import pymysql
+    except ImportError:
+        raise SystemExit("pymysql is required for --mysql (pip install pymysql)")
+    return pymysql
+
+
+def mysql_connector(url, user, password):
+    """url: host[:port]/database"""
+    pymysql = _pymysql()
+    address, _, database = url.partition('/')
+    host, _, port = address.partition(':')
+
+    def connect():
+        return pymysql.connect(host=host, port=int(port or 3306), user=user, password=password,
+                               database=database, charset='utf8mb4', autocommit=True)
+    return connect
+
+
+class Pool:
+    """Worker threads with one connection each; run() blocks until a worker has executed the query."""
+
+    def __init__(self, connect, size):
+        self._connect = connect
+        self._local = threading.local()
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="replay-db")
+
+    def _execute(self, sql, args):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        cursor = conn.cursor()
+        cursor.execute(sql, args)
+        return cursor.fetchall()
+
+    def run(self, sql, args):
+        return self.executor.submit(self._execute, sql, args).result()
+
+    async def run_async(self, sql, args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._execute, sql, args)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class Targets:
+    """Ids the simulated players pick from, read from the target database."""
+
+    def __init__(self, conn):
+        def column(sql):
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            return [row[0] for row in cursor.fetchall()]
+
+        self.npc_ids = column("SELECT DISTINCT npc_id FROM trades")
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, npc_id FROM trades")
+        self.trades = cursor.fetchall()
+        self.lotteries = column("SELECT name FROM lotteries")
+        self.players = column("SELECT player_uuid FROM player_information") \
+            or [str(uuid.uuid5(uuid.NAMESPACE_OID, "kenkoku-replay-0"))]
+        if not self.npc_ids:
+            raise SystemExit("the target database has no trades to replay")
+
+
+# ------------------------------------------------------------
+# Player sessions
+# ------------------------------------------------------------
+
+class Recorder:
+    """Latencies (seconds) per step and per action; list.append is atomic under the GIL."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, name, seconds):
+        self.latencies.setdefault(name, []).append(seconds)
+
+    def error(self, name, exc):
+        self.errors.setdefault(name, []).append(f"{type(exc).__name__}: {exc}")
+
+
+def _actions(steps, targets, rng, tickets):
+    """
+    Action generators shared by both modes: each yields (step, args) and
+    receives the fetched rows, so one script flow drives threads and tasks.
+    """
+    def open_menu(npc_id):
+        for name in ("open.trades", "open.costs", "open.rewards"):
+            yield steps[name], steps[name].args({"{_npc_id}": npc_id})
+
+    def trade(player):
+        trade_id, npc_id = rng.choice(targets.trades)
+        values = {"{_tid}": trade_id, "{_uuid}": player, "{_m}": rng.randrange(10 ** 9)}
+        yield steps["trade.type"], steps["trade.type"].args(values)
+        costs = yield steps["trade.costs"], steps["trade.costs"].args(values)
+        rewards = yield steps["trade.rewards"], steps["trade.rewards"].args(values)
+        # quantity, price are the last two columns of both queries
+        for row in costs:
+            if row[-1] and row[-1] > 0:
+                yield steps["trade.money_paid"], steps["trade.money_paid"].args(values)
+        for row in rewards:
+            if row[-1] and row[-1] > 0:
+                yield steps["trade.money_received"], steps["trade.money_received"].args(values)
+        yield None, TRADE_REFRESH_WAIT
+        yield from open_menu(npc_id)
+
+    def lottery(_player):
+        values = {"{_lotteryName}": rng.choice(targets.lotteries)}
+        found = yield steps["lottery.lookup"], steps["lottery.lookup"].args(values)
+        if not found:
+            return
+        values["{_lid}"] = found[0][0]
+        rarities = yield steps["lottery.rarities"], steps["lottery.rarities"].args(values)
+        total = sum(row[2] for row in rarities)
+        if total <= 0:
+            return
+        for _ in range(tickets):
+            roll, cumulative = rng.randint(1, total), 0
+            for rarity_id, _, probability in rarities:
+                cumulative += probability
+                if roll <= cumulative:
+                    values["{_selected_rid}"] = rarity_id
+                    break
+            drawn = yield steps["lottery.draw"], steps["lottery.draw"].args(values)
+            if not drawn:
+                continue
+            values["{_item_id}"] = drawn[0][0]
+            yield steps["lottery.item"], steps["lottery.item"].args(values)
+
+    return {
+        "open": lambda player: open_menu(rng.choice(targets.npc_ids)),
+        "trade": trade,
+        "lottery": lottery if targets.lotteries else None,
+    }
+
+
+def _choose(mix, actions, rng):
+    names = [name for name, weight in mix.items() if weight > 0 and actions.get(name)]
+    weights = [mix[name] for name in names]
+    return rng.choices(names, weights)[0]
+
+
+def _player_thread(pool, steps, targets, mix, think, tickets, deadline, recorder, seed):
+    rng = random.Random(seed)
+    actions = _actions(steps, targets, rng, tickets)
+    player = rng.choice(targets.players)
+    while time.perf_counter() < deadline:
+        name = _choose(mix, actions, rng)
+        flow, rows, busy = actions[name](player), None, 0.0
+        try:
+            while True:
+                step, args = flow.send(rows)
+                if step is None:
+                    time.sleep(args)
+                    rows = None
+                    continue
+                start = time.perf_counter()
+                rows = pool.run(step.sql, args)
+                elapsed = time.perf_counter() - start
+                recorder.add(step.name, elapsed)
+                busy += elapsed
+        except StopIteration:
+            recorder.add(f"[{name}]", busy)
+        except Exception as e:
+            recorder.error(name, e)
+        if think:
+            time.sleep(rng.expovariate(1 / think))
+
+
+async def _player_task(pool, steps, targets, mix, think, tickets, deadline, recorder, seed):
+    rng = random.Random(seed)
+    actions = _actions(steps, targets, rng, tickets)
+    player = rng.choice(targets.players)
+    while time.perf_counter() < deadline:
+        name = _choose(mix, actions, rng)
+        flow, rows, busy = actions[name](player), None, 0.0
+        try:
+            while True:
+                step, args = flow.send(rows)
+                if step is None:
+                    await asyncio.sleep(args)
+                    rows = None
+                    continue
+                start = time.perf_counter()
+                rows = await pool.run_async(step.sql, args)
+                elapsed = time.perf_counter() - start
+                recorder.add(step.name, elapsed)
+                busy += elapsed
+        except StopIteration:
+            recorder.add(f"[{name}]", busy)
+        except Exception as e:
+            recorder.error(name, e)
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+
+def run_level(pool, steps, targets, players, duration, mix, think, tickets, mode="thread", seed=0):
+    """Run `players` concurrent sessions for `duration` seconds; returns (Recorder, wall seconds)."""
+    recorder = Recorder()
+    start = time.perf_counter()
+    deadline = start + duration
+    args = (pool, steps, targets, mix, think, tickets, deadline, recorder)
+    if mode == "asyncio":
+        async def run_all():
+            await asyncio.gather(*(_player_task(*args, seed * 100003 + n) for n in range(players)))
+        asyncio.run(run_all())
+    else:
+        threads = [threading.Thread(target=_player_thread, args=args + (seed * 100003 + n,), daemon=True)
+                   for n in range(players)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return recorder, time.perf_counter() - start
+
+
+# ------------------------------------------------------------
+# Reporting
+# ------------------------------------------------------------
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def summarize(recorder, wall, players, pool_size):
+    steps = {}
+    for name, values in sorted(recorder.latencies.items()):
+        ms = [v * 1000 for v in values]
+        steps[name] = {
+            "count": len(ms),
+            "per_second": len(ms) / wall,
+            "p50_ms": _percentile(ms, 50),
+            "p95_ms": _percentile(ms, 95),
+            "p99_ms": _percentile(ms, 99),
+            "max_ms": max(ms),
+        }
+    queries = sum(s["count"] for name, s in steps.items() if not name.startswith("["))
+    actions = sum(s["count"] for name, s in steps.items() if name.startswith("["))
+    return {
+        "players": players,
+        "pool": pool_size,
+        "wall_seconds": wall,
+        "actions_per_second": actions / wall,
+        "queries_per_second": queries / wall,
+        "errors": {name: len(errors) for name, errors in recorder.errors.items()},
+        "first_errors": {name: errors[0] for name, errors in recorder.errors.items()},
+        "steps": steps,
+    }
+
+
+def format_summary(summary):
+    lines = [f"{summary['players']} players, pool {summary['pool']}: "
+             f"{summary['actions_per_second']:.1f} actions/s, {summary['queries_per_second']:.1f} queries/s"
+             + (f", errors {summary['errors']}" if summary['errors'] else "")]
+    lines.append(f"  {'step':22s} {'count':>7s} {'per s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for name, s in summary["steps"].items():
+        lines.append(f"  {name:22s} {s['count']:7d} {s['per_second']:8.1f} "
+                     f"{s['p50_ms']:8.2f} {s['p95_ms']:8.2f} {s['p99_ms']:8.2f}")
+    for name, error in summary["first_errors"].items():
+        lines.append(f"  first {name} error: {error}")
+    return "\n".join(lines)
+
+
+def parse_mix(spec):
+    mix = dict.fromkeys(DEFAULT_MIX, 0)
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name not in mix:
+            raise ValueError(name)
+        mix[name] = float(weight)
+    return mix
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Replay concurrent player query load for the NPC and lottery paths")
+    parser.add_argument('--players', default="1,5,10,25,50", help="comma-separated concurrency levels")
+    parser.add_argument('--duration', type=float, default=5.0, help="seconds per level")
+    parser.add_argument('--pool', type=int, default=10, help="database worker pool size (skript-db thread-pool-size)")
+    parser.add_argument('--mode', choices=("thread", "asyncio"), default="thread")
+    parser.add_argument('--mix', default=",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()),
+                        help="action weights, e.g. open=4,trade=3,lottery=1")
+    parser.add_argument('--think-ms', type=float, default=0.0,
+                        help="mean pause between a player's actions (0: closed loop, maximum pressure)")
+    parser.add_argument('--tickets', type=int, default=1, help="tickets used per lottery right click")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--scripts', default=os.path.join(base_dir, 'minecraft_server', 'plugins', 'Skript', 'scripts'))
+    parser.add_argument('--items', default=os.path.join(base_dir, 'items.json'))
+    parser.add_argument('--npcs', default=os.path.join(base_dir, 'npcs.json'))
+    parser.add_argument('--sqlite', help="replay against this stand-in (seeded first if it does not exist)")
+    parser.add_argument('--mysql', metavar='HOST[:PORT]/DB', help="replay against a live MySQL server instead")
+    parser.add_argument('--user', default=os.environ.get('MYSQL_USER', 'root'))
+    parser.add_argument('--password', default=os.environ.get('MYSQL_PASSWORD', ''))
+    parser.add_argument('--json', help="write the per-level summaries here")
+    args = parser.parse_args(argv)
+
+    try:
+        levels = [int(n) for n in args.players.split(',')]
+        mix = parse_mix(args.mix)
+    except ValueError:
+        parser.error("--players expects N[,N...] and --mix NAME=WEIGHT[,...] with NAME in open, trade, lottery")
+
+    tmp = None
+    if args.mysql:
+        dialect, connect = "mysql", mysql_connector(args.mysql, args.user, args.password)
+    else:
+        path = args.sqlite
+        if path is None:
+            tmp = tempfile.TemporaryDirectory()
+            path = os.path.join(tmp.name, 'kenkoku.db')
+        if not os.path.exists(path):
+            seed_standin(path, args.items, args.npcs)
+        dialect, connect = "sqlite", sqlite_connector(path)
+
+    try:
+        steps = load_steps(args.scripts, dialect)
+        conn = connect()
+        targets = Targets(conn)
+        conn.close()
+        print(f"{len(targets.npc_ids)} NPCs, {len(targets.trades)} trades, {len(targets.lotteries)} lotteries, "
+              f"{len(targets.players)} players; {args.mode} mode, pool {args.pool}")
+        summaries = []
+        for players in levels:
+            pool = Pool(connect, args.pool)
+            try:
+                recorder, wall = run_level(pool, steps, targets, players, args.duration, mix,
+                                           args.think_ms / 1000, args.tickets, args.mode, args.seed)
+            finally:
+                pool.close()
+            summary = summarize(recorder, wall, players, args.pool)
+            summaries.append(summary)
+            print(format_summary(summary))
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    if args.json:
+        from kenkoku.generator import atomic_write
+        data = {"mode": args.mode, "dialect": dialect, "mix": mix, "think_ms": args.think_ms, "levels": summaries}
+        atomic_write(args.json, json.dumps(data, indent=2).encode('utf-8'))
+        print(f"Wrote {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
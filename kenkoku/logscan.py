@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+"""
+docker compose log analyzer (log.txt)
+Streams a `docker compose logs` capture (db-1 / app-1 interleaved, or a bare
+server log) and builds a timeline of
+
+  boot / ready   Minecraft container starts and "Done (...)!" (slow starts
+                 flagged above --slow-start seconds)
+  stop           graceful stops ("Stopping server")
+  killed         "Killed", "exited with code 137", OutOfMemoryError,
+                 mc-server-runner failures
+  restart        a boot without a stop / kill before it
+  db_start / db_stop / forced_close
+                 mysqld starts and shutdowns, "Forcing close of thread"
+                 warnings grouped per shutdown
+  tps            "Can't keep up! ... Running Nms or N ticks behind"
+
+The file is read in 1 MiB chunks and each chunk is scanned once per
+precompiled literal pattern, so only matching lines are ever decoded and
+memory does not grow with the file. The byte offset of the last complete
+line, the carried date and the events are kept in .cache/<log>.scan.json
+next to the log: the next run parses only what was appended (and starts
+over if the file was truncated or replaced).
+
+    python -m kenkoku.logscan log.txt
+    python -m kenkoku.logscan log.txt --new --json
+"""
+
+import argparse
+import bisect
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+from kenkoku.catalog import CACHE_DIR_NAME
+
+STATE_VERSION = 1
+CHUNK_SIZE = 1 << 20
+SLOW_START_SECONDS = 60.0
+# Forced closes this close together belong to the same mysqld shutdown
+_FORCED_CLOSE_WINDOW = 10.0
+# Bytes of the file start fingerprinted to notice a replaced / rotated log
+_HEAD_BYTES = 4096
+
+# Each pattern starts with a literal (scanned for at memchr speed, one pass
+# per pattern); the line it hits is then classified by _classify
+_TRIGGERS = [re.compile(pattern) for pattern in (
+    rb"Starting (?:the M|m)inecraft server",   # container [init] / Paper
+    rb"Done \(",
+    rb"Stopping server",
+    rb"Killed",
+    rb"xited with code",                        # "exited", led by a rarer byte
+    rb"OutOfMemoryError",
+    rb"Minecraft server failed",
+    rb"Can't keep up",
+    rb"\[MY-01(?:0116|0910|0909)\]",           # mysqld starting / shutdown complete / forcing close
+)]
+
+# A full timestamp at the start of a line's text (after the "container | " prefix)
+_STAMP = re.compile(rb'\| (20\d\d[-/]\d\d[-/]\d\d[T ]\d\d:\d\d:\d\d)')
+_CLOCK = re.compile(r'\[(\d\d):(\d\d):(\d\d) [A-Z]+\]')
+_PREFIX = re.compile(r'^(\S+)\s+\| ?')
+_DONE = re.compile(r'Done \((\d+(?:\.\d+)?)s\)!')
+_BEHIND = re.compile(r"Running (\d+)ms or (\d+) ticks behind")
+_EXIT = re.compile(r'exited with code (\d+)')
+_EXITED = re.compile(r'^(\S+) exited with code')
+_FORCED = re.compile(r"Forcing close of thread (\d+)\s+user: '([^']*)'")
+
+
+class Event:
+    def __init__(self, when, kind, container, detail, offset, data=None):
+        self.when = when              # "YYYY-MM-DD HH:MM:SS" or None
+        self.kind = kind
+        self.container = container    # "app-1", "db-1", ... or None for a bare log
+        self.detail = detail
+        self.offset = offset          # byte offset of the line
+        self.data = data or {}
+
+    def to_dict(self):
+        return {"when": self.when, "kind": self.kind, "container": self.container,
+                "detail": self.detail, "offset": self.offset, "data": self.data}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["when"], d["kind"], d["container"], d["detail"], d["offset"], d.get("data"))
+
+
+# ------------------------------------------------------------
+# State
+# ------------------------------------------------------------
+
+def state_path_for(log_path):
+    log_path = os.path.abspath(log_path)
+    return os.path.join(os.path.dirname(log_path), CACHE_DIR_NAME, os.path.basename(log_path) + '.scan.json')
+
+
+def _head_digest(path, length):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read(length)).hexdigest()
+
+
+def new_state():
+    return {"version": STATE_VERSION, "offset": 0, "head": None, "head_len": 0, "stamps": {},
+            "running": False, "booting": False, "events": []}
+
+
+def load_state(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return new_state()
+    return state if state.get("version") == STATE_VERSION else new_state()
+
+
+def save_state(path, state):
+    from kenkoku.generator import atomic_write
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, json.dumps(state, ensure_ascii=False).encode('utf-8'))
+
+
+# ------------------------------------------------------------
+# Scanning
+# ------------------------------------------------------------
+
+def _format_stamp(raw):
+    """b'2025-12-17T04:55:34' / b'2025/12/17 04:55:34' -> '2025-12-17 04:55:34'."""
+    text = raw.decode('ascii')
+    return f"{text[0:4]}-{text[5:7]}-{text[8:10]} {text[11:19]}"
+
+
+def _clock_when(stamp, clock):
+    """Date of the last full timestamp combined with a [HH:MM:SS] clock."""
+    if stamp is None:
+        return None
+    date, last = stamp[:10], stamp[11:19]
+    when = f"{date} {clock}"
+    # The clock went backwards by more than half a day: it is the next day
+    if clock < last and _seconds(last) - _seconds(clock) > 12 * 3600:
+        from datetime import date as _date, timedelta
+        day = _date.fromisoformat(date) + timedelta(days=1)
+        when = f"{day.isoformat()} {clock}"
+    return when
+
+
+def _seconds(clock):
+    h, m, s = clock.split(':')
+    return int(h) * 3600 + int(m) * 60 + int(s)
+
+
+def _classify(line):
+    """(kind, detail, data) for a triggered line, or None for a false positive."""
+    if "Can't keep up" in line:
+        match = _BEHIND.search(line)
+        if match:
+            ms, ticks = int(match.group(1)), int(match.group(2))
+            return "tps", f"{ms}ms / {ticks} ticks behind", {"behind_ms": ms, "ticks": ticks}
+        return "tps", "can't keep up", {}
+    if "[MY-010909]" in line:
+        match = _FORCED.search(line)
+        user = match.group(2) if match else None
+        return "forced_close", "", {"count": 1, "users": {user: 1} if user else {}}
+    if "[MY-010116]" in line:
+        return "db_start", "mysqld starting", {}
+    if "[MY-010910]" in line:
+        return "db_stop", "mysqld shutdown complete", {}
+    if "Starting the Minecraft server" in line or "Starting minecraft server version" in line:
+        return "boot", "server starting", {}
+    match = _DONE.search(line)
+    if match:
+        seconds = float(match.group(1))
+        return "ready", f"started in {seconds:g}s", {"seconds": seconds}
+    if "Stopping server" in line:
+        return "stop", "Stopping server", {}
+    match = _EXIT.search(line)
+    if match:
+        code = int(match.group(1))
+        if code == 0:
+            return "exit", "exited with code 0", {"code": 0}
+        reason = " (SIGKILL, e.g. the OOM killer)" if code == 137 else ""
+        return "killed", f"exited with code {code}{reason}", {"code": code}
+    if "OutOfMemoryError" in line:
+        return "killed", "java.lang.OutOfMemoryError", {}
+    if "Minecraft server failed" in line:
+        return "killed", "mc-server-runner: Minecraft server failed", {}
+    body = _PREFIX.sub('', line).strip()
+    if body == "Killed" or body.endswith(" Killed"):
+        return "killed", "Killed (OOM killer or SIGKILL)", {}
+    return None
+
+
+class Scanner:
+    """Incremental scanner: feed() complete-line chunks in file order."""
+
+    def __init__(self, state, slow_start=SLOW_START_SECONDS):
+        self.state = state
+        self.slow_start = slow_start
+        self.events = [Event.from_dict(e) for e in state["events"]]
+        self.new_events = []
+
+    def feed(self, chunk, base):
+        """chunk: bytes ending at a line boundary; base: its file offset."""
+        positions = set()
+        for pattern in _TRIGGERS:
+            for match in pattern.finditer(chunk):
+                positions.add(chunk.rfind(b'\n', 0, match.start()) + 1)
+
+        # Full timestamps per container: {container: ([byte position], [when])}
+        stamps = {}
+        for match in _STAMP.finditer(chunk):
+            pos = match.start()
+            line_start = chunk.rfind(b'\n', 0, pos) + 1
+            container = chunk[line_start:pos].split(None, 1)[0].decode('utf-8', 'replace')
+            entry = stamps.setdefault(container, ([], []))
+            entry[0].append(pos)
+            entry[1].append(_format_stamp(match.group(1)))
+
+        for start in sorted(positions):
+            end = chunk.find(b'\n', start)
+            if end == -1:
+                end = len(chunk)
+            line = chunk[start:end].decode('utf-8', 'replace')
+            prefix = _PREFIX.match(line)
+            when, exact = self._when(line, prefix.group(1) if prefix else None, stamps, start, end)
+            self._line(line, base + start, when, exact)
+
+        # Carry each container's last timestamp into the next chunk
+        for container, (_, whens) in stamps.items():
+            self.state["stamps"][container] = whens[-1]
+
+    def _when(self, line, container, stamps, start, end):
+        """
+        (timestamp, exact?) of a line: its own, else its [HH:MM:SS] clock on the
+        container's last date, else the container's nearest timestamp (not exact).
+        """
+        positions, whens = stamps.get(container, ((), ()))
+        i = bisect.bisect_right(positions, end) - 1
+        if i >= 0 and positions[i] >= start:
+            return whens[i], True
+        carried = whens[i] if i >= 0 else self.state["stamps"].get(container)
+        if carried is None:
+            # Nothing earlier from this container: its next timestamp in the chunk
+            carried = whens[i + 1] if i + 1 < len(whens) else None
+        clock = _CLOCK.search(line)
+        if clock:
+            return _clock_when(carried, ':'.join(clock.groups())), True
+        return carried, False
+
+    def _line(self, line, offset, when, exact=True):
+        classified = _classify(line)
+        if classified is None:
+            return
+        kind, detail, data = classified
+        prefix = _PREFIX.match(line) or _EXITED.match(line)
+        container = prefix.group(1) if prefix else None
+        previous = self._last(container)
+        if not exact:
+            # No time on the line: it happened no earlier than the container's last event
+            if previous is not None and previous.when and (when is None or previous.when > when):
+                when = previous.when
+            data["approx"] = True
+
+        if kind == "forced_close":
+            last = self.events[-1] if self.events else None
+            if last is not None and last.kind == "forced_close" and _close_together(last.when, when):
+                last.data["count"] += 1
+                for user, count in data["users"].items():
+                    last.data["users"][user] = last.data["users"].get(user, 0) + count
+                last.detail = _forced_detail(last.data)
+                return
+            detail = _forced_detail(data)
+        elif kind == "boot":
+            if self.state["booting"]:
+                # The container's "[init] Starting" and Paper's own line are one boot;
+                # the latter carries a clock, so it dates the boot when the former could not
+                if previous is not None and previous.data.get("approx") and exact:
+                    previous.when = when
+                    del previous.data["approx"]
+                return
+            if self.state["running"]:
+                kind = "restart"
+                detail = "server starting without a stop / kill before it (unclean restart)"
+            self.state["running"] = self.state["booting"] = True
+        elif kind == "ready":
+            self.state["booting"] = False
+            if data["seconds"] > self.slow_start:
+                data["slow"] = True
+                detail += f" (slow start, > {self.slow_start:g}s)"
+        elif kind in ("stop", "killed", "exit"):
+            # "Killed" then "app-1 exited with code 137" (or a stop then exit 0) is one event
+            if (data.get("code") is not None and previous is not None
+                    and previous.kind in ("stop", "killed") and not self.state["running"]):
+                previous.data.setdefault("code", data["code"])
+                previous.detail += f", exited with code {data['code']}"
+                return
+            self.state["running"] = self.state["booting"] = False
+        self._add(Event(when, kind, container, detail, offset, data))
+
+    def _last(self, container):
+        for event in reversed(self.events):
+            if event.container == container:
+                return event
+        return None
+
+    def _add(self, event):
+        self.events.append(event)
+        self.new_events.append(event)
+
+    def finish(self):
+        self.state["events"] = [e.to_dict() for e in self.events]
+
+
+def _close_together(a, b):
+    if a is None or b is None or a[:10] != b[:10]:
+        return a == b
+    return abs(_seconds(b[11:]) - _seconds(a[11:])) <= _FORCED_CLOSE_WINDOW
+
+
+def _forced_detail(data):
+    users = ", ".join(f"{user} x{count}" for user, count in sorted(data["users"].items()))
+    return f"{data['count']} connection(s) force-closed" + (f" ({users})" if users else "")
+
+
+def scan(log_path, state=None, slow_start=SLOW_START_SECONDS, chunk_size=CHUNK_SIZE):
+    """
+    Scan log_path from the offset recorded in state (a fresh state if None).
+    Returns (scanner, bytes read). The state is updated in place.
+    """
+    if state is None:
+        state = new_state()
+    size = os.path.getsize(log_path)
+    # Truncated, or the first bytes changed: a different file, start over
+    if size < state["offset"] or (state["head_len"]
+                                  and _head_digest(log_path, state["head_len"]) != state["head"]):
+        state.clear()
+        state.update(new_state())
+
+    scanner = Scanner(state, slow_start)
+    offset = state["offset"]
+    read = 0
+    with open(log_path, 'rb') as f:
+        f.seek(offset)
+        pending = b''
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            read += len(block)
+            block = pending + block
+            cut = block.rfind(b'\n') + 1
+            if cut == 0:
+                pending = block
+                continue
+            scanner.feed(block[:cut], offset)
+            offset += cut
+            pending = block[cut:]
+    # An unterminated last line is read again next time
+    state["offset"] = offset
+    if state["head_len"] < _HEAD_BYTES:
+        state["head_len"] = min(offset, _HEAD_BYTES)
+        state["head"] = _head_digest(log_path, state["head_len"])
+    scanner.finish()
+    return scanner, read
+
+
+# ------------------------------------------------------------
+# Report
+# ------------------------------------------------------------
+
+_KIND_LABELS = {
+    "boot": "boot", "ready": "ready", "stop": "stop", "exit": "exit", "killed": "KILLED",
+    "restart": "RESTART", "db_start": "db start", "db_stop": "db stop",
+    "forced_close": "db close", "tps": "TPS drop",
+}
+
+
+def summarize(events):
+    counts = {}
+    for event in events:
+        counts[event.kind] = counts.get(event.kind, 0) + 1
+    slow = [e for e in events if e.kind == "ready" and e.data.get("slow")]
+    forced = sum(e.data.get("count", 0) for e in events if e.kind == "forced_close")
+    worst_tps = max((e.data.get("behind_ms", 0) for e in events if e.kind == "tps"), default=0)
+    return {
+        "boots": counts.get("boot", 0) + counts.get("restart", 0),
+        "unclean_restarts": counts.get("restart", 0),
+        "stops": counts.get("stop", 0),
+        "kills": counts.get("killed", 0),
+        "slow_starts": len(slow),
+        "db_shutdowns": counts.get("db_stop", 0),
+        "forced_closes": forced,
+        "tps_drops": counts.get("tps", 0),
+        "worst_behind_ms": worst_tps,
+    }
+
+
+def format_event(event):
+    when = (event.when or "????-??-?? ??:??:??") + ("~" if event.data.get("approx") else " ")
+    return f"{when} {(event.container or '-'):<8} {_KIND_LABELS.get(event.kind, event.kind):<9} {event.detail}"
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Timeline of restarts, kills, forced closes and TPS drops")
+    parser.add_argument('log', nargs='?', default=os.path.join(base_dir, 'log.txt'))
+    parser.add_argument('--state', help="state file (default: .cache/<log>.scan.json next to the log)")
+    parser.add_argument('--reset', action='store_true', help="forget the saved offset and rescan")
+    parser.add_argument('--new', action='store_true', help="only list events found by this run")
+    parser.add_argument('--slow-start', type=float, default=SLOW_START_SECONDS,
+                        help="flag \"Done (Ns)!\" above this many seconds")
+    parser.add_argument('--kinds', help="comma-separated event kinds to list (e.g. killed,restart,tps)")
+    parser.add_argument('--json', action='store_true', help="print events and summary as JSON")
+    args = parser.parse_args(argv)
+
+    state_path = args.state or state_path_for(args.log)
+    state = new_state() if args.reset else load_state(state_path)
+    start = time.perf_counter()
+    scanner, read = scan(args.log, state, args.slow_start)
+    elapsed = time.perf_counter() - start
+    save_state(state_path, state)
+
+    events = scanner.new_events if args.new else scanner.events
+    if args.kinds:
+        wanted = set(args.kinds.split(','))
+        events = [e for e in events if e.kind in wanted]
+    summary = summarize(scanner.events)
+    if args.json:
+        print(json.dumps({"events": [e.to_dict() for e in events], "summary": summary,
+                          "read_bytes": read, "offset": state["offset"]}, ensure_ascii=False, indent=1))
+        return 0
+
+    # docker compose logs groups lines by container; list them by time
+    for event in sorted(events, key=lambda e: e.when or ''):
+        print(format_event(event))
+    rate = read / elapsed / 1e6 if elapsed > 0 else 0.0
+    print(f"\nRead {read} new bytes in {elapsed * 1000:.1f} ms ({rate:.0f} MB/s), "
+          f"{len(scanner.new_events)} new events")
+    print("  " + ", ".join(f"{name.replace('_', ' ')}: {value}" for name, value in summary.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
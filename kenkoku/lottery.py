@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+"""
+Lottery (福引) engine
+Models a draw exactly like lottery-system.sk: pick a rarity weighted by its
+probability, then one of its lottery_items uniformly (an empty rarity gives
+nothing). The two steps are flattened into a single Walker/Vose alias table,
+so one draw is one uniform slot + one coin flip, and NumPy can draw millions
+at once.
+
+    python -m kenkoku.lottery --draws 10000000
+    python -m kenkoku.lottery --request json_data/main/request_lottery.json --export alias.json --sql alias.sql
+
+Batch sampling needs NumPy (pip install numpy); building / exporting the
+table and single draws do not.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from fractions import Fraction
+
+Z_95 = 1.959963984540054
+
+
+class Outcome:
+    """One possible result of a draw."""
+
+    def __init__(self, rarity, item_id, quantity, weight):
+        self.rarity = rarity
+        self.item_id = item_id      # None for an empty rarity (ハズレ without items)
+        self.quantity = quantity
+        self.weight = weight        # Fraction, sums to 1 over the table
+
+    def to_dict(self):
+        return {"rarity": self.rarity, "item_id": self.item_id, "quantity": self.quantity}
+
+
+class AliasTable:
+    """Walker/Vose alias table over a list of Outcomes."""
+
+    def __init__(self, name, outcomes):
+        self.name = name
+        self.outcomes = outcomes
+        self.prob, self.alias = _build_alias([float(o.weight) for o in outcomes])
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    def draw(self, rng=random):
+        """Single draw (pure Python). Returns an Outcome."""
+        slot = rng.randrange(len(self.outcomes))
+        if rng.random() < self.prob[slot]:
+            return self.outcomes[slot]
+        return self.outcomes[self.alias[slot]]
+
+    def sample(self, n, rng):
+        """n draws as an array of outcome indexes (rng: numpy.random.Generator)."""
+        np = _numpy()
+        prob = np.asarray(self.prob)
+        alias = np.asarray(self.alias, dtype=np.int64)
+        slots = rng.integers(0, len(self.outcomes), size=n)
+        keep = rng.random(n) < prob[slots]
+        return np.where(keep, slots, alias[slots])
+
+    def to_dict(self):
+        """Exportable table: pick slot uniformly, keep it if u < prob else take alias."""
+        return {
+            "lottery": self.name,
+            "size": len(self.outcomes),
+            "slots": [
+                dict(outcome.to_dict(), slot=i, prob=self.prob[i], alias=self.alias[i])
+                for i, outcome in enumerate(self.outcomes)
+            ],
+        }
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise SystemExit("numpy is required for batch sampling (pip install numpy)")
+    return numpy
+
+
+def _build_alias(weights):
+    """Vose's alias method. weights need not be normalized."""
+    n = len(weights)
+    total = sum(weights)
+    if n == 0 or total <= 0:
+        raise ValueError("alias table needs at least one positive weight")
+    scaled = [w * n / total for w in weights]
+    prob = [0.0] * n
+    alias = list(range(n))
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = (scaled[l] + scaled[s]) - 1.0
+        (small if scaled[l] < 1.0 else large).append(l)
+    # Leftovers are 1.0 up to rounding error
+    for i in large + small:
+        prob[i] = 1.0
+    return prob, alias
+
+
+def build_table(lottery):
+    """AliasTable from a lottery payload ({"name", "rarities": [{"name", "probability", "items": [ids]}]})."""
+    rarities = [r for r in lottery["rarities"] if r["probability"] > 0]
+    total = sum(r["probability"] for r in rarities)
+    outcomes = []
+    for rarity in rarities:
+        p = Fraction(rarity["probability"], total)
+        items = rarity["items"]
+        if not items:
+            outcomes.append(Outcome(rarity["name"], None, 0, p))
+            continue
+        for item in items:
+            # Payload items are plain ids; {"item_id", "quantity"} rows are accepted too
+            if isinstance(item, dict):
+                item_id, quantity = item["item_id"], item.get("quantity", 1)
+            else:
+                item_id, quantity = item, 1
+            outcomes.append(Outcome(rarity["name"], item_id, quantity, p / len(items)))
+    return AliasTable(lottery["name"], outcomes)
+
+
+def item_values(requests):
+    """
+    Money value per unit of each item id, derived from request payloads:
+    the 買取屋 price when it can be sold, otherwise the shop price.
+    """
+    sell, buy = {}, {}
+    for request in requests.values():
+        for npc in request.get("store", ()):
+            for trade in npc.get("trades", ()):
+                costs, rewards = trade["costs"], trade["rewards"]
+                if len(costs) != 1 or len(rewards) != 1:
+                    continue
+                cost, reward = costs[0], rewards[0]
+                if "price" in reward and cost.get("item_id"):
+                    sell[cost["item_id"]] = reward["price"] / cost.get("quantity", 1)
+                elif "price" in cost and reward.get("item_id"):
+                    buy.setdefault(reward["item_id"], cost["price"] / reward.get("quantity", 1))
+    values = dict(buy)
+    values.update(sell)
+    return values
+
+
+# ------------------------------------------------------------
+# Simulation / statistics
+# ------------------------------------------------------------
+
+def simulate(table, draws, seed=None, batch=1 << 22, values=None):
+    """
+    Draw `draws` times in batches. Returns (counts per outcome, payout stats, seconds).
+    Payout stats are (sum, sum of squares) of the per-draw value.
+    """
+    np = _numpy()
+    rng = np.random.default_rng(seed)
+    counts = np.zeros(len(table), dtype=np.int64)
+    per_draw = np.array([
+        o.quantity * (values or {}).get(o.item_id, 0.0) if o.item_id is not None else 0.0
+        for o in table.outcomes
+    ])
+    total = total_sq = 0.0
+    start = time.perf_counter()
+    remaining = draws
+    while remaining > 0:
+        n = min(batch, remaining)
+        idx = table.sample(n, rng)
+        batch_counts = np.bincount(idx, minlength=len(table))
+        counts += batch_counts
+        total += float(batch_counts @ per_draw)
+        total_sq += float(batch_counts @ (per_draw * per_draw))
+        remaining -= n
+    return counts, (total, total_sq), time.perf_counter() - start
+
+
+def wilson_interval(hits, n, z=Z_95):
+    if n == 0:
+        return 0.0, 0.0
+    p = hits / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def expected_payout(table, values):
+    """Exact expected money value of one draw."""
+    return sum(float(o.weight) * o.quantity * values.get(o.item_id, 0.0)
+               for o in table.outcomes if o.item_id is not None)
+
+
+def report(table, counts, payout, draws, seconds, values, names=None):
+    """Summary dict for one simulation run."""
+    names = names or {}
+    outcomes = []
+    for outcome, hits in zip(table.outcomes, counts.tolist()):
+        lo, hi = wilson_interval(hits, draws)
+        outcomes.append(dict(
+            outcome.to_dict(),
+            name=names.get(outcome.item_id),
+            expected=float(outcome.weight),
+            observed=hits / draws,
+            ci95=[lo, hi],
+        ))
+
+    rarities = {}
+    for outcome, row in zip(table.outcomes, outcomes):
+        agg = rarities.setdefault(outcome.rarity, {"expected": 0.0, "hits": 0})
+        agg["expected"] += row["expected"]
+        agg["hits"] += round(row["observed"] * draws)
+    for agg in rarities.values():
+        agg["observed"] = agg["hits"] / draws
+        agg["ci95"] = list(wilson_interval(agg.pop("hits"), draws))
+
+    total, total_sq = payout
+    mean = total / draws
+    var = max(0.0, total_sq / draws - mean * mean)
+    half = Z_95 * math.sqrt(var / draws)
+    unpriced = sorted({o.item_id for o in table.outcomes if o.item_id is not None and o.item_id not in values})
+    return {
+        "lottery": table.name,
+        "draws": draws,
+        "seconds": seconds,
+        "draws_per_second": draws / seconds if seconds else None,
+        "payout_per_draw": {
+            "expected": expected_payout(table, values),
+            "observed": mean,
+            "ci95": [mean - half, mean + half],
+        },
+        "unpriced_items": unpriced,
+        "rarities": rarities,
+        "outcomes": outcomes,
+    }
+
+
+# ------------------------------------------------------------
+# Export
+# ------------------------------------------------------------
+
+ALIAS_SQL_TABLE = 'lottery_alias_slots'
+# Thresholds are stored as integers so the server can compare with
+# `random integer between 1 and ALIAS_SCALE`
+ALIAS_SCALE = 1_000_000
+
+
+def export_sql(table, lottery_id_expr=None):
+    """SQL that replaces the alias slots of one lottery."""
+    if lottery_id_expr is None:
+        name = table.name.replace("'", "''")
+        lottery_id_expr = f"(SELECT id FROM lotteries WHERE name = '{name}' LIMIT 1)"
+    lines = [
+        f"CREATE TABLE IF NOT EXISTS {ALIAS_SQL_TABLE} (",
+        "    lottery_id BIGINT UNSIGNED NOT NULL,",
+        "    slot INT NOT NULL,",
+        "    threshold INT NOT NULL,",
+        "    item_id BIGINT UNSIGNED NULL,",
+        "    quantity INT NOT NULL,",
+        "    alias_item_id BIGINT UNSIGNED NULL,",
+        "    alias_quantity INT NOT NULL,",
+        "    PRIMARY KEY (lottery_id, slot)",
+        ");",
+        "START TRANSACTION;",
+        f"SET @lottery_id = {lottery_id_expr};",
+        f"DELETE FROM {ALIAS_SQL_TABLE} WHERE lottery_id = @lottery_id;",
+    ]
+    rows = []
+    for i, outcome in enumerate(table.outcomes):
+        alias = table.outcomes[table.alias[i]]
+        threshold = round(table.prob[i] * ALIAS_SCALE)
+        rows.append(f"(@lottery_id, {i}, {threshold}, {_sql_id(outcome.item_id)}, {outcome.quantity}, "
+                    f"{_sql_id(alias.item_id)}, {alias.quantity})")
+    lines.append(f"INSERT INTO {ALIAS_SQL_TABLE} "
+                 "(lottery_id, slot, threshold, item_id, quantity, alias_item_id, alias_quantity) VALUES")
+    lines.append(",\n".join(rows) + ";")
+    lines.append("COMMIT;")
+    return "\n".join(lines) + "\n"
+
+
+def _sql_id(item_id):
+    return "NULL" if item_id is None else str(int(item_id))
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Simulate lottery draws with an alias table")
+    parser.add_argument('--request', help="request_lottery.json to use instead of the definitions")
+    parser.add_argument('--items', default=os.path.join(base_dir, 'items.json'))
+    parser.add_argument('--draws', type=int, default=10_000_000)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--count', type=int, default=1, help="draws per ticket (10 for 10連)")
+    parser.add_argument('--values', help="JSON {item_id: value} overriding derived item values")
+    parser.add_argument('--export', help="write the alias tables as a JSON list, one per lottery")
+    parser.add_argument('--sql', help="write the alias tables as SQL for the lottery_alias_slots table")
+    parser.add_argument('--json', action='store_true', help="print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    from kenkoku.catalog import load_catalog
+    from kenkoku.definitions import DEFINITIONS
+    from kenkoku.generator import atomic_write, build_requests
+
+    catalog = load_catalog(args.items)
+    requests = build_requests(DEFINITIONS, catalog)
+    if args.request:
+        with open(args.request, 'r', encoding='utf-8') as f:
+            lotteries = json.load(f)["store"]
+    else:
+        lotteries = requests["request_lottery.json"]["store"]
+
+    values = item_values(requests)
+    if args.values:
+        with open(args.values, 'r', encoding='utf-8') as f:
+            values.update({int(k): float(v) for k, v in json.load(f).items()})
+    names = {}
+    for item_id in {i for lot in lotteries for r in lot["rarities"] for i in r["items"] if isinstance(i, int)}:
+        if item_id in catalog.all_items:
+            names[item_id] = catalog.all_items[item_id].get('name') or catalog.all_items[item_id].get('key')
+
+    reports = []
+    tables = []
+    for lottery in lotteries:
+        table = build_table(lottery)
+        tables.append(table)
+        counts, payout, seconds = simulate(table, args.draws, args.seed, values=values)
+        result = report(table, counts, payout, args.draws, seconds, values, names)
+        per_draw = result["payout_per_draw"]
+        result["payout_per_ticket"] = {
+            "expected": per_draw["expected"] * args.count,
+            "observed": per_draw["observed"] * args.count,
+            "ci95": [x * args.count for x in per_draw["ci95"]],
+        }
+        reports.append(result)
+
+    # Every lottery in one file each, written once all tables are built
+    if args.export:
+        export = json.dumps([table.to_dict() for table in tables], indent=2, ensure_ascii=False)
+        atomic_write(args.export, export.encode('utf-8'))
+    if args.sql:
+        atomic_write(args.sql, "".join(export_sql(table) for table in tables).encode('utf-8'))
+
+    if args.json:
+        print(json.dumps(reports, indent=2, ensure_ascii=False))
+        return 0
+
+    for result in reports:
+        print(f"=== {result['lottery']} ({result['draws']:,} draws, "
+              f"{result['draws_per_second'] / 1e6:.1f}M draws/s) ===")
+        print("Rarity                expected   observed   95% CI")
+        for name, agg in result["rarities"].items():
+            print(f"  {name:<16} {agg['expected']:9.5f}  {agg['observed']:9.5f}  "
+                  f"[{agg['ci95'][0]:.5f}, {agg['ci95'][1]:.5f}]")
+        print("Outcome")
+        for row in result["outcomes"]:
+            label = row["name"] or (f"item {row['item_id']}" if row["item_id"] is not None else "(nothing)")
+            print(f"  {row['rarity']:<8} {label:<28} {row['expected']:9.5f}  {row['observed']:9.5f}  "
+                  f"[{row['ci95'][0]:.5f}, {row['ci95'][1]:.5f}]")
+        ticket = result["payout_per_ticket"]
+        print(f"Expected payout per ticket ({args.count} draws): {ticket['expected']:.1f} "
+              f"(observed {ticket['observed']:.1f}, 95% CI [{ticket['ci95'][0]:.1f}, {ticket['ci95'][1]:.1f}])")
+        if result["unpriced_items"]:
+            print(f"  unpriced items (counted as 0): {result['unpriced_items']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
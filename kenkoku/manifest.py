@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental regeneration manifest
+Keeps <output dir>/.manifest.json with one entry per request file:
+
+  inputs    sha256 of the definitions the file is compiled from, the build
+            settings, the compiler source and seed-items.sk (its seeds decide
+            what deduplicated original names resolve to)
+  lookups   every (kind, value) -> db_id the file resolved
+  output    sha256 of the written file (plus size / mtime to skip hashing)
+  uploaded  output hash last uploaded by kenkoku.upload --dirty
+  npcs      names of every NPC the file has ever stored (generate_json.py
+            --diff --prune-npcs only deletes live NPCs named here)
+
+A file is rebuilt only when its inputs hash changed, one of its lookups
+resolves differently against the current items.json, or the file on disk is
+missing / no longer matches. When items.json is unchanged (same size and
+mtime, or same sha256) the catalog is not even opened, so a no-op run costs
+a few stats and hashes.
+"""
+
+import hashlib
+import json
+import os
+
+from kenkoku.definitions import BIOME_ID, LOTTERY_TICKET_ID, PAPER_KEY, PROFESSION_ID
+from kenkoku.generator import REQUEST_FILES, atomic_write, build_requests, dump_request
+from kenkoku.profiling import NULL_PROFILER
+from kenkoku.resolver import SEED_SCRIPT, Resolver
+
+MANIFEST_NAME = '.manifest.json'
+MANIFEST_VERSION = 1
+
+# Changing these changes every output, so they are part of each inputs hash
+_COMPILER_SOURCES = ('generator.py', 'resolver.py', 'originals.py')
+
+
+def manifest_path(output_dir):
+    return os.path.join(output_dir, MANIFEST_NAME)
+
+
+def load_manifest(output_dir):
+    """The manifest dict for output_dir, or an empty one if missing / stale."""
+    try:
+        with open(manifest_path(output_dir), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = None
+    if not manifest or manifest.get('version') != MANIFEST_VERSION:
+        manifest = {'version': MANIFEST_VERSION, 'catalog': None, 'files': {}}
+    return manifest
+
+
+def save_manifest(output_dir, manifest):
+    os.makedirs(output_dir, exist_ok=True)
+    data = json.dumps(manifest, indent=1, ensure_ascii=False, sort_keys=True)
+    atomic_write(manifest_path(output_dir), data.encode('utf-8'))
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _compiler_digest():
+    h = hashlib.sha256()
+    base = os.path.dirname(os.path.abspath(__file__))
+    for name in _COMPILER_SOURCES:
+        with open(os.path.join(base, name), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def _seed_digest():
+    try:
+        with open(SEED_SCRIPT, 'rb') as f:
+            return _sha256(f.read())
+    except OSError:
+        return None
+
+
+def inputs_digests(definitions, settings):
+    """{file name: sha256 of its definitions + settings + compiler source + seed-items.sk}."""
+    common = json.dumps([_compiler_digest(), _seed_digest(), settings], sort_keys=True)
+    def_hashes = {}
+    digests = {}
+    for filename, sections in REQUEST_FILES.items():
+        h = hashlib.sha256(common.encode('utf-8'))
+        for target, def_name, compile_entry in sections:
+            if def_name not in def_hashes:
+                blob = json.dumps(definitions[def_name], sort_keys=True, ensure_ascii=False)
+                def_hashes[def_name] = _sha256(blob.encode('utf-8'))
+            h.update(f"{target}:{def_name}:{compile_entry.__name__}:{def_hashes[def_name]}".encode('utf-8'))
+        digests[filename] = h.hexdigest()
+    return digests
+
+
+def _output_matches(path, entry):
+    """True if the file at path is still the one the manifest recorded."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if entry.get('output') is None:
+        return False
+    if entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns:
+        return True
+    with open(path, 'rb') as f:
+        return _sha256(f.read()) == entry['output']
+
+
+def _catalog_stamp(items_path, previous):
+    """(stamp dict, unchanged?) for items.json against the recorded stamp."""
+    st = os.stat(items_path)
+    stamp = {'path': os.path.abspath(items_path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    if previous and previous.get('path') == stamp['path']:
+        if previous.get('size') == st.st_size and previous.get('mtime_ns') == st.st_mtime_ns:
+            stamp['sha256'] = previous.get('sha256')
+            return stamp, True
+    from kenkoku.catalog import file_hash
+    stamp['sha256'] = file_hash(items_path)
+    return stamp, bool(previous) and previous.get('sha256') == stamp['sha256']
+
+
+def _load_catalog(items_path, use_cache):
+    # Imported here: a no-op run never opens items.json, so it need not load the catalog module either
+    from kenkoku.catalog import load_catalog
+    return load_catalog(items_path, use_cache=use_cache)
+
+
+class RegenerateResult:
+    """What regenerate() did; generate_json.py prints from this."""
+
+    def __init__(self):
+        self.catalog = None      # only set when items.json had to be opened
+        self.rebuilt = []        # file names that were recompiled
+        self.written = []        # ... of which the bytes on disk changed
+        self.requests = {}       # payloads of the rebuilt files
+        self.misses = []         # resolver misses of every file, rebuilt or not
+        self.summaries = {}      # file name -> summary line recorded at build time
+        self.dirty = []          # files whose output differs from the last upload
+        self.resolvers = []      # every Resolver used, for their counters
+
+
+def regenerate(definitions, items_path, output_dir, summarize, force=False, use_cache=True,
+               biome_id=BIOME_ID, profession_id=PROFESSION_ID,
+               lottery_ticket_id=LOTTERY_TICKET_ID, paper_id=None, profiler=None,
+               catalog=None, resolver=None):
+    """
+    Rebuild only the request files whose inputs changed and update the manifest.
+
+    summarize: callable(file name, payload) -> summary line stored per file
+    profiler:  optional kenkoku.profiling.Profiler
+    catalog:   Catalog already loaded from items_path (kenkoku.watch keeps one
+               in memory); items.json is then never opened
+    resolver:  Resolver over that catalog, reused with its memo
+    """
+    profiler = profiler or NULL_PROFILER
+    result = RegenerateResult()
+    with profiler.stage("manifest"):
+        manifest = load_manifest(output_dir)
+        entries = manifest['files']
+        settings = {'biome_id': biome_id, 'profession_id': profession_id,
+                    'lottery_ticket_id': lottery_ticket_id, 'paper_id': paper_id}
+        digests = inputs_digests(definitions, settings)
+        stamp, catalog_unchanged = _catalog_stamp(items_path, manifest.get('catalog'))
+
+        dirty = set()
+        for filename, digest in digests.items():
+            entry = entries.get(filename)
+            if (force or entry is None or entry.get('inputs') != digest
+                    or not _output_matches(os.path.join(output_dir, filename), entry)):
+                dirty.add(filename)
+
+    # items.json changed: re-resolve the recorded lookups of the clean files
+    if not catalog_unchanged and len(dirty) < len(digests):
+        with profiler.stage("load catalog"):
+            result.catalog = catalog if catalog is not None else _load_catalog(items_path, use_cache)
+        with profiler.stage("probe lookups"):
+            probe = resolver or Resolver(result.catalog)
+            result.resolvers.append(probe)
+            for filename in digests:
+                if filename in dirty:
+                    continue
+                for kind, value, db_id in entries[filename]['lookups']:
+                    if probe.lookup(kind, value) != db_id:
+                        dirty.add(filename)
+                        break
+
+    if dirty:
+        if result.catalog is None:
+            with profiler.stage("load catalog"):
+                result.catalog = catalog if catalog is not None else _load_catalog(items_path, use_cache)
+        resolver = resolver or Resolver(result.catalog)
+        if resolver not in result.resolvers:
+            result.resolvers.append(resolver)
+        traces = {}
+        if paper_id is None:
+            paper_id = resolver.get_id_by_key(PAPER_KEY)
+            paper_lookup = ('key', PAPER_KEY, paper_id)
+        else:
+            paper_lookup = None
+        result.requests = build_requests(definitions, result.catalog, resolver=resolver,
+                                         biome_id=biome_id, profession_id=profession_id,
+                                         lottery_ticket_id=lottery_ticket_id, paper_id=paper_id,
+                                         only=dirty, traces=traces, profiler=profiler)
+        os.makedirs(output_dir, exist_ok=True)
+        for filename, request in result.requests.items():
+            path = os.path.join(output_dir, filename)
+            previous = entries.get(filename) or {}
+            with profiler.stage(f"write {filename}") as stage:
+                data = dump_request(request).encode('utf-8')
+                output = _sha256(data)
+                # Identical bytes already on disk: leave the file (and its mtime) alone
+                if previous.get('output') != output or not _output_matches(path, previous):
+                    atomic_write(path, data)
+                    result.written.append(filename)
+            if stage is not None:
+                stage.info.update(bytes=len(data), written=filename in result.written)
+            lookups = [[kind, value, db_id] for (kind, value), db_id in traces[filename].items()]
+            if paper_lookup is not None:
+                lookups.insert(0, list(paper_lookup))
+            st = os.stat(path)
+            entries[filename] = {
+                'inputs': digests[filename],
+                'lookups': lookups,
+                'output': output,
+                'size': st.st_size,
+                'mtime_ns': st.st_mtime_ns,
+                'summary': summarize(filename, request),
+                'uploaded': previous.get('uploaded'),
+                'npcs': sorted(set(previous.get('npcs', ())).union(
+                    npc['name'] for npc in request['store'] if 'trades' in npc)),
+            }
+            result.rebuilt.append(filename)
+
+    seen = set()
+    for filename in digests:
+        entry = entries[filename]
+        result.summaries[filename] = entry['summary']
+        if entry['output'] != entry.get('uploaded'):
+            result.dirty.append(filename)
+        for kind, value, db_id in entry['lookups']:
+            if db_id is None and (kind, value) not in seen:
+                seen.add((kind, value))
+                result.misses.append((kind, value))
+
+    if dirty or manifest.get('catalog') != stamp:
+        manifest['catalog'] = stamp
+        with profiler.stage("save manifest"):
+            save_manifest(output_dir, manifest)
+    return result
+
+
+# ------------------------------------------------------------
+# Upload bookkeeping (kenkoku.upload --dirty)
+# ------------------------------------------------------------
+
+def generated_npc_names(output_dir):
+    """Names of the NPCs any request file in output_dir has stored, now or in an earlier run."""
+    return {name for entry in load_manifest(output_dir)['files'].values() for name in entry.get('npcs', ())}
+
+
+def dirty_files(output_dir):
+    """Request file names in output_dir whose current output was never uploaded."""
+    manifest = load_manifest(output_dir)
+    return [name for name, entry in manifest['files'].items()
+            if entry.get('output') != entry.get('uploaded')]
+
+
+def mark_uploaded(output_dir, filenames):
+    """Record the current output hash of filenames as uploaded."""
+    manifest = load_manifest(output_dir)
+    changed = False
+    for name in filenames:
+        entry = manifest['files'].get(name)
+        if entry is not None and entry.get('uploaded') != entry.get('output'):
+            entry['uploaded'] = entry['output']
+            changed = True
+    if changed:
+        save_manifest(output_dir, manifest)
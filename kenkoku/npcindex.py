@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+Reverse index over npcs.json (+ items.json)
+Answers "where is this item traded" without grepping npcs.json: every view
+item, cost and reward of every trade becomes one posting
+
+    (item id, role, npc, trade, quantity, price)
+
+with role "view", "cost" (the player hands it to the NPC: the NPC buys it)
+or "reward" (the NPC hands it out: the NPC sells it). Price-only costs and
+rewards are postings without an item. Items are found by id, key (every row
+with that key, originals included) or name, from items.json and from the
+item objects embedded in npcs.json.
+
+The index is an SQLite file in .cache/ next to npcs.json. It records the
+size, mtime and sha256 of both sources and is rebuilt only when one of them
+changed (a touched but identical file only costs a hash), so a query is an
+open + an indexed lookup.
+
+    python -m kenkoku.npcindex --buys minecraft:diamond
+    python -m kenkoku.npcindex --sells 炭鉱夫じゃがいも
+    python -m kenkoku.npcindex --paid-in お食事券
+    python -m kenkoku.npcindex --price-above 10000
+    python -m kenkoku.npcindex --npc お食事処 --json
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from kenkoku.catalog import CACHE_DIR_NAME, file_hash
+
+INDEX_VERSION = 1
+
+INDEX_SCHEMA = """
+CREATE TABLE meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE npcs (id INTEGER PRIMARY KEY, name TEXT NOT NULL, npc_type TEXT, biome TEXT, profession TEXT);
+CREATE TABLE trades (id INTEGER PRIMARY KEY, npc_id INTEGER NOT NULL, slot INTEGER, content TEXT);
+CREATE TABLE items (id INTEGER PRIMARY KEY, `key` TEXT, name TEXT, is_original INTEGER);
+CREATE TABLE postings (item_id INTEGER, role TEXT NOT NULL, npc_id INTEGER NOT NULL,
+                       trade_id INTEGER NOT NULL, quantity INTEGER, price INTEGER);
+"""
+# Built after the bulk insert
+INDEX_INDEXES = """
+CREATE INDEX npcs_name ON npcs (name);
+CREATE INDEX items_key ON items (`key`);
+CREATE INDEX items_name ON items (name);
+CREATE INDEX postings_item ON postings (item_id, role);
+CREATE INDEX postings_trade ON postings (trade_id);
+CREATE INDEX postings_price ON postings (price) WHERE price IS NOT NULL;
+"""
+
+ROLES = ('view', 'cost', 'reward')
+
+_ROWS = """
+SELECT p.role, p.item_id, i.name, p.quantity, p.price, n.id, n.name, t.id, t.content, t.slot
+FROM postings p
+JOIN trades t ON t.id = p.trade_id
+JOIN npcs n ON n.id = p.npc_id
+LEFT JOIN items i ON i.id = p.item_id
+"""
+
+
+def index_path_for(npcs_path):
+    npcs_path = os.path.abspath(npcs_path)
+    return os.path.join(os.path.dirname(npcs_path), CACHE_DIR_NAME, os.path.basename(npcs_path) + '.index.db')
+
+
+# ------------------------------------------------------------
+# Build
+# ------------------------------------------------------------
+
+def _stamp(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _postings(npc, trade):
+    """(item_id, role, npc_id, trade_id, quantity, price) of one trade."""
+    if trade.get('view_item_id') is not None:
+        yield trade['view_item_id'], 'view', npc['id'], trade['id'], None, None
+    for role, rows in (('cost', trade.get('costs')), ('reward', trade.get('rewards'))):
+        for row in rows or ():
+            yield row.get('item_id'), role, npc['id'], trade['id'], row.get('quantity'), row.get('price')
+
+
+def build_index(index_path, npcs_path, items_path=None):
+    """Write a fresh index for npcs_path (and items_path) to index_path. Returns the meta dict."""
+    from kenkoku.jsonstream import iter_array
+
+    meta = {"version": INDEX_VERSION, "npcs": dict(_stamp(npcs_path), sha256=file_hash(npcs_path)), "items": None}
+    if items_path:
+        meta["items"] = dict(_stamp(items_path), sha256=file_hash(items_path))
+
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    partial = index_path + '.tmp'
+    if os.path.exists(partial):
+        os.remove(partial)
+    conn = sqlite3.connect(partial, isolation_level=None)
+    try:
+        conn.executescript(INDEX_SCHEMA)
+        conn.execute("BEGIN")
+        if items_path:
+            conn.executemany("INSERT OR REPLACE INTO items (id, `key`, name, is_original) VALUES (?, ?, ?, ?)",
+                             ((row['id'], row.get('key'), row.get('name'), row.get('is_original'))
+                              for row in iter_array(items_path)))
+        npcs, trades, postings, embedded = [], [], [], {}
+        for npc in iter_array(npcs_path):
+            npcs.append((npc['id'], npc['name'], (npc.get('npc_type') or {}).get('name'),
+                         (npc.get('biome') or {}).get('key'), (npc.get('profession') or {}).get('key')))
+            for trade in npc.get('trades') or ():
+                trades.append((trade['id'], npc['id'], trade.get('slot'), trade.get('content')))
+                postings.extend(_postings(npc, trade))
+                for row in (trade.get('costs') or []) + (trade.get('rewards') or []):
+                    item = row.get('item')
+                    if item and item.get('id') is not None:
+                        embedded[item['id']] = (item['id'], item.get('key'), item.get('name'), item.get('is_original'))
+        # items.json wins; the embedded rows cover items it does not have (or no items.json at all)
+        conn.executemany("INSERT OR IGNORE INTO items (id, `key`, name, is_original) VALUES (?, ?, ?, ?)",
+                         embedded.values())
+        conn.executemany("INSERT INTO npcs VALUES (?, ?, ?, ?, ?)", npcs)
+        conn.executemany("INSERT INTO trades VALUES (?, ?, ?, ?)", trades)
+        conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?, ?, ?)", postings)
+        conn.execute("INSERT INTO meta VALUES ('meta', ?)", (json.dumps(meta),))
+        conn.execute("COMMIT")
+        conn.executescript(INDEX_INDEXES)
+    finally:
+        conn.close()
+    os.replace(partial, index_path)
+    return meta
+
+
+def _read_meta(index_path):
+    try:
+        conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    except sqlite3.Error:
+        return None
+    try:
+        (value,) = conn.execute("SELECT value FROM meta WHERE name = 'meta'").fetchone()
+        return json.loads(value)
+    except (sqlite3.Error, TypeError, ValueError):
+        return None
+    finally:
+        conn.close()
+
+
+def _check(recorded, path):
+    """'same', 'touched' (new mtime, same content) or None (changed) for a source against its recorded stamp."""
+    if path is None or recorded is None:
+        return 'same' if path is None and recorded is None else None
+    stamp = _stamp(path)
+    if recorded["size"] != stamp["size"]:
+        return None
+    if recorded["mtime_ns"] == stamp["mtime_ns"]:
+        return 'same'
+    if recorded["sha256"] != file_hash(path):
+        return None
+    recorded.update(stamp)
+    return 'touched'
+
+
+def open_index(npcs_path, items_path=None, index_path=None, rebuild=False):
+    """(NpcIndex, rebuilt?) for npcs_path, rebuilding the cached index when a source changed."""
+    index_path = index_path or index_path_for(npcs_path)
+    meta = None if rebuild or not os.path.exists(index_path) else _read_meta(index_path)
+    checks = [_check(meta.get(source), path) for source, path in (("npcs", npcs_path), ("items", items_path))] \
+        if meta and meta.get("version") == INDEX_VERSION else [None]
+    rebuilt = None in checks
+    if rebuilt:
+        build_index(index_path, npcs_path, items_path)
+    elif 'touched' in checks:
+        # Same content under a new mtime: record it, so the next open skips the hash
+        conn = sqlite3.connect(index_path)
+        with conn:
+            conn.execute("UPDATE meta SET value = ? WHERE name = 'meta'", (json.dumps(meta),))
+        conn.close()
+    return NpcIndex(index_path), rebuilt
+
+
+# ------------------------------------------------------------
+# Queries
+# ------------------------------------------------------------
+
+class Posting:
+    __slots__ = ('role', 'item_id', 'item_name', 'quantity', 'price', 'npc_id', 'npc_name',
+                 'trade_id', 'content', 'slot')
+
+    def __init__(self, row):
+        (self.role, self.item_id, self.item_name, self.quantity, self.price,
+         self.npc_id, self.npc_name, self.trade_id, self.content, self.slot) = row
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class NpcIndex:
+    """Read-only queries over a built index."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    def close(self):
+        self.conn.close()
+
+    def _query(self, where, params, order="n.name, t.slot, t.id, p.role"):
+        return [Posting(row) for row in self.conn.execute(f"{_ROWS} WHERE {where} ORDER BY {order}", params)]
+
+    def item_ids(self, ref):
+        """Item ids for a db id, a key (with or without minecraft:) or a name."""
+        ref = str(ref)
+        if ref.isdigit():
+            return [int(ref)]
+        keys = (ref, 'minecraft:' + ref) if ':' not in ref else (ref,)
+        marks = ", ".join("?" * len(keys))
+        return [row[0] for row in self.conn.execute(
+            f"SELECT id FROM items WHERE `key` IN ({marks}) OR name = ? ORDER BY id", keys + (ref,))]
+
+    def item(self, ref, roles=ROLES):
+        """Every posting of the item(s) ref names, in the given roles."""
+        ids = self.item_ids(ref)
+        if not ids:
+            return []
+        return self._query(f"p.item_id IN ({', '.join('?' * len(ids))}) AND p.role IN ({', '.join('?' * len(roles))})",
+                           ids + list(roles))
+
+    def buys(self, ref):
+        """Trades where the NPC takes the item (it is a cost)."""
+        return self.item(ref, ('cost',))
+
+    def sells(self, ref):
+        """Trades where the NPC hands the item out (it is a reward)."""
+        return self.item(ref, ('reward',))
+
+    def paid_in(self, ref):
+        """Every posting of the trades that cost the item, so the whole trade is shown."""
+        ids = self.item_ids(ref)
+        if not ids:
+            return []
+        return self._query(f"p.trade_id IN (SELECT trade_id FROM postings WHERE role = 'cost' "
+                           f"AND item_id IN ({', '.join('?' * len(ids))}))", ids)
+
+    def price_above(self, price, role=None):
+        """Postings with a price above `price` (costs and rewards, or one role)."""
+        if role:
+            return self._query("p.price > ? AND p.role = ?", (price, role), order="p.price DESC, t.id")
+        return self._query("p.price > ?", (price,), order="p.price DESC, t.id")
+
+    def npc(self, name):
+        """Every posting of the NPC(s) with this name (or id)."""
+        if str(name).isdigit():
+            return self._query("n.id = ?", (int(name),))
+        return self._query("n.name = ?", (name,))
+
+    def counts(self):
+        return {table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('npcs', 'trades', 'items', 'postings')}
+
+
+def format_postings(postings):
+    """One line per trade, its postings merged (view / costs -> rewards)."""
+    lines = []
+    trades = {}
+    for p in postings:
+        trades.setdefault((p.npc_name, p.npc_id, p.trade_id, p.content), []).append(p)
+    for (npc_name, npc_id, trade_id, content), rows in trades.items():
+        parts = []
+        for p in rows:
+            what = f"{p.price}G" if p.item_id is None else f"#{p.item_id} {p.item_name or '?'}"
+            if p.item_id is not None and p.quantity is not None:
+                what += f" x{p.quantity}"
+            if p.item_id is not None and p.price is not None:
+                what += f" ({p.price}G)"
+            parts.append(f"{p.role} {what}")
+        lines.append(f"  {npc_name} (npc {npc_id}) trade {trade_id} {content!r}: " + ", ".join(parts))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Find NPCs and trades by item, price or NPC name in npcs.json")
+    parser.add_argument('--npcs', default=os.path.join(base_dir, 'npcs.json'))
+    parser.add_argument('--items', default=os.path.join(base_dir, 'items.json'),
+                        help="items.json for names / keys (the rows embedded in npcs.json are always used)")
+    parser.add_argument('--index', help="index file (default: .cache/<npcs>.index.db next to npcs.json)")
+    parser.add_argument('--rebuild', action='store_true')
+    query = parser.add_mutually_exclusive_group()
+    query.add_argument('--item', metavar='ITEM', help="every trade using the item (id, key or name) in any role")
+    query.add_argument('--buys', metavar='ITEM', help="NPCs that buy the item (it is a cost)")
+    query.add_argument('--sells', metavar='ITEM', help="NPCs that sell the item (it is a reward)")
+    query.add_argument('--paid-in', metavar='ITEM', help="trades paid in the item")
+    query.add_argument('--price-above', type=int, metavar='PRICE', help="trades with a price above PRICE")
+    query.add_argument('--npc', metavar='NAME', help="trades of the NPC (name or id)")
+    parser.add_argument('--role', choices=('cost', 'reward'), help="with --price-above: only this side")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    items_path = args.items if args.items and os.path.exists(args.items) else None
+    start = time.perf_counter()
+    index, rebuilt = open_index(args.npcs, items_path, args.index, args.rebuild)
+    opened = time.perf_counter()
+    try:
+        if args.item:
+            postings = index.item(args.item)
+        elif args.buys:
+            postings = index.buys(args.buys)
+        elif args.sells:
+            postings = index.sells(args.sells)
+        elif args.paid_in:
+            postings = index.paid_in(args.paid_in)
+        elif args.price_above is not None:
+            postings = index.price_above(args.price_above, args.role)
+        elif args.npc:
+            postings = index.npc(args.npc)
+        else:
+            counts = index.counts()
+            print(("Rebuilt" if rebuilt else "Up to date") + ": " +
+                  ", ".join(f"{table}={count}" for table, count in counts.items()))
+            return 0
+        done = time.perf_counter()
+    finally:
+        index.close()
+
+    if args.json:
+        print(json.dumps([p.to_dict() for p in postings], ensure_ascii=False, indent=1))
+        return 0
+    print(format_postings(postings) or "  (no trades)")
+    print(f"\n{len({p.trade_id for p in postings})} trades; "
+          f"{'rebuilt index' if rebuilt else 'index'} {(opened - start) * 1000:.1f} ms, query {(done - opened) * 1000:.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,579 @@
+# -*- coding: utf-8 -*-
+"""
+Original item compiler
+Original items (is_original = 1) differ by their nbt column: SNBT item
+components such as
+
+    [enchantments={protection:5,unbreaking:5},custom_name={extra:[{text:"..."}],text:""}]
+
+This module parses that column once per catalog, canonicalizes it
+(enchantments with levels, custom model data, custom data, display name and
+lore as plain text, namespaced base key), groups identical items and indexes
+them by base key + enchantment set, so a definition can name an original by
+its attributes instead of its display name:
+
+    {"key": "minecraft:diamond_helmet", "enchantments": {"respiration": 3}}
+
+It also replaces seed-items.sk's per-item SELECT + UPDATE / INSERT with one
+batched upsert through a temporary table.
+
+    python -m kenkoku.originals                              # duplicates report
+    python -m kenkoku.originals --find minecraft:bow unbreaking=3
+    python -m kenkoku.originals --seed-sql seed_items.sql --from-script seed-items.sk
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+from kenkoku.sqlexport import DIALECTS, sql_literal
+
+
+# ------------------------------------------------------------
+# SNBT
+# ------------------------------------------------------------
+
+class SNBTError(ValueError):
+    pass
+
+
+_NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?([bBsSlLfFdD]?)')
+# One token per match: a quoted string, a punctuation character, an unquoted
+# word, or anything else (an error)
+_TOKEN = re.compile(r"""\s*(?:"((?:[^"\\]|\\.)*)"|'((?:[^'\\]|\\.)*)'|([{}\[\],:=;!])|([A-Za-z0-9._+\-/]+)|(\S))""", re.S)
+_ESCAPE = re.compile(r'\\(.)', re.S)
+
+# Token kinds
+_STR, _PUNCT, _WORD = 's', 'p', 'w'
+
+
+def _tokenize(text):
+    tokens = []
+    append = tokens.append
+    for double, single, punct, word, bad in _TOKEN.findall(text):
+        if punct:
+            append((_PUNCT, punct))
+        elif word:
+            append((_WORD, word))
+        elif bad:
+            raise SNBTError(f"unexpected {bad!r} in {text[:60]!r}")
+        else:
+            raw = double or single
+            append((_STR, _ESCAPE.sub(r'\1', raw) if '\\' in raw else raw))
+    append((_PUNCT, ''))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent over the tokens of one SNBT string."""
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+
+    def error(self, message):
+        value = self.tokens[self.pos][1]
+        return SNBTError(f"{message} at token {self.pos} ({value or 'end'!r}) in {self.text[:60]!r}")
+
+    def peek(self):
+        kind, value = self.tokens[self.pos]
+        return value if kind == _PUNCT else kind
+
+    def expect(self, char):
+        if self.tokens[self.pos] != (_PUNCT, char):
+            raise self.error(f"expected {char!r}")
+        self.pos += 1
+
+    def key(self):
+        kind, value = self.tokens[self.pos]
+        if kind == _PUNCT:
+            raise self.error("expected a name")
+        self.pos += 1
+        return value
+
+    def value(self):
+        kind, value = self.tokens[self.pos]
+        if kind == _PUNCT:
+            if value == '{':
+                return self.compound()
+            if value == '[':
+                return self.list()
+            raise self.error("expected a value")
+        self.pos += 1
+        return value if kind == _STR else _scalar(value)
+
+    def compound(self):
+        self.expect('{')
+        out = {}
+        if self.peek() == '}':
+            self.pos += 1
+            return out
+        while True:
+            name = self.key()
+            self.expect(':')
+            out[name] = self.value()
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect('}')
+            return out
+
+    def list(self):
+        self.expect('[')
+        # Typed arrays: [I;1,2,3]
+        if self.tokens[self.pos + 1] == (_PUNCT, ';') and self.tokens[self.pos][1] in ('B', 'I', 'L'):
+            self.pos += 2
+        out = []
+        if self.peek() == ']':
+            self.pos += 1
+            return out
+        while True:
+            out.append(self.value())
+            if self.peek() == ',':
+                self.pos += 1
+                continue
+            self.expect(']')
+            return out
+
+    def component_name(self):
+        """(removed?, [namespace:]name) of one "[!]name=" component."""
+        removed = self.peek() == '!'
+        if removed:
+            self.pos += 1
+        name = self.key()
+        if self.peek() == ':':
+            self.pos += 1
+            name = f"{name}:{self.key()}"
+        return removed, name
+
+
+def _scalar(word):
+    if word == 'true':
+        return True
+    if word == 'false':
+        return False
+    match = _NUMBER.fullmatch(word)
+    if match:
+        number = word[:-1] if match.group(1) else word
+        if match.group(1) in ('f', 'F', 'd', 'D') or '.' in number or 'e' in number or 'E' in number:
+            return float(number)
+        return int(number)
+    return word
+
+
+def parse_snbt(text):
+    """One SNBT value (compound, list or scalar)."""
+    parser = _Parser(text)
+    value = parser.value()
+    if parser.peek() != '':
+        raise parser.error("trailing data")
+    return value
+
+
+def parse_components(text):
+    """
+    {component: value} from an item's nbt column, "[name=value,...]" (1.20.5+).
+    Component names lose their minecraft: prefix; "!name" removals are kept as
+    name -> None.
+    """
+    if not text or not text.strip():
+        return {}
+    parser = _Parser(text)
+    parser.expect('[')
+    components = {}
+    if parser.peek() == ']':
+        parser.pos += 1
+    else:
+        while True:
+            removed, name = parser.component_name()
+            if removed:
+                components[_strip_namespace(name)] = None
+            else:
+                parser.expect('=')
+                components[_strip_namespace(name)] = parser.value()
+            if parser.peek() == ',':
+                parser.pos += 1
+                continue
+            parser.expect(']')
+            break
+    if parser.peek() != '':
+        raise parser.error("trailing data")
+    return components
+
+
+def _strip_namespace(name):
+    return name[len('minecraft:'):] if name.startswith('minecraft:') else name
+
+
+# ------------------------------------------------------------
+# Canonical form
+# ------------------------------------------------------------
+
+_FORMATTING = re.compile(r'[§&][0-9a-fk-orA-FK-OR]')
+
+
+def plain(text):
+    """Text without § / & formatting codes."""
+    return _FORMATTING.sub('', text) if text else text
+
+
+def text_of(component):
+    """Plain text of a text component (string, JSON string, compound or list)."""
+    if component is None:
+        return None
+    if isinstance(component, str):
+        if component[:1] in '{["':
+            try:
+                return text_of(json.loads(component))
+            except ValueError:
+                pass
+        return plain(component)
+    if isinstance(component, list):
+        return ''.join(text_of(part) or '' for part in component)
+    if isinstance(component, dict):
+        return plain(str(component.get('text', ''))) + ''.join(
+            text_of(part) or '' for part in component.get('extra', ()))
+    return str(component)
+
+
+def namespaced(key):
+    if not key:
+        return key
+    return key if ':' in key else 'minecraft:' + key
+
+
+def _enchantments(value):
+    """{name: level} from an enchantments component (with or without a levels wrapper)."""
+    if not isinstance(value, dict):
+        return {}
+    if isinstance(value.get('levels'), dict):
+        value = value['levels']
+    return {_strip_namespace(str(name)): int(level) for name, level in value.items()
+            if isinstance(level, (int, float)) and not isinstance(level, bool)}
+
+
+class CanonicalItem:
+    """An original item's nbt reduced to the attributes that identify it."""
+
+    def __init__(self, item_id, name, key, components):
+        self.item_id = item_id
+        self.name = name
+        self.key = namespaced(key)
+        self.components = components
+        self.enchantments = _enchantments(components.get('enchantments'))
+        # Enchanted books carry theirs as stored_enchantments; both count for the index
+        for ench, level in _enchantments(components.get('stored_enchantments')).items():
+            self.enchantments.setdefault(ench, level)
+        self.custom_model_data = components.get('custom_model_data')
+        custom_data = components.get('custom_data')
+        self.custom_data = custom_data if isinstance(custom_data, dict) else {}
+        self.display_name = text_of(components.get('custom_name') or components.get('item_name'))
+        lore = components.get('lore')
+        self.lore = [text_of(line) for line in lore] if isinstance(lore, list) else []
+        self.digest = hashlib.sha256(self.canonical_json().encode('utf-8')).hexdigest()
+
+    def canonical(self):
+        """The canonical form: everything but the row id and the db name."""
+        other = {name: value for name, value in self.components.items()
+                 if name not in ('enchantments', 'stored_enchantments', 'custom_model_data',
+                                 'custom_data', 'custom_name', 'item_name', 'lore')}
+        return {
+            "key": self.key,
+            "enchantments": self.enchantments,
+            "custom_model_data": self.custom_model_data,
+            "custom_data": self.custom_data,
+            "display_name": self.display_name,
+            "lore": self.lore,
+            "other": other,
+        }
+
+    def canonical_json(self):
+        return json.dumps(self.canonical(), sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+
+def canonicalize(row):
+    """CanonicalItem for an items.json row (dict with id, name, key, nbt)."""
+    return CanonicalItem(row.get('id'), row.get('name'), row.get('key'), parse_components(row.get('nbt')))
+
+
+# ------------------------------------------------------------
+# Index
+# ------------------------------------------------------------
+
+def normalize_spec(spec):
+    """Attribute spec with a namespaced key and bare enchantment names; empty filters dropped."""
+    spec = {name: value for name, value in spec.items() if value not in (None, {}, '')}
+    if 'key' in spec:
+        spec['key'] = namespaced(spec['key'])
+    if 'enchantments' in spec:
+        spec['enchantments'] = {_strip_namespace(name): int(level) for name, level in spec['enchantments'].items()}
+    return spec
+
+
+def spec_key(spec):
+    """Canonical JSON of an attribute spec, used for memoizing, traces and miss reports."""
+    return json.dumps(normalize_spec(spec), sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+
+
+def _contains(have, want):
+    """Is want a subset of have (nested dicts compared recursively)?"""
+    if isinstance(want, dict):
+        return isinstance(have, dict) and all(k in have and _contains(have[k], v) for k, v in want.items())
+    return have == want
+
+
+class OriginalIndex:
+    """Original items of a catalog, canonicalized and indexed by (base key, enchantment set)."""
+
+    def __init__(self, rows):
+        self.items = []
+        self.errors = []          # (item id, message) for nbt that does not parse
+        self.by_attrs = {}        # (key, frozenset of (enchantment, level)) -> [CanonicalItem]
+        self.by_digest = {}       # canonical digest -> [CanonicalItem], ids ascending
+        for row in rows:
+            if not row.get('is_original'):
+                continue
+            try:
+                item = canonicalize(row)
+            except SNBTError as e:
+                self.errors.append((row.get('id'), str(e)))
+                continue
+            self.items.append(item)
+            self.by_attrs.setdefault((item.key, frozenset(item.enchantments.items())), []).append(item)
+            self.by_digest.setdefault(item.digest, []).append(item)
+        for group in self.by_digest.values():
+            group.sort(key=lambda i: i.item_id)
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        items = catalog.all_items
+        return cls(items[item_id] for item_id in catalog.original_ids)
+
+    def duplicates(self):
+        """Groups of items whose canonical forms are identical."""
+        return [group for group in self.by_digest.values() if len(group) > 1]
+
+    def find_all(self, key, enchantments=None, custom_data=None, custom_model_data=None, display_name=None):
+        """Items with exactly this base key and enchantment set, narrowed by the optional attributes."""
+        bucket = self.by_attrs.get((namespaced(key), frozenset((enchantments or {}).items())), ())
+        if custom_data is None and custom_model_data is None and display_name is None:
+            return list(bucket)
+        return [item for item in bucket
+                if (custom_data is None or _contains(item.custom_data, custom_data))
+                and (custom_model_data is None or item.custom_model_data == custom_model_data)
+                and (display_name is None or item.display_name == display_name)]
+
+    def find(self, spec):
+        """
+        db_id for an attribute spec {"key", "enchantments", "custom_data",
+        "custom_model_data", "display_name"}, or None when nothing or more than
+        one distinct item matches. Identical duplicates resolve to the lowest id.
+        """
+        matches = self.find_all(spec.get('key'), spec.get('enchantments'), spec.get('custom_data'),
+                                spec.get('custom_model_data'), spec.get('display_name'))
+        if not matches or len({item.digest for item in matches}) > 1:
+            return None
+        return min(item.item_id for item in matches)
+
+
+# ------------------------------------------------------------
+# Seeding
+# ------------------------------------------------------------
+
+_REGISTER = re.compile(r'^\s*registerItem\("((?:[^"]|"")*)",\s*"((?:[^"]|"")*)",\s*"((?:[^"]|"")*)"\)', re.M)
+
+
+def seeds_from_script(path):
+    """(name, key, nbt) of every registerItem(...) call in seed-items.sk."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    return [tuple(part.replace('""', '"') for part in match.groups()) for match in _REGISTER.finditer(text)]
+
+
+def seeds_from_items(rows):
+    """(name, key, nbt) of the original rows of items.json."""
+    return [(row['name'], row['key'], row.get('nbt')) for row in rows if row.get('is_original') and row.get('name')]
+
+
+def dedupe_seeds(seeds, index=None):
+    """
+    (seeds, dropped): the last row per name wins; a row whose canonical item
+    is identical to an earlier seed, or to an original already in index under
+    another name, is dropped as (name, name it duplicates).
+    """
+    by_name = {}
+    for name, key, nbt in seeds:
+        by_name[name] = (name, key, nbt)
+    existing = {}
+    if index is not None:
+        for digest, group in index.by_digest.items():
+            existing[digest] = group[0].name
+    kept, dropped, seen = [], [], {}
+    for name, key, nbt in by_name.values():
+        try:
+            digest = CanonicalItem(None, name, key, parse_components(nbt)).digest
+        except SNBTError:
+            digest = None
+        duplicate = seen.get(digest) or existing.get(digest)
+        if digest is not None and duplicate is not None and duplicate != name:
+            dropped.append((name, duplicate))
+            continue
+        if digest is not None:
+            seen[digest] = name
+        kept.append((name, key, nbt))
+    return kept, dropped
+
+
+def seed_aliases(seeds, index):
+    """
+    {seed name: db_id} for the seeds that dedupe_seeds drops as identical to
+    an original in index. Those names never reach the DB, but definitions may
+    still use them (health_boost_1 -> the id of §l体力増強(10)).
+    """
+    by_name = {name: (key, nbt) for name, key, nbt in seeds}
+    aliases = {}
+    for name, (key, nbt) in by_name.items():
+        try:
+            digest = CanonicalItem(None, name, key, parse_components(nbt)).digest
+        except SNBTError:
+            continue
+        group = index.by_digest.get(digest)
+        if group:
+            aliases[name] = group[0].item_id
+    return aliases
+
+
+_SEED_TABLE = 'seed_items'
+
+
+def seed_statements(seeds, dialect="mysql", batch_rows=200):
+    """
+    Upsert of (name, key, nbt) into items keyed on name, as three set-based
+    statements over a temporary table instead of two round trips per item.
+    Rows already up to date are not touched.
+    """
+    if dialect == "mysql":
+        create = (f"CREATE TEMPORARY TABLE {_SEED_TABLE} (name VARCHAR(255) NOT NULL PRIMARY KEY, "
+                  f"`key` VARCHAR(255) NOT NULL, nbt TEXT);")
+        drop = f"DROP TEMPORARY TABLE {_SEED_TABLE};"
+        update = (f"UPDATE items i JOIN {_SEED_TABLE} s ON i.name = s.name "
+                  f"SET i.`key` = s.`key`, i.is_original = TRUE, i.nbt = s.nbt, i.updated_at = NOW() "
+                  f"WHERE NOT (i.`key` <=> s.`key`) OR NOT (i.nbt <=> s.nbt) OR NOT i.is_original;")
+        now = "NOW()"
+    else:
+        create = (f"CREATE TEMP TABLE {_SEED_TABLE} (name VARCHAR(255) NOT NULL PRIMARY KEY, "
+                  f"`key` VARCHAR(255) NOT NULL, nbt TEXT);")
+        drop = f"DROP TABLE temp.{_SEED_TABLE};"
+        update = (f"UPDATE items SET `key` = s.`key`, is_original = 1, nbt = s.nbt, "
+                  f"updated_at = CURRENT_TIMESTAMP FROM {_SEED_TABLE} s WHERE items.name = s.name "
+                  f"AND (items.`key` IS NOT s.`key` OR items.nbt IS NOT s.nbt OR NOT items.is_original);")
+        now = "CURRENT_TIMESTAMP"
+
+    statements = [create, "BEGIN;"]
+    for start in range(0, len(seeds), batch_rows):
+        values = ",\n".join("(" + ", ".join(sql_literal(v, dialect) for v in seed) + ")"
+                            for seed in seeds[start:start + batch_rows])
+        statements.append(f"INSERT INTO {_SEED_TABLE} (name, `key`, nbt) VALUES\n{values};")
+    statements.append(update)
+    statements.append(
+        f"INSERT INTO items (`key`, name, is_original, nbt, created_at, updated_at) "
+        f"SELECT s.`key`, s.name, TRUE, s.nbt, {now}, {now} FROM {_SEED_TABLE} s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM items i WHERE i.name = s.name);")
+    statements.append("COMMIT;")
+    statements.append(drop)
+    return statements
+
+
+def seed_sql(seeds, dialect="mysql", batch_rows=200):
+    return "-- generated by kenkoku.originals\n" + "\n".join(seed_statements(seeds, dialect, batch_rows)) + "\n"
+
+
+def seed_sqlite(conn, seeds):
+    """Apply the seeding upsert to an SQLite stand-in (autocommit connection); rolled back on error."""
+    statements = seed_statements(seeds, "sqlite")
+    # Parameters instead of literals for the staged rows; the rest runs as rendered
+    conn.execute(statements[0])
+    try:
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(f"INSERT INTO {_SEED_TABLE} (name, `key`, nbt) VALUES (?, ?, ?)", seeds)
+            updated = conn.execute(statements[-4].rstrip(';')).rowcount
+            inserted = conn.execute(statements[-3].rstrip(';')).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.execute(statements[-1])
+    return updated, inserted
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+
+def _parse_find(args):
+    """["minecraft:bow", "unbreaking=3", ...] -> attribute spec."""
+    spec = {"key": args[0], "enchantments": {}}
+    for arg in args[1:]:
+        name, _, level = arg.partition('=')
+        spec["enchantments"][_strip_namespace(name)] = int(level or 1)
+    return spec
+
+
+def main(argv=None):
+    from kenkoku.translation import load_items
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Canonicalize, index and seed original items")
+    parser.add_argument('--items', default=os.path.join(base_dir, 'items.json'),
+                        help="items.json or items.csv")
+    parser.add_argument('--find', nargs='+', metavar='ARG', help="KEY [ENCHANTMENT=LEVEL ...]")
+    parser.add_argument('--seed-sql', help="write the bulk seeding upsert here")
+    parser.add_argument('--from-script', help="seed from the registerItem calls of this seed-items.sk "
+                                              "(default: the originals in --items)")
+    parser.add_argument('--dialect', choices=DIALECTS, default="mysql")
+    parser.add_argument('--batch-rows', type=int, default=200)
+    parser.add_argument('--sqlite', help="apply the seeding upsert to this SQLite stand-in")
+    parser.add_argument('--keep-duplicates', action='store_true',
+                        help="also seed items identical to an original already in --items under another name")
+    args = parser.parse_args(argv)
+
+    rows = load_items(args.items)
+    index = OriginalIndex(rows)
+    print(f"{len(index.items)} original items, {len(index.by_attrs)} key + enchantment buckets, "
+          f"{len(index.by_digest)} distinct")
+    for item_id, message in index.errors:
+        print(f"  WARNING: #{item_id} nbt does not parse: {message}")
+    for group in index.duplicates():
+        names = ", ".join(f"#{item.item_id} {item.name}" for item in group)
+        print(f"  identical: {names}")
+
+    if args.find:
+        spec = _parse_find(args.find)
+        for item in index.find_all(spec["key"], spec["enchantments"]):
+            print(f"  #{item.item_id} {item.name} ({item.display_name}) {json.dumps(item.custom_data, ensure_ascii=False)}")
+        print(f"find {spec_key(spec)} -> {index.find(spec)}")
+
+    if args.seed_sql or args.sqlite:
+        seeds = seeds_from_script(args.from_script) if args.from_script else seeds_from_items(rows)
+        seeds, dropped = dedupe_seeds(seeds, None if args.keep_duplicates else index)
+        for name, kept in dropped:
+            print(f"  skipped {name}: identical to {kept}")
+        if args.seed_sql:
+            from kenkoku.generator import atomic_write
+            atomic_write(args.seed_sql, seed_sql(seeds, args.dialect, args.batch_rows).encode('utf-8'))
+            print(f"Wrote {len(seeds)} items to {args.seed_sql}")
+        if args.sqlite:
+            from kenkoku.sqlexport import connect_sqlite
+            updated, inserted = seed_sqlite(connect_sqlite(args.sqlite), seeds)
+            print(f"Seeded {args.sqlite}: {updated} updated, {inserted} inserted")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
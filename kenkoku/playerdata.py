@@ -0,0 +1,511 @@
+# -*- coding: utf-8 -*-
+"""
+Player data inspector (world/playerdata/*.dat)
+Decodes the gzipped NBT player files across a process pool and matches each
+inventory and ender chest stack, including the contents of shulker boxes and
+bundles, against items.json:
+
+  original   the canonical digest of its components (kenkoku.originals), or
+             a unique original with the same key, enchantments and display
+             name / custom_data itemType
+  vanilla    no name, lore or custom data: the is_original = 0 row of its
+             key (or the original with exactly its enchantments)
+  bill       money paper (custom_data itemType "bill"), summed by value
+  unmatched  anything else, by key and display name
+
+Only the root tags that hold items are decoded; everything else is skipped
+without building objects. Per-file results are kept in
+.cache/playerdata.scan.json with the file's mtime and size, so the next run
+re-reads only players who logged in since (and everything when items.json
+changes).
+
+    python -m kenkoku.playerdata
+    python -m kenkoku.playerdata --dir /srv/world/playerdata --json players.json --csv players.csv
+"""
+
+import argparse
+import csv
+import gzip
+import json
+import os
+import struct
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from kenkoku.catalog import CACHE_DIR_NAME
+
+STATE_VERSION = 1
+
+# Root tags that hold items, and the container name they are reported under
+CONTAINERS = {"Inventory": "inventory", "EnderItems": "ender"}
+
+# Item components that make a stack something other than the plain vanilla item
+IDENTIFYING = ('custom_name', 'item_name', 'custom_data', 'custom_model_data', 'lore')
+
+# Shulker boxes and bundles are opened this many levels deep
+MAX_NESTING = 4
+
+
+# ------------------------------------------------------------
+# NBT
+# ------------------------------------------------------------
+
+class NBTError(ValueError):
+    pass
+
+
+(TAG_END, TAG_BYTE, TAG_SHORT, TAG_INT, TAG_LONG, TAG_FLOAT, TAG_DOUBLE, TAG_BYTE_ARRAY,
+ TAG_STRING, TAG_LIST, TAG_COMPOUND, TAG_INT_ARRAY, TAG_LONG_ARRAY) = range(13)
+
+_FIXED = {TAG_BYTE: struct.Struct('>b'), TAG_SHORT: struct.Struct('>h'), TAG_INT: struct.Struct('>i'),
+          TAG_LONG: struct.Struct('>q'), TAG_FLOAT: struct.Struct('>f'), TAG_DOUBLE: struct.Struct('>d')}
+_ARRAYS = {TAG_BYTE_ARRAY: 'b', TAG_INT_ARRAY: 'i', TAG_LONG_ARRAY: 'q'}
+_ARRAY_WIDTH = {'b': 1, 'i': 4, 'q': 8}
+_U16 = struct.Struct('>H')
+_I32 = struct.Struct('>i')
+
+
+def _string(data, pos):
+    (length,) = _U16.unpack_from(data, pos)
+    pos += 2
+    raw = data[pos:pos + length]
+    try:
+        return raw.decode('utf-8'), pos + length
+    except UnicodeDecodeError:
+        # Java's modified UTF-8: NUL as C0 80 and astral characters as surrogate pairs
+        return raw.decode('utf-8', 'surrogatepass').encode('utf-16', 'surrogatepass').decode('utf-16'), pos + length
+
+
+def _payload(tag, data, pos):
+    """(value, next position) of one payload; lists of compounds become lists of dicts."""
+    fixed = _FIXED.get(tag)
+    if fixed is not None:
+        return fixed.unpack_from(data, pos)[0], pos + fixed.size
+    if tag == TAG_STRING:
+        return _string(data, pos)
+    if tag == TAG_COMPOUND:
+        out = {}
+        while True:
+            child = data[pos]
+            pos += 1
+            if child == TAG_END:
+                return out, pos
+            name, pos = _string(data, pos)
+            out[name], pos = _payload(child, data, pos)
+    if tag == TAG_LIST:
+        child = data[pos]
+        (length,) = _I32.unpack_from(data, pos + 1)
+        pos += 5
+        out = []
+        for _ in range(length):
+            value, pos = _payload(child, data, pos)
+            out.append(value)
+        return out, pos
+    code = _ARRAYS.get(tag)
+    if code is not None:
+        (length,) = _I32.unpack_from(data, pos)
+        pos += 4
+        end = pos + length * _ARRAY_WIDTH[code]
+        return list(struct.unpack_from(f'>{length}{code}', data, pos)), end
+    raise NBTError(f"unknown tag type {tag} at byte {pos}")
+
+
+def _skip(tag, data, pos):
+    """Position after one payload, without building it."""
+    fixed = _FIXED.get(tag)
+    if fixed is not None:
+        return pos + fixed.size
+    if tag == TAG_STRING:
+        return pos + 2 + _U16.unpack_from(data, pos)[0]
+    if tag == TAG_COMPOUND:
+        while True:
+            child = data[pos]
+            pos += 1
+            if child == TAG_END:
+                return pos
+            pos += 2 + _U16.unpack_from(data, pos)[0]
+            pos = _skip(child, data, pos)
+    if tag == TAG_LIST:
+        child = data[pos]
+        (length,) = _I32.unpack_from(data, pos + 1)
+        pos += 5
+        fixed = _FIXED.get(child)
+        if fixed is not None:
+            return pos + length * fixed.size
+        for _ in range(length):
+            pos = _skip(child, data, pos)
+        return pos
+    code = _ARRAYS.get(tag)
+    if code is not None:
+        return pos + 4 + _I32.unpack_from(data, pos)[0] * _ARRAY_WIDTH[code]
+    raise NBTError(f"unknown tag type {tag} at byte {pos}")
+
+
+def read_nbt(data, only=None):
+    """
+    Root compound of an uncompressed NBT document as a dict. With `only`, the
+    root's other tags are skipped.
+    """
+    try:
+        if data[0] != TAG_COMPOUND:
+            raise NBTError("root is not a compound")
+        _, pos = _string(data, 1)
+        out = {}
+        while True:
+            child = data[pos]
+            pos += 1
+            if child == TAG_END:
+                return out
+            name, pos = _string(data, pos)
+            if only is None or name in only:
+                out[name], pos = _payload(child, data, pos)
+            else:
+                pos = _skip(child, data, pos)
+    except (IndexError, struct.error) as e:
+        raise NBTError(f"truncated NBT: {e}") from e
+
+
+def load_nbt(path, only=None):
+    """Root compound of a gzipped (or plain) NBT file."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:2] == b'\x1f\x8b':
+        try:
+            data = gzip.decompress(data)
+        except (OSError, EOFError, zlib.error) as e:
+            raise NBTError(f"bad gzip: {e}") from e
+    return read_nbt(data, only)
+
+
+# ------------------------------------------------------------
+# Stacks
+# ------------------------------------------------------------
+
+def _legacy_components(tag):
+    """Components from a pre-1.20.5 "tag" compound: display name, lore and enchantments."""
+    components = {}
+    display = tag.get('display') if isinstance(tag.get('display'), dict) else {}
+    if 'Name' in display:
+        components['custom_name'] = display['Name']
+    if isinstance(display.get('Lore'), list):
+        components['lore'] = display['Lore']
+    for source, target in (('Enchantments', 'enchantments'), ('StoredEnchantments', 'stored_enchantments')):
+        if isinstance(tag.get(source), list):
+            components[target] = {e.get('id'): e.get('lvl') for e in tag[source] if isinstance(e, dict)}
+    custom = {name: value for name, value in tag.items()
+              if name not in ('display', 'Enchantments', 'StoredEnchantments', 'Damage', 'RepairCost')}
+    if custom:
+        components['custom_data'] = custom
+    return components
+
+
+def _strip(components):
+    return {(name[len('minecraft:'):] if name.startswith('minecraft:') else name): value
+            for name, value in components.items()}
+
+
+def stacks(items, depth=0):
+    """(key, count, components) of an item list, container contents included (after their container)."""
+    for entry in items:
+        if not isinstance(entry, dict) or 'id' not in entry:
+            continue
+        if 'components' in entry:
+            components = _strip(entry['components']) if isinstance(entry['components'], dict) else {}
+        else:
+            components = _legacy_components(entry['tag']) if isinstance(entry.get('tag'), dict) else {}
+        count = entry.get('count', entry.get('Count', 1))
+        yield entry['id'], count, components
+        if depth < MAX_NESTING:
+            inner = components.get('container')
+            if isinstance(inner, list):
+                yield from stacks([slot.get('item') for slot in inner if isinstance(slot, dict)], depth + 1)
+            inner = components.get('bundle_contents')
+            if isinstance(inner, list):
+                yield from stacks(inner, depth + 1)
+
+
+class Matcher:
+    """Item list stacks -> items.json ids, memoized by key + components."""
+
+    def __init__(self, catalog):
+        from kenkoku.originals import OriginalIndex
+
+        self.catalog = catalog
+        self.index = OriginalIndex.from_catalog(catalog)
+        self.memo = {}
+
+    def match(self, key, components):
+        """("item", db_id) | ("bill", value) | ("unmatched", label)."""
+        memo_key = (key, json.dumps(components, sort_keys=True, ensure_ascii=False, default=str))
+        found = self.memo.get(memo_key)
+        if found is None:
+            found = self.memo[memo_key] = self._match(key, components)
+        return found
+
+    def _match(self, key, components):
+        from kenkoku.originals import CanonicalItem, namespaced
+
+        key = namespaced(key)
+        if not components:
+            db_id = self.catalog.key_to_id.get(key)
+            return ("item", db_id) if db_id is not None else ("unmatched", key)
+        item = CanonicalItem(None, None, key, components)
+        item_type = item.custom_data.get('itemType')
+        if item_type == 'bill':
+            return "bill", item.custom_data.get('value', 0)
+        group = self.index.by_digest.get(item.digest)
+        if group:
+            return "item", group[0].item_id
+        if not any(components.get(name) is not None for name in IDENTIFYING):
+            # Worn or enchanted vanilla gear; the enchantment-only originals carry exactly their set
+            db_id = self.index.find({"key": key, "enchantments": item.enchantments}) if item.enchantments else None
+            if db_id is None:
+                db_id = self.catalog.key_to_id.get(key)
+            return ("item", db_id) if db_id is not None else ("unmatched", key)
+        # SNBT "true" and binary 1b differ in the digest; fall back to the identifying attributes
+        specs = [{"display_name": item.display_name}]
+        if item_type is not None:
+            specs += [{"display_name": item.display_name, "custom_data": {"itemType": item_type}},
+                      {"custom_data": {"itemType": item_type}}]
+        for spec in specs:
+            db_id = self.index.find(dict(spec, key=key, enchantments=item.enchantments))
+            if db_id is not None:
+                return "item", db_id
+        return "unmatched", f"{key} {item.display_name!r}" if item.display_name else key
+
+
+# ------------------------------------------------------------
+# Workers
+# ------------------------------------------------------------
+
+_matcher = None
+
+
+def _init_worker(items_path):
+    global _matcher
+    from kenkoku.catalog import load_catalog
+
+    _matcher = Matcher(load_catalog(items_path))
+
+
+def inspect_file(path, matcher=None):
+    """Compact summary of one player file: item counts per container, bills and unmatched stacks."""
+    matcher = matcher or _matcher
+    stat = os.stat(path)
+    result = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "name": None, "items": {},
+              "bills": {}, "unmatched": {}, "error": None}
+    try:
+        root = load_nbt(path, set(CONTAINERS) | {'bukkit', 'Paper'})
+    except (OSError, NBTError) as e:
+        result["error"] = str(e)
+        return result
+    bukkit = root.get('bukkit')
+    if isinstance(bukkit, dict):
+        result["name"] = bukkit.get('lastKnownName')
+    for tag, container in CONTAINERS.items():
+        if not isinstance(root.get(tag), list):
+            continue
+        for key, count, components in stacks(root[tag]):
+            kind, value = matcher.match(key, components)
+            if kind == "item":
+                counts = result["items"].setdefault(str(value), {})
+                counts[container] = counts.get(container, 0) + count
+            elif kind == "bill":
+                result["bills"][str(value)] = result["bills"].get(str(value), 0) + count
+            else:
+                result["unmatched"][value] = result["unmatched"].get(value, 0) + count
+    return result
+
+
+def _inspect_batch(paths):
+    return [(os.path.basename(path), inspect_file(path)) for path in paths]
+
+
+def player_files(directory):
+    """<uuid>.dat files of a playerdata directory (not the .dat_old backups)."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return sorted(os.path.join(directory, name) for name in names if name.endswith('.dat'))
+
+
+# ------------------------------------------------------------
+# State
+# ------------------------------------------------------------
+
+def new_state(directory, items_hash):
+    return {"version": STATE_VERSION, "dir": os.path.abspath(directory), "items": items_hash, "files": {}}
+
+
+def load_state(path, directory, items_hash):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return new_state(directory, items_hash)
+    if (state.get("version") != STATE_VERSION or state.get("dir") != os.path.abspath(directory)
+            or state.get("items") != items_hash):
+        return new_state(directory, items_hash)
+    return state
+
+
+def save_state(path, state):
+    from kenkoku.generator import atomic_write
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    atomic_write(path, json.dumps(state, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def scan(directory, items_path, state, workers=None):
+    """
+    Inspect the .dat files whose mtime or size changed since `state` (updated
+    in place; vanished players are dropped). Returns the number of files read.
+    """
+    files = state["files"]
+    paths = player_files(directory)
+    names = {os.path.basename(path) for path in paths}
+    for gone in set(files) - names:
+        del files[gone]
+    stale = []
+    for path in paths:
+        cached = files.get(os.path.basename(path))
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if cached is None or cached["mtime_ns"] != stat.st_mtime_ns or cached["size"] != stat.st_size:
+            stale.append(path)
+    if not stale:
+        return 0
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(stale) < 64:
+        _init_worker(items_path)
+        for name, result in _inspect_batch(stale):
+            files[name] = result
+        return len(stale)
+    # A few batches per worker: one pickle round trip per batch, and stragglers even out
+    size = max(16, len(stale) // (workers * 4))
+    batches = [stale[i:i + size] for i in range(0, len(stale), size)]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(items_path,)) as pool:
+        for results in pool.map(_inspect_batch, batches):
+            for name, result in results:
+                files[name] = result
+    return len(stale)
+
+
+# ------------------------------------------------------------
+# Report
+# ------------------------------------------------------------
+
+def summarize(state, catalog):
+    """{"players": [...], "items": [...], "bills": {...}, "unmatched": {...}, "errors": [...]}."""
+    players, items, bills, unmatched, errors = [], {}, {}, {}, []
+    for filename, result in sorted(state["files"].items()):
+        uuid = filename[:-len('.dat')]
+        if result["error"]:
+            errors.append({"uuid": uuid, "error": result["error"]})
+            continue
+        money = sum(int(float(value)) * count for value, count in result["bills"].items())
+        players.append({"uuid": uuid, "name": result["name"], "items": result["items"],
+                        "bills": result["bills"], "money_paper": money, "unmatched": result["unmatched"],
+                        "stacks": sum(sum(c.values()) for c in result["items"].values())})
+        for db_id, counts in result["items"].items():
+            total = items.setdefault(db_id, {"inventory": 0, "ender": 0, "players": 0})
+            for container, count in counts.items():
+                total[container] += count
+            total["players"] += 1
+        for value, count in result["bills"].items():
+            bills[value] = bills.get(value, 0) + count
+        for label, count in result["unmatched"].items():
+            unmatched[label] = unmatched.get(label, 0) + count
+    item_rows = []
+    for db_id, total in items.items():
+        row = catalog.all_items.get(int(db_id), {})
+        item_rows.append({"id": int(db_id), "name": row.get("name"), "key": row.get("key"),
+                          "original": bool(row.get("is_original")), **total})
+    item_rows.sort(key=lambda r: (-(r["inventory"] + r["ender"]), r["id"]))
+    return {"players": players, "items": item_rows, "bills": bills, "unmatched": unmatched, "errors": errors}
+
+
+def write_csv(path, summary, catalog):
+    """One row per player, container and item."""
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["uuid", "player", "container", "item_id", "item", "count"])
+        for player in summary["players"]:
+            for db_id, counts in sorted(player["items"].items(), key=lambda kv: int(kv[0])):
+                name = catalog.all_items.get(int(db_id), {}).get("name")
+                for container, count in sorted(counts.items()):
+                    writer.writerow([player["uuid"], player["name"] or "", container, db_id, name, count])
+
+
+def format_summary(summary, top=15):
+    lines = [f"{len(summary['players'])} players, {len(summary['items'])} distinct items"]
+    originals = [row for row in summary["items"] if row["original"]]
+    for title, rows in (("Most held items", summary["items"]), ("Original items", originals)):
+        if rows:
+            lines.append(f"\n{title}:")
+            for row in rows[:top]:
+                lines.append(f"  #{row['id']:<5} {row['name'] or row['key']:<28} inventory {row['inventory']:>7}  "
+                             f"ender {row['ender']:>6}  players {row['players']:>5}")
+    if summary["bills"]:
+        total = sum(int(float(value)) * count for value, count in summary["bills"].items())
+        lines.append(f"\nMoney paper: {total}G in {sum(summary['bills'].values())} bills")
+        richest = sorted(summary["players"], key=lambda p: -p["money_paper"])[:5]
+        for player in richest:
+            if player["money_paper"]:
+                lines.append(f"  {player['name'] or player['uuid']:<36} {player['money_paper']:>10}G")
+    if summary["unmatched"]:
+        lines.append(f"\nUnmatched stacks ({len(summary['unmatched'])} kinds):")
+        for label, count in sorted(summary["unmatched"].items(), key=lambda kv: -kv[1])[:top]:
+            lines.append(f"  {count:>7}  {label}")
+    for error in summary["errors"]:
+        lines.append(f"  WARNING: {error['uuid']}: {error['error']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    from kenkoku.catalog import file_hash, load_catalog
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Summarize player inventories and ender chests against items.json")
+    parser.add_argument('--dir', default=os.path.join(base_dir, 'minecraft_server', 'world', 'playerdata'),
+                        help="playerdata directory")
+    parser.add_argument('--items', default=os.path.join(base_dir, 'items.json'))
+    parser.add_argument('--workers', type=int, help="decoding processes (default: one per CPU)")
+    parser.add_argument('--state', default=os.path.join(base_dir, CACHE_DIR_NAME, 'playerdata.scan.json'),
+                        help="per-file result cache")
+    parser.add_argument('--reset', action='store_true', help="forget the cache and re-read every file")
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--json', help="write the per-player / per-item summary here")
+    parser.add_argument('--csv', help="write player, container, item, count rows here")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.dir):
+        print(f"No playerdata directory at {args.dir}", file=sys.stderr)
+        return 1
+    items_hash = file_hash(args.items)
+    state = new_state(args.dir, items_hash) if args.reset else load_state(args.state, args.dir, items_hash)
+    start = time.perf_counter()
+    read = scan(args.dir, args.items, state, args.workers)
+    elapsed = time.perf_counter() - start
+    save_state(args.state, state)
+
+    catalog = load_catalog(args.items)
+    summary = summarize(state, catalog)
+    if args.json:
+        from kenkoku.generator import atomic_write
+        atomic_write(args.json, json.dumps(summary, ensure_ascii=False, indent=1).encode('utf-8'))
+    if args.csv:
+        write_csv(args.csv, summary, catalog)
+    print(format_summary(summary, args.top))
+    print(f"\nRead {read} of {len(state['files'])} player files in {elapsed * 1000:.0f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
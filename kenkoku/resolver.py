@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Item id resolver shared by every request section.
+Memoizes key / name / attribute lookups against a Catalog and records misses
+instead of printing them, so callers decide how to report them. Every lookup
+is counted per kind (calls, memo hits, misses, for keys the "minecraft:"
+prefix retries and for names the seed aliases) for generate_json.py --profile.
+
+A name that is not in the catalog falls back to the registerItem seeds of
+seed-items.sk: kenkoku.originals.dedupe_seeds never inserts a seed identical
+to an existing original, so its name resolves to that original's id.
+"""
+
+import json
+import os
+
+LOOKUP_KINDS = ('key', 'name', 'attrs')
+# registerItem seeds behind the seed aliases (kenkoku/manifest.py hashes it too)
+SEED_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           'minecraft_server', 'plugins', 'Skript', 'scripts', 'seed-items.sk')
+
+
+class Resolver:
+    """Memoized minecraft key / original item name / attribute spec -> db_id lookups."""
+
+    def __init__(self, catalog, seed_script=None):
+        self.catalog = catalog
+        # None: SEED_SCRIPT; a missing file means no seed aliases
+        self.seed_script = seed_script
+        self._seed_aliases = None
+        self._by_key = {}
+        self._by_name = {}
+        self._by_attrs = {}
+        self._originals = None
+        # (kind, value) of every lookup that failed, in first-seen order
+        self.misses = []
+        # Optional dict that records (kind, value) -> db_id for every lookup
+        self.trace = None
+        # kind -> {counter: n}, see stats()
+        self.counts = {kind: {"calls": 0, "memo_hits": 0, "misses": 0} for kind in LOOKUP_KINDS}
+        self.counts['key']["prefix_fallbacks"] = 0
+        self.counts['name']["seed_aliases"] = 0
+
+    def get_id_by_key(self, mc_key):
+        if not mc_key:
+            return None
+        counts = self.counts['key']
+        counts["calls"] += 1
+        if mc_key in self._by_key:
+            counts["memo_hits"] += 1
+            db_id = self._by_key[mc_key]
+            if self.trace is not None:
+                self.trace[('key', mc_key)] = db_id
+            return db_id
+
+        key_to_id = self.catalog.key_to_id
+        db_id = key_to_id.get(mc_key)
+        # Try with minecraft: prefix
+        if db_id is None and not mc_key.startswith('minecraft:'):
+            db_id = key_to_id.get('minecraft:' + mc_key)
+            if db_id is not None:
+                counts["prefix_fallbacks"] += 1
+        if db_id is None:
+            counts["misses"] += 1
+            self.misses.append(('key', mc_key))
+
+        self._by_key[mc_key] = db_id
+        if self.trace is not None:
+            self.trace[('key', mc_key)] = db_id
+        return db_id
+
+    def get_id_by_name(self, name):
+        counts = self.counts['name']
+        counts["calls"] += 1
+        if name in self._by_name:
+            counts["memo_hits"] += 1
+            db_id = self._by_name[name]
+            if self.trace is not None:
+                self.trace[('name', name)] = db_id
+            return db_id
+
+        db_id = self.catalog.name_to_id.get(name)
+        if db_id is None:
+            db_id = self.seed_aliases().get(name)
+            if db_id is not None:
+                counts["seed_aliases"] += 1
+        if db_id is None:
+            counts["misses"] += 1
+            self.misses.append(('name', name))
+
+        self._by_name[name] = db_id
+        if self.trace is not None:
+            self.trace[('name', name)] = db_id
+        return db_id
+
+    def _original_index(self):
+        from kenkoku.originals import OriginalIndex
+
+        # Parsing every original's nbt is only worth it once it is needed
+        if self._originals is None:
+            self._originals = OriginalIndex.from_catalog(self.catalog)
+        return self._originals
+
+    def seed_aliases(self):
+        """{seed name: db_id} for seeds deduplicated into an existing original (see kenkoku.originals)."""
+        if self._seed_aliases is None:
+            from kenkoku.originals import seed_aliases, seeds_from_script
+
+            path = self.seed_script or SEED_SCRIPT
+            self._seed_aliases = {}
+            if os.path.exists(path):
+                self._seed_aliases = seed_aliases(seeds_from_script(path), self._original_index())
+        return self._seed_aliases
+
+    def get_id_by_attrs(self, spec):
+        """Original item by attributes, e.g. {"key": ..., "enchantments": {...}} (see kenkoku.originals)."""
+        from kenkoku.originals import spec_key
+
+        value = spec_key(spec)
+        counts = self.counts['attrs']
+        counts["calls"] += 1
+        if value in self._by_attrs:
+            counts["memo_hits"] += 1
+            db_id = self._by_attrs[value]
+        else:
+            db_id = self._original_index().find(json.loads(value))
+            if db_id is None:
+                counts["misses"] += 1
+                self.misses.append(('attrs', value))
+            self._by_attrs[value] = db_id
+        if self.trace is not None:
+            self.trace[('attrs', value)] = db_id
+        return db_id
+
+    def get_original(self, ref):
+        """Original item by display name (str) or attribute spec (dict)."""
+        if isinstance(ref, dict):
+            return self.get_id_by_attrs(ref)
+        return self.get_id_by_name(ref)
+
+    def lookup(self, kind, value):
+        """Dispatch a recorded (kind, value) lookup."""
+        if kind == 'key':
+            return self.get_id_by_key(value)
+        if kind == 'attrs':
+            return self.get_id_by_attrs(json.loads(value))
+        return self.get_id_by_name(value)
+
+    def stats(self):
+        """{kind: {"calls", "memo_hits", "lookups", "hits", "misses"[, "prefix_fallbacks"]}}."""
+        out = {}
+        for kind, counts in self.counts.items():
+            lookups = counts["calls"] - counts["memo_hits"]
+            out[kind] = {"calls": counts["calls"], "memo_hits": counts["memo_hits"], "lookups": lookups,
+                         "hits": lookups - counts["misses"], "misses": counts["misses"]}
+            for extra in ("prefix_fallbacks", "seed_aliases"):
+                if extra in counts:
+                    out[kind][extra] = counts[extra]
+        return out
+
+    def get_id(self, entry):
+        """Resolve a definition entry that names an item by original_name (or attributes) or key."""
+        if "original_name" in entry:
+            return self.get_original(entry["original_name"])
+        if "key" in entry:
+            return self.get_id_by_key(entry["key"])
+        return None
+
+
+def format_miss(miss):
+    """Warning line for a resolver miss, as generate_json.py always printed them."""
+    kind, value = miss
+    if kind == 'key':
+        return f"  WARNING: Key not found: {value}"
+    if kind == 'attrs':
+        return f"  WARNING: Original item not found by attributes: {value}"
+    return f"  WARNING: Original item name not found: {value}"
@@ -0,0 +1,514 @@
+# -*- coding: utf-8 -*-
+"""
+Skript variable store profiler and compactor
+Streams the variable store of the default database in
+plugins/Skript/config.sk (the CSV flat file, or the SQLite variables21
+table this server uses) and reports, per variable-name prefix and per
+player,
+
+  entries        how many variables
+  stored         serialized bytes on disk
+  memory         an estimate of what Skript keeps on the heap for them
+                 (name strings, map entries and the boxed value, see
+                 estimate_memory); good for ranking, not a heap dump
+  largest list   the most elements under one list variable, e.g. query
+                 results cached in {npc_trades::*}
+
+Prefixes are the variable names with UUID and numeric segments replaced by
+*, e.g. {cooldown::jumpKun::<uuid>} -> cooldown::jumpKun::*. A player is the
+UUID segment ("use player UUIDs in variable names: true"); players last seen
+more than --stale-days ago (world/playerdata/<uuid>.dat mtime, or
+usercache.json) are flagged, and --compact writes a copy of the store
+without their variables.
+
+Memory is constant in the store size: rows are read one at a time (SQLite in
+name order), and list sizes are run lengths, which holds because Skript
+writes a list's elements together. Only the per-prefix and per-player
+totals are kept.
+
+    python -m kenkoku.skriptvars
+    python -m kenkoku.skriptvars variables.csv --stale-days 60 --compact variables.compact.csv
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+SKRIPT_TABLE = 'variables21'
+DEFAULT_STALE_DAYS = 90
+DEFAULT_DEPTH = 3
+# Above this many distinct prefixes, new ones are folded into their first segment
+MAX_PREFIXES = 5000
+
+_UUID = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+_NUMBER = re.compile(r'^-?\d+(?:\.\d+)?$')
+_SEPARATOR = '::'
+
+
+# ------------------------------------------------------------
+# config.sk
+# ------------------------------------------------------------
+
+def _value(raw):
+    """Option value without its trailing "# comment" ("##" is a literal #)."""
+    out = []
+    i = 0
+    while i < len(raw):
+        if raw[i] == '#':
+            if raw[i + 1:i + 2] == '#':
+                out.append('#')
+                i += 2
+                continue
+            break
+        out.append(raw[i])
+        i += 1
+    return ''.join(out).strip()
+
+
+def read_databases(config_path):
+    """[{"name", "type", "pattern", "file"}] of the enabled databases, in config order."""
+    databases, current, in_section = [], None, False
+    with open(config_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            depth = len(line) - len(line.lstrip('\t'))
+            if depth == 0:
+                in_section = stripped == 'databases:'
+                continue
+            if not in_section:
+                continue
+            if depth == 1 and stripped.endswith(':'):
+                current = {"name": stripped[:-1], "type": None, "pattern": '.*', "file": None}
+                databases.append(current)
+            elif depth == 2 and current is not None and ':' in stripped:
+                key, _, raw = stripped.partition(':')
+                if key in ('type', 'pattern', 'file'):
+                    current[key] = _value(raw)
+    return [db for db in databases if db["type"] and db["type"].lower() != 'disabled']
+
+
+def default_store(config_path, server_dir):
+    """(type, path) of the catch-all database (the last enabled one), paths relative to the server dir."""
+    databases = read_databases(config_path)
+    if not databases:
+        return None, None
+    db = databases[-1]
+    path = db["file"]
+    if path and not os.path.isabs(path):
+        path = os.path.normpath(os.path.join(server_dir, path))
+    return db["type"].lower(), path
+
+
+# ------------------------------------------------------------
+# Stores
+# ------------------------------------------------------------
+
+def csv_rows(path):
+    """(name, type, stored bytes, raw line) of a Skript CSV store, streamed; comments and blanks come as (None, ...)."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                yield None, None, 0, line
+                continue
+            if line.startswith('"'):
+                fields = next(csv.reader([line], skipinitialspace=True))
+            else:
+                # Unquoted names cannot hold a comma, and values are hex
+                fields = line.split(',', 2)
+            if len(fields) != 3:
+                yield None, None, 0, line
+                continue
+            name, kind, value = (field.strip() for field in fields)
+            yield name, kind, len(value) // 2, line
+
+
+def sqlite_rows(conn):
+    """(name, type, stored bytes, row) of Skript's SQLite table in name order; deleted rows are skipped."""
+    cursor = conn.execute(f"SELECT name, type, value, update_guid FROM {SKRIPT_TABLE} "
+                          "WHERE type IS NOT NULL ORDER BY name")
+    for row in cursor:
+        yield row[0], row[1], len(row[2]) if row[2] is not None else 0, row
+
+
+# ------------------------------------------------------------
+# Footprint
+# ------------------------------------------------------------
+
+# Heap bytes of a boxed value by Skript type (64-bit JVM, compressed oops). Types that
+# carry a Bukkit object (items, locations, players) scale with their serialized size.
+_VALUE_BYTES = {
+    'boolean': 16, 'long': 24, 'double': 24, 'integer': 16, 'number': 24, 'date': 24, 'timespan': 24,
+    'offlineplayer': 160, 'player': 160, 'world': 16,
+}
+# HashMap node + table slot for the flat map, TreeMap entry for the list tree
+_ENTRY_BYTES = 32 + 8 + 40
+
+
+def _string_bytes(text=None, length=None):
+    """A java.lang.String: object header + byte[] (Latin-1 or UTF-16), 8-byte aligned."""
+    if length is None:
+        length = len(text) if text.isascii() else 2 * len(text)
+    return 24 + ((16 + length + 7) // 8) * 8
+
+
+def estimate_memory(name, kind, stored):
+    """Rough heap bytes Skript holds for one variable: full name, list index, entries and the value."""
+    index = name.rsplit(_SEPARATOR, 1)[-1]
+    value = _VALUE_BYTES.get(kind)
+    if value is None:
+        value = _string_bytes(length=stored) if kind == 'string' else 16 + 3 * stored
+    return _string_bytes(name) + (_string_bytes(index) if index != name else 0) + _ENTRY_BYTES + value
+
+
+# ------------------------------------------------------------
+# Profile
+# ------------------------------------------------------------
+
+def _wild(segment):
+    return segment.isdigit() or (len(segment) == 36 and _UUID.match(segment)) or _NUMBER.match(segment)
+
+
+def prefix_of(name, depth=DEFAULT_DEPTH):
+    """Name with UUID / numeric segments as *, cut to `depth` segments."""
+    segments = name.split(_SEPARATOR)
+    out = ['*' if _wild(s) else s for s in segments[:depth]]
+    if len(segments) > depth:
+        out.append('…')
+    return _SEPARATOR.join(out)
+
+
+def player_of(name):
+    """First UUID segment of a variable name (lower case), or None."""
+    for segment in name.split(_SEPARATOR):
+        if len(segment) == 36 and _UUID.match(segment):
+            return segment.lower()
+    return None
+
+
+class Totals:
+    __slots__ = ('entries', 'stored', 'memory', 'largest_list', 'largest_list_name', 'stale')
+
+    def __init__(self):
+        self.entries = self.stored = self.memory = self.largest_list = self.stale = 0
+        self.largest_list_name = None
+
+    def add(self, stored, memory, stale):
+        self.entries += 1
+        self.stored += stored
+        self.memory += memory
+        if stale:
+            self.stale += 1
+
+    def to_dict(self):
+        return {"entries": self.entries, "stored": self.stored, "memory": self.memory,
+                "largest_list": self.largest_list, "largest_list_name": self.largest_list_name,
+                "stale": self.stale}
+
+
+class Profile:
+    """Streaming aggregates over a variable store."""
+
+    def __init__(self, last_seen=None, cutoff=None, depth=DEFAULT_DEPTH, drop_unknown=False):
+        # last_seen: player uuid -> unix time; a player older than cutoff (or absent, with drop_unknown) is stale
+        self.last_seen = last_seen or {}
+        self.cutoff = cutoff
+        self.depth = depth
+        self.drop_unknown = drop_unknown
+        self.total = Totals()
+        self.prefixes = {}
+        self.players = {}
+        self.types = {}
+        self._list = None          # (parent name, prefix) of the current run
+        self._run = 0
+        # The elements of a list come together: their parent's player and wildcard prefix are reused
+        self._parent = (None, None, None)
+
+    def is_stale(self, player):
+        if player is None or self.cutoff is None:
+            return False
+        seen = self.last_seen.get(player)
+        if seen is None:
+            return self.drop_unknown
+        return seen < self.cutoff
+
+    def _prefix(self, name):
+        prefix = prefix_of(name, self.depth)
+        if prefix not in self.prefixes and len(self.prefixes) >= MAX_PREFIXES:
+            prefix = name.split(_SEPARATOR, 1)[0] + (_SEPARATOR + '…' if _SEPARATOR in name else '')
+        return prefix
+
+    def add(self, name, kind, stored):
+        """Account one variable; returns True when it belongs to a stale player."""
+        parent, _, index = name.rpartition(_SEPARATOR)
+        cached_parent, parent_player, wild_prefix = self._parent
+        if parent != cached_parent or not parent:
+            parent_player = player_of(parent) if parent else None
+            wild_prefix = None
+        player = parent_player
+        if player is None and len(index) == 36 and _UUID.match(index):
+            player = index.lower()
+        if _wild(index):
+            if wild_prefix is None:
+                wild_prefix = self._prefix(name)
+            prefix = wild_prefix
+        else:
+            prefix = self._prefix(name)
+        self._parent = (parent, parent_player, wild_prefix)
+        stale = self.is_stale(player)
+        memory = estimate_memory(name, kind, stored)
+        totals = self.prefixes.get(prefix)
+        if totals is None:
+            totals = self.prefixes[prefix] = Totals()
+        totals.add(stored, memory, stale)
+        self.total.add(stored, memory, stale)
+        if player is not None:
+            totals = self.players.get(player)
+            if totals is None:
+                totals = self.players[player] = Totals()
+            totals.add(stored, memory, stale)
+        self.types[kind] = self.types.get(kind, 0) + 1
+
+        if parent and self._list is not None and parent == self._list[0]:
+            self._run += 1
+        else:
+            self._end_list()
+            self._list = (parent, prefix) if parent else None
+            self._run = 1
+        return stale
+
+    def _end_list(self):
+        if self._list is None:
+            return
+        parent, prefix = self._list
+        totals = self.prefixes[prefix]
+        if self._run > totals.largest_list:
+            totals.largest_list, totals.largest_list_name = self._run, parent
+        self._list = None
+
+    def finish(self):
+        self._end_list()
+        return self
+
+
+# ------------------------------------------------------------
+# Last seen
+# ------------------------------------------------------------
+
+def last_seen_from_playerdata(directory):
+    """uuid -> mtime of world/playerdata/<uuid>.dat (written on logout and autosave)."""
+    from kenkoku.playerdata import player_files
+
+    seen = {}
+    for path in player_files(directory):
+        uuid = os.path.basename(path)[:-len('.dat')].lower()
+        if _UUID.match(uuid):
+            seen[uuid] = os.stat(path).st_mtime
+    return seen
+
+
+def last_seen_from_usercache(path):
+    """uuid -> last login from usercache.json (entries expire one month after the login)."""
+    from datetime import datetime, timedelta
+
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    seen = {}
+    for entry in entries:
+        try:
+            expires = datetime.strptime(entry["expiresOn"], "%Y-%m-%d %H:%M:%S %z")
+        except (KeyError, ValueError):
+            continue
+        seen[entry["uuid"].lower()] = (expires - timedelta(days=30)).timestamp()
+    return seen
+
+
+# ------------------------------------------------------------
+# Profiling and compaction
+# ------------------------------------------------------------
+
+def profile_csv(path, profile, compact_to=None):
+    """Stream a CSV store into profile; with compact_to, write the non-stale lines there. Returns lines dropped."""
+    dropped = 0
+    rows = csv_rows(path)
+    if compact_to is None:
+        for name, kind, stored, _ in rows:
+            if name is not None:
+                profile.add(name, kind, stored)
+        profile.finish()
+        return 0
+    # Written beside the target and renamed, so a failed run never leaves half a store
+    partial = compact_to + '.tmp'
+    with open(partial, 'w', encoding='utf-8', newline='') as out:
+        for name, kind, stored, line in rows:
+            if name is not None and profile.add(name, kind, stored):
+                dropped += 1
+                continue
+            out.write(line)
+    os.replace(partial, compact_to)
+    profile.finish()
+    return dropped
+
+
+def profile_sqlite(path, profile, compact_to=None, batch_rows=1000):
+    """Stream Skript's SQLite table into profile; with compact_to, copy the non-stale rows there. Returns rows dropped."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        if compact_to is None:
+            for name, kind, stored, _ in sqlite_rows(conn):
+                profile.add(name, kind, stored)
+            profile.finish()
+            return 0
+        (schema,) = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                 (SKRIPT_TABLE,)).fetchone()
+        partial = compact_to + '.tmp'
+        if os.path.exists(partial):
+            os.remove(partial)
+        out = sqlite3.connect(partial, isolation_level=None)
+        out.execute(schema)
+        out.execute("BEGIN")
+        dropped, batch = 0, []
+        for name, kind, stored, row in sqlite_rows(conn):
+            if profile.add(name, kind, stored):
+                dropped += 1
+                continue
+            batch.append(row)
+            if len(batch) >= batch_rows:
+                out.executemany(f"INSERT INTO {SKRIPT_TABLE} (name, type, value, update_guid) VALUES (?, ?, ?, ?)",
+                                batch)
+                batch.clear()
+        if batch:
+            out.executemany(f"INSERT INTO {SKRIPT_TABLE} (name, type, value, update_guid) VALUES (?, ?, ?, ?)", batch)
+        out.execute("COMMIT")
+        out.close()
+        os.replace(partial, compact_to)
+        profile.finish()
+        return dropped
+    finally:
+        conn.close()
+
+
+def store_kind(path, kind=None):
+    """'csv' or 'sqlite' for a store path (by the config type, else by the file's header)."""
+    if kind:
+        return 'sqlite' if kind.lower() == 'sqlite' else 'csv'
+    with open(path, 'rb') as f:
+        return 'sqlite' if f.read(16) == b'SQLite format 3\x00' else 'csv'
+
+
+# ------------------------------------------------------------
+# Report
+# ------------------------------------------------------------
+
+def _size(n):
+    for unit in ('B', 'KB', 'MB'):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def format_report(profile, top=20):
+    total = profile.total
+    lines = [f"{total.entries} variables, {_size(total.stored)} stored, ~{_size(total.memory)} estimated heap, "
+             f"{len(profile.players)} players"]
+    if profile.cutoff is not None:
+        stale_players = sum(1 for t in profile.players.values() if t.stale)
+        lines.append(f"{total.stale} variables of {stale_players} players not seen since "
+                     f"{time.strftime('%Y-%m-%d', time.localtime(profile.cutoff))}")
+    lines.append("\nBy prefix (heap estimate):")
+    lines.append(f"  {'prefix':<36} {'entries':>9} {'stored':>9} {'memory':>9} {'stale':>7} {'largest list':>13}")
+    for prefix, t in sorted(profile.prefixes.items(), key=lambda kv: -kv[1].memory)[:top]:
+        lines.append(f"  {prefix:<36} {t.entries:>9} {_size(t.stored):>9} {_size(t.memory):>9} {t.stale:>7} "
+                     f"{t.largest_list:>13}")
+    if profile.players:
+        lines.append("\nBy player:")
+        for player, t in sorted(profile.players.items(), key=lambda kv: -kv[1].memory)[:top]:
+            seen = profile.last_seen.get(player)
+            when = time.strftime('%Y-%m-%d', time.localtime(seen)) if seen else 'never seen'
+            lines.append(f"  {player} {t.entries:>7} vars {_size(t.memory):>9}  {when}{'  STALE' if t.stale else ''}")
+    lines.append("\nTypes: " + ", ".join(f"{kind} {count}" for kind, count in
+                                         sorted(profile.types.items(), key=lambda kv: -kv[1])))
+    return "\n".join(lines)
+
+
+def to_json(profile):
+    return {
+        "total": profile.total.to_dict(),
+        "cutoff": profile.cutoff,
+        "prefixes": {prefix: t.to_dict() for prefix, t in profile.prefixes.items()},
+        "players": {player: dict(t.to_dict(), last_seen=profile.last_seen.get(player))
+                    for player, t in profile.players.items()},
+        "types": profile.types,
+    }
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    server_dir = os.path.join(base_dir, 'minecraft_server')
+    parser = argparse.ArgumentParser(description="Profile and compact Skript's variable store")
+    parser.add_argument('store', nargs='?', help="variables.csv / variables.db (default: from config.sk)")
+    parser.add_argument('--config', default=os.path.join(server_dir, 'plugins', 'Skript', 'config.sk'))
+    parser.add_argument('--server-dir', default=server_dir, help="what config.sk file paths are relative to")
+    parser.add_argument('--playerdata', help="world/playerdata for last-seen times "
+                                             "(default: <server-dir>/world/playerdata if present)")
+    parser.add_argument('--usercache', help="usercache.json for last-seen times")
+    parser.add_argument('--stale-days', type=float, default=DEFAULT_STALE_DAYS)
+    parser.add_argument('--drop-unknown', action='store_true',
+                        help="also treat players with no last-seen time as stale")
+    parser.add_argument('--depth', type=int, default=DEFAULT_DEPTH, help="name segments kept in a prefix")
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--compact', metavar='OUT', help="write a copy without the stale players' variables "
+                                                         "(stop the server first; Skript rewrites the store)")
+    args = parser.parse_args(argv)
+
+    kind = None
+    path = args.store
+    if path is None:
+        kind, path = default_store(args.config, args.server_dir)
+        if path is None:
+            print(f"No enabled database in {args.config}", file=sys.stderr)
+            return 1
+    if not os.path.exists(path):
+        print(f"No variable store at {path}", file=sys.stderr)
+        return 1
+    if args.compact and os.path.abspath(args.compact) == os.path.abspath(path):
+        print("--compact must name a new file", file=sys.stderr)
+        return 1
+
+    last_seen = {}
+    playerdata = args.playerdata or os.path.join(args.server_dir, 'world', 'playerdata')
+    if os.path.isdir(playerdata):
+        last_seen.update(last_seen_from_playerdata(playerdata))
+    if args.usercache:
+        for uuid, seen in last_seen_from_usercache(args.usercache).items():
+            last_seen[uuid] = max(seen, last_seen.get(uuid, seen))
+    cutoff = time.time() - args.stale_days * 86400 if (last_seen or args.drop_unknown) else None
+    profile = Profile(last_seen, cutoff, args.depth, args.drop_unknown)
+
+    start = time.perf_counter()
+    if store_kind(path, kind) == 'sqlite':
+        dropped = profile_sqlite(path, profile, args.compact)
+    else:
+        dropped = profile_csv(path, profile, args.compact)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(to_json(profile), ensure_ascii=False, indent=1))
+    else:
+        print(format_report(profile, args.top))
+        print(f"\nRead {path} in {elapsed * 1000:.0f} ms")
+    if args.compact:
+        print(f"Wrote {args.compact}: {profile.total.entries - dropped} kept, {dropped} dropped", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
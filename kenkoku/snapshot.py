@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Denormalized NPC trade snapshots
+npc-system.sk joins trades / trade_costs / rewards / items three times every
+time a player opens an NPC, and three more times per purchase. This module
+precomputes the same data once:
+
+  npc_snapshots    one row per NPC: its whole menu (trades in slot order with
+                   costs, rewards, item keys, display names and NBT) as JSON
+  trade_snapshots  one row per trade: the same trade JSON plus the NPC type,
+                   for executeTrade
+
+so either path is a single primary-key lookup. Snapshots are assembled
+either from an Export (kenkoku/sqlexport.py, ids assigned by the generator)
+or from the live tables in one pass, and loaded in one transaction.
+
+    python -m kenkoku.snapshot --sqlite /tmp/kenkoku.db     # rebuild from the tables
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from datetime import datetime
+
+from kenkoku.sqlexport import BIOMES, NPC_TYPES, PROFESSIONS, sql_literal
+
+NPC_SNAPSHOT_TABLE = 'npc_snapshots'
+TRADE_SNAPSHOT_TABLE = 'trade_snapshots'
+
+SNAPSHOT_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {NPC_SNAPSHOT_TABLE} (
+    npc_id BIGINT NOT NULL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    npc_type VARCHAR(64),
+    trade_count INT NOT NULL,
+    payload LONGTEXT NOT NULL,
+    digest CHAR(64) NOT NULL,
+    built_at DATETIME NOT NULL
+);
+CREATE TABLE IF NOT EXISTS {TRADE_SNAPSHOT_TABLE} (
+    trade_id BIGINT NOT NULL PRIMARY KEY,
+    npc_id BIGINT NOT NULL,
+    npc_type VARCHAR(64),
+    payload LONGTEXT NOT NULL
+);
+"""
+
+
+def _item(items, item_id):
+    """Joined item columns, named like the npc-system.sk queries."""
+    item = items.get(item_id) if item_id is not None else None
+    if item is None:
+        item = {}
+    return {
+        "item_id": item_id,
+        "item_key": item.get("key"),
+        "item_name": item.get("name"),
+        "display_name": item.get("name") or item.get("key"),   # IFNULL(i.name, i.key)
+        "nbt": item.get("nbt"),
+        "is_original": item.get("is_original"),
+    }
+
+
+def assemble(npc_rows, trade_rows, cost_rows, reward_rows, items, biomes, professions, npc_types):
+    """
+    Snapshot dicts from table rows shaped like sqlexport.TABLES (timestamps
+    ignored). items: {id: {"key", "name", "nbt", "is_original"}}; biomes /
+    professions / npc_types: {id: key or name}.
+    """
+    costs, rewards = {}, {}
+    for rows, target in ((cost_rows, costs), (reward_rows, rewards)):
+        for row_id, trade_id, item_id, quantity, price in (row[:5] for row in rows):
+            entry = _item(items, item_id)
+            entry.update(quantity=quantity, price=price)
+            target.setdefault(trade_id, []).append((row_id, entry))
+
+    trades = {}
+    for trade_id, npc_id, content, slot, view_item_id in (row[:5] for row in trade_rows):
+        view = _item(items, view_item_id)
+        trades.setdefault(npc_id, []).append({
+            "id": trade_id,
+            "content": content,
+            "slot": slot,
+            "view_item": view,
+            "costs": [entry for _, entry in sorted(costs.get(trade_id, ()), key=lambda e: e[0])],
+            "rewards": [entry for _, entry in sorted(rewards.get(trade_id, ()), key=lambda e: e[0])],
+        })
+
+    snapshots = []
+    for npc_id, name, level, biome_id, profession_id, npc_type_id in (row[:6] for row in npc_rows):
+        npc_trades = sorted(trades.get(npc_id, ()), key=lambda t: (t["slot"], t["id"]))
+        snapshots.append({
+            "id": npc_id,
+            "name": name,
+            "level": level,
+            "biome_key": biomes.get(biome_id),
+            "profession_key": professions.get(profession_id),
+            "npc_type": npc_types.get(npc_type_id),
+            "trades": npc_trades,
+        })
+    return snapshots
+
+
+def snapshots_from_export(export, catalog):
+    """Snapshots for the rows of a kenkoku.sqlexport.Export, items from a Catalog."""
+    rows = export.rows
+    used = {row[4] for row in rows["trades"]}
+    used.update(row[2] for table in ("trade_costs", "rewards") for row in rows[table])
+    items = {item_id: catalog.all_items[item_id] for item_id in used
+             if item_id is not None and item_id in catalog.all_items}
+    return assemble(rows["npcs"], rows["trades"], rows["trade_costs"], rows["rewards"], items,
+                    dict(enumerate(BIOMES, 1)), dict(enumerate(PROFESSIONS, 1)), dict(NPC_TYPES))
+
+
+def snapshots_from_db(conn):
+    """Snapshots for every NPC in the database: one scan per table instead of joins per NPC."""
+    def lookup(sql):
+        return dict(conn.execute(sql).fetchall())
+
+    items = {row[0]: {"key": row[1], "name": row[2], "nbt": row[3], "is_original": row[4]}
+             for row in conn.execute(
+                 "SELECT i.id, i.`key`, i.name, i.nbt, i.is_original FROM items i WHERE i.id IN ("
+                 "SELECT view_item_id FROM trades UNION SELECT item_id FROM trade_costs "
+                 "UNION SELECT item_id FROM rewards)")}
+    return assemble(
+        conn.execute("SELECT id, name, level, biome_id, profession_id, npc_type_id FROM npcs ORDER BY id").fetchall(),
+        conn.execute("SELECT id, npc_id, content, slot, view_item_id FROM trades").fetchall(),
+        conn.execute("SELECT id, trade_id, item_id, quantity, price FROM trade_costs").fetchall(),
+        conn.execute("SELECT id, trade_id, item_id, quantity, price FROM rewards").fetchall(),
+        items,
+        lookup("SELECT id, `key` FROM biomes"),
+        lookup("SELECT id, `key` FROM professions"),
+        lookup("SELECT id, name FROM npc_types"),
+    )
+
+
+def snapshot_rows(snapshots, now=None):
+    """([npc_snapshots rows], [trade_snapshots rows]) ready for INSERT."""
+    if now is None:
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    npc_rows, trade_rows = [], []
+    for snap in snapshots:
+        payload = json.dumps(snap, ensure_ascii=False, separators=(',', ':'))
+        digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+        npc_rows.append((snap["id"], snap["name"], snap["npc_type"], len(snap["trades"]), payload, digest, now))
+        for trade in snap["trades"]:
+            trade_rows.append((trade["id"], snap["id"], snap["npc_type"],
+                               json.dumps(trade, ensure_ascii=False, separators=(',', ':'))))
+    return npc_rows, trade_rows
+
+
+_NPC_COLUMNS = ("npc_id", "name", "npc_type", "trade_count", "payload", "digest", "built_at")
+_TRADE_COLUMNS = ("trade_id", "npc_id", "npc_type", "payload")
+
+
+def schema_statements():
+    return [stmt.strip() + ";" for stmt in SNAPSHOT_SCHEMA.split(";") if stmt.strip()]
+
+
+def snapshot_statements(snapshots, dialect="mysql", batch_rows=200):
+    """DML that replaces both snapshot tables (no BEGIN/COMMIT, see sqlexport.render_sql)."""
+    npc_rows, trade_rows = snapshot_rows(snapshots)
+    statements = [f"DELETE FROM {TRADE_SNAPSHOT_TABLE};", f"DELETE FROM {NPC_SNAPSHOT_TABLE};"]
+    for table, columns, rows in ((NPC_SNAPSHOT_TABLE, _NPC_COLUMNS, npc_rows),
+                                 (TRADE_SNAPSHOT_TABLE, _TRADE_COLUMNS, trade_rows)):
+        for start in range(0, len(rows), batch_rows):
+            values = ",\n".join("(" + ", ".join(sql_literal(v, dialect) for v in row) + ")"
+                                for row in rows[start:start + batch_rows])
+            statements.append(f"INSERT INTO {table} ({', '.join(columns)}) VALUES\n{values};")
+    return statements
+
+
+def load_snapshots(conn, snapshots):
+    """Replace both snapshot tables in one transaction (SQLite connection, autocommit mode)."""
+    npc_rows, trade_rows = snapshot_rows(snapshots)
+    conn.executescript(SNAPSHOT_SCHEMA)
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f"DELETE FROM {TRADE_SNAPSHOT_TABLE}")
+        conn.execute(f"DELETE FROM {NPC_SNAPSHOT_TABLE}")
+        conn.executemany(f"INSERT INTO {NPC_SNAPSHOT_TABLE} ({', '.join(_NPC_COLUMNS)}) "
+                         f"VALUES ({', '.join('?' for _ in _NPC_COLUMNS)})", npc_rows)
+        conn.executemany(f"INSERT INTO {TRADE_SNAPSHOT_TABLE} ({', '.join(_TRADE_COLUMNS)}) "
+                         f"VALUES ({', '.join('?' for _ in _TRADE_COLUMNS)})", trade_rows)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return len(npc_rows), len(trade_rows)
+
+
+def fetch_npc(conn, npc_id):
+    """The snapshot path of opening an NPC: one primary-key lookup."""
+    row = conn.execute(f"SELECT payload FROM {NPC_SNAPSHOT_TABLE} WHERE npc_id = ?", (npc_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def fetch_trade(conn, trade_id):
+    """The snapshot path of executeTrade: (npc_type, trade dict) or None."""
+    row = conn.execute(f"SELECT npc_type, payload FROM {TRADE_SNAPSHOT_TABLE} WHERE trade_id = ?",
+                       (trade_id,)).fetchone()
+    return (row[0], json.loads(row[1])) if row else None
+
+
+def main(argv=None):
+    from kenkoku.sqlexport import connect_sqlite
+
+    parser = argparse.ArgumentParser(description="Rebuild the denormalized NPC snapshot tables")
+    parser.add_argument('--sqlite', required=True, help="SQLite stand-in with the npc tables")
+    parser.add_argument('--show', type=int, metavar='NPC_ID', help="print one NPC snapshot afterwards")
+    args = parser.parse_args(argv)
+
+    conn = connect_sqlite(args.sqlite)
+    npcs, trades = load_snapshots(conn, snapshots_from_db(conn))
+    print(f"Loaded {npcs} NPC snapshots and {trades} trade snapshots into {args.sqlite}")
+    if args.show is not None:
+        print(json.dumps(fetch_npc(conn, args.show), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
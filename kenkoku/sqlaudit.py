@@ -0,0 +1,535 @@
+# -*- coding: utf-8 -*-
+"""
+SQL hot-path auditor for the Skript scripts
+Every query the server sends comes from an `execute "..." in {kenkoku_db}`
+line in plugins/Skript/scripts. This tool extracts them all (script, line,
+enclosing event / command / function, whether it sits inside a loop), turns
+the %...% interpolations into ? parameters the way skript-db binds them, and
+runs EXPLAIN QUERY PLAN for each one against the SQLite stand-in
+(kenkoku/sqlexport.py STANDIN_SCHEMA, same tables and foreign-key indexes).
+
+Reported:
+  - full scans, with the index that turns them into a search; each
+    suggestion is created on the stand-in and kept only if the plan changes
+  - ORDER BY RAND(), unbounded GROUP_CONCAT, parameters inside quotes
+    (sent as the literal '?'), queries run once per loop iteration (N+1),
+    directly or through a function called in a loop
+  - queries per firing of each event / command / timer (functions are
+    followed through their call sites; every branch is counted), ranked by
+    an estimated firing rate
+
+Rates are rough per-player-hour guesses (EVENT_RATES); timers fire
+server-wide. Override them with --rate "PATTERN=PER_HOUR".
+
+    python -m kenkoku.sqlaudit
+    python -m kenkoku.sqlaudit --players 40 --rate "inventory click=1200" --json audit.json
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+
+from kenkoku.sqlexport import create_standin
+
+# (pattern in the trigger line, firings per online player per hour); first match wins
+EVENT_RATES = (
+    ("inventory click", 600),
+    ("rightclick on villager", 30),
+    ("rightclick with", 30),
+    ("rightclick", 900),
+    ("right click", 900),
+    ("player inventory slot change", 600),
+    ("tool change", 600),
+    ("pickup", 300),
+    ("damage", 300),
+    ("block drop", 200),
+    ("place", 200),
+    ("player drop", 30),
+    ("drop", 30),
+    ("swap hand", 20),
+    ("inventory open", 30),
+    ("inventory close", 30),
+    ("consume", 10),
+    ("dispense", 5),
+    ("tab complete", 5),
+    ("first join", 0.05),
+    ("join", 1),
+    ("quit", 1),
+    ("respawn", 1),
+    ("command", 0.5),
+    ("unload", 0),
+    ("load", 0),
+)
+DEFAULT_PLAYERS = 20
+DEFAULT_LOOP_SIZE = 10
+
+_EXECUTE = re.compile(r'^\s*execute\s+(?:unsafe\s+)?"((?:[^"]|"")*)"\s+in\s+\{(\w+)\}')
+_FUNCTION = re.compile(r'^function\s+(\w+)\s*\(')
+_CALL = re.compile(r'\b([A-Za-z_]\w*)\s*\(')
+_LOOP = re.compile(r'^(?:loop|while)\b.*:$')
+_EVERY = re.compile(r'^every\s+(\d+(?:\.\d+)?)\s+(tick|second|minute|hour)s?\b')
+_UNIT_SECONDS = {"tick": 0.05, "second": 1, "minute": 60, "hour": 3600}
+
+
+class Block:
+    """A top-level Skript block: event, command, timer or function."""
+
+    def __init__(self, script, line, header):
+        self.script = script
+        self.line = line
+        self.header = header
+        match = _FUNCTION.match(header)
+        self.function = match.group(1) if match else None
+        if self.function:
+            self.kind = "function"
+        elif header.startswith("command "):
+            self.kind = "command"
+        elif header.startswith("every "):
+            self.kind = "timer"
+        elif header.startswith("on "):
+            self.kind = "event"
+        else:
+            self.kind = "other"
+        self.statements = []
+        self.calls = []        # (function name, line, in_loop)
+        self.reached = {}      # roots only: Statement -> (fixed, per_iteration) per firing
+
+    @property
+    def where(self):
+        return f"{self.script}:{self.line}"
+
+
+class Statement:
+    def __init__(self, block, line, raw, in_loop):
+        self.block = block
+        self.line = line
+        self.raw = raw
+        self.in_loop = in_loop
+        self.sql, self.params, self.quoted = normalize(raw)
+        self.plan = []
+        self.findings = []
+        self.triggers = {}     # root Block -> (fixed, per_iteration) executions per firing
+        self.per_hour = 0.0
+
+    @property
+    def where(self):
+        return f"{self.block.script}:{self.line}"
+
+
+class Finding:
+    def __init__(self, kind, statement, detail, advice=None):
+        self.kind = kind
+        self.statement = statement
+        self.detail = detail
+        self.advice = advice
+
+    def to_dict(self):
+        return {"kind": self.kind, "where": self.statement.where, "detail": self.detail, "advice": self.advice}
+
+
+# ------------------------------------------------------------
+# Extraction
+# ------------------------------------------------------------
+
+def normalize(raw, placeholder="?"):
+    """
+    (sql, [parameter expressions], [indexes of parameters inside quotes]) for
+    the text of a Skript string: "" unescaped, each %expr% replaced by
+    placeholder. Expressions may nest %...% inside {...} (e.g.
+    {_list::%player%}). A parameter inside quotes stays a literal '?', as the
+    JDBC driver sends it.
+    """
+    text = raw.replace('""', '"')
+    out, params, quoted = [], [], []
+    in_quote = False
+    i = 0
+    while i < len(text):
+        c = text[i]
+        if c == "%":
+            depth, j = 0, i + 1
+            while j < len(text) and (text[j] != "%" or depth):
+                depth += (text[j] == "{") - (text[j] == "}")
+                j += 1
+            if in_quote:
+                quoted.append(len(params))
+            params.append(text[i + 1:j])
+            out.append("?" if in_quote else placeholder)
+            i = j + 1
+            continue
+        if c == "'":
+            in_quote = not in_quote
+        out.append(c)
+        i += 1
+    return "".join(out), params, quoted
+
+
+def _strip_comment(line):
+    stripped = line.strip()
+    return "" if stripped.startswith("#") else stripped
+
+
+def parse_script(path):
+    """[Block] of one .sk file, with their execute statements, loops and call sites."""
+    script = os.path.basename(path)
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        lines = f.read().splitlines()
+    blocks, block, loops = [], None, []
+    for number, line in enumerate(lines, 1):
+        text = _strip_comment(line)
+        if not text:
+            continue
+        indent = len(line.expandtabs(4)) - len(line.expandtabs(4).lstrip())
+        if indent == 0:
+            block = Block(script, number, text.rstrip(":").strip()) if text.endswith(":") else None
+            if block is not None:
+                blocks.append(block)
+            loops = []
+            continue
+        if block is None:
+            continue
+        while loops and loops[-1] >= indent:
+            loops.pop()
+        match = _EXECUTE.match(line)
+        if match:
+            block.statements.append(Statement(block, number, match.group(1), bool(loops)))
+        else:
+            for name in _CALL.findall(text):
+                block.calls.append((name, number, bool(loops)))
+        if _LOOP.match(text):
+            loops.append(indent)
+    return blocks
+
+
+def parse_scripts(directory):
+    """Blocks of every enabled .sk file (.bak / .disabled copies are not loaded by Skript)."""
+    blocks = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".sk"):
+            blocks.extend(parse_script(os.path.join(directory, name)))
+    return blocks
+
+
+# ------------------------------------------------------------
+# Call graph and rates
+# ------------------------------------------------------------
+
+def attribute(blocks):
+    """Fill Statement.triggers: executions per firing of each root block, through function calls."""
+    functions = {block.function: block for block in blocks if block.function}
+
+    def reach(block, stack):
+        """{Statement: [fixed, per_iteration]} for one firing of block."""
+        counts = {}
+        for stmt in block.statements:
+            counts.setdefault(stmt, [0, 0])[1 if stmt.in_loop else 0] += 1
+        for name, _, in_loop in block.calls:
+            callee = functions.get(name)
+            if callee is None or callee in stack:
+                continue
+            for stmt, (fixed, per_iteration) in reach(callee, stack | {callee}).items():
+                entry = counts.setdefault(stmt, [0, 0])
+                if in_loop:
+                    entry[1] += fixed + per_iteration
+                else:
+                    entry[0] += fixed
+                    entry[1] += per_iteration
+        return counts
+
+    roots = [block for block in blocks if block.kind in ("event", "command", "timer")]
+    for root in roots:
+        for stmt, (fixed, per_iteration) in reach(root, {root}).items():
+            stmt.triggers[root] = root.reached[stmt] = (fixed, per_iteration)
+    return roots
+
+
+def event_rate(block, rates, players):
+    """Estimated firings per hour."""
+    if block.kind == "timer":
+        match = _EVERY.match(block.header)
+        if match:
+            return 3600 / (float(match.group(1)) * _UNIT_SECONDS[match.group(2)])
+    header = block.header.lower()
+    for pattern, per_player in rates:
+        if pattern in header:
+            return per_player * players
+    return 0.0
+
+
+# ------------------------------------------------------------
+# EXPLAIN against the stand-in
+# ------------------------------------------------------------
+
+_MYSQL_TO_SQLITE = (
+    (re.compile(r'\bNOW\(\)', re.I), 'CURRENT_TIMESTAMP'),
+    (re.compile(r'\bRAND\(\)', re.I), 'RANDOM()'),
+    (re.compile(r"\bGROUP_CONCAT\((.+?)\s+SEPARATOR\s+('(?:[^']|'')*')\)", re.I), r'GROUP_CONCAT(\1, \2)'),
+    (re.compile(r'\s+ON\s+DUPLICATE\s+KEY\s+UPDATE\b.*$', re.I | re.S), ''),
+)
+_TABLE_REF = re.compile(
+    r'\b(?:FROM|JOIN|UPDATE|INTO)\s+`?(\w+)`?'
+    r'(?:\s+(?:AS\s+)?(?!(?:ON|WHERE|LEFT|RIGHT|INNER|JOIN|SET|LIMIT|ORDER|GROUP|VALUES|SELECT)\b)(\w+))?', re.I)
+_EQUALITY = re.compile(r'(?:`?(\w+)`?\.)?`?(\w+)`?\s*=\s*(?:\?|`?\w+`?\.`?\w+`?)')
+_SCAN = re.compile(r'^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?')
+
+
+def to_sqlite(sql):
+    for pattern, replacement in _MYSQL_TO_SQLITE:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def explain(conn, sql, n_params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, (None,) * n_params)]
+
+
+def _aliases(sql):
+    """{alias or table name as EXPLAIN prints it: table}"""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[alias or table] = table
+        aliases.setdefault(table, table)
+    return aliases
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info(`{table}`)")}
+
+
+def _candidates(conn, sql, alias, table):
+    """Columns of table compared with = to a parameter or a joined column (not to literals)."""
+    columns = _columns(conn, table)
+    found = []
+    for qualifier, column in _EQUALITY.findall(sql):
+        if (qualifier in (alias, table) or (not qualifier and column in columns)) \
+                and column in columns and column != "id" and column not in found:
+            found.append(column)
+    return found
+
+
+def _index_sql(table, column):
+    quoted = f"`{column}`" if column == "key" else column
+    return f"CREATE INDEX {table}_{column} ON {table} ({quoted});"
+
+
+def check_statement(conn, stmt):
+    """Run EXPLAIN for one statement and fill stmt.plan / stmt.findings."""
+    if re.match(r'\s*SET\s', stmt.sql, re.I):
+        stmt.findings.append(Finding("session", stmt, "connection setting sent as a query on every run"))
+        return
+    sql = to_sqlite(stmt.sql)
+    n_params = len(stmt.params) - len(stmt.quoted)
+    try:
+        stmt.plan = explain(conn, sql, n_params)
+    except sqlite3.Error as e:
+        stmt.findings.append(Finding("unexplained", stmt, f"stand-in could not plan it: {e}"))
+        return
+
+    aliases = _aliases(sql)
+    for detail in stmt.plan:
+        match = _SCAN.match(detail)
+        if not match or match.group(1) == "CONSTANT":
+            continue
+        alias = match.group(1)
+        table = aliases.get(alias, alias)
+        advice = None
+        for column in _candidates(conn, sql, alias, table):
+            index = f"sqlaudit_{table}_{column}"
+            conn.execute(f"CREATE INDEX {index} ON `{table}` (`{column}`)")
+            try:
+                improved = not any(_SCAN.match(d) and _SCAN.match(d).group(1) == alias
+                                   for d in explain(conn, sql, n_params))
+            finally:
+                conn.execute(f"DROP INDEX {index}")
+            if improved:
+                advice = _index_sql(table, column)
+                break
+        if advice:
+            stmt.findings.append(Finding("full scan", stmt, f"{detail} ({table})", advice))
+        elif not re.search(r'\b(?:WHERE|ON)\b', sql, re.I):
+            stmt.findings.append(Finding("whole table", stmt, f"{detail}: reads every row of {table}"))
+        else:
+            stmt.findings.append(Finding("full scan", stmt, f"{detail} ({table}), no parameter or join column to index"))
+
+    if re.search(r'ORDER\s+BY\s+RAND\(\)', stmt.sql, re.I):
+        stmt.findings.append(Finding(
+            "order by rand", stmt, "sorts every matching row to return one",
+            "pick a random OFFSET from COUNT(*) or a random id range instead"))
+    if re.search(r'\bGROUP_CONCAT\(', stmt.sql, re.I) and not re.search(r'\bWHERE\b|\bLIMIT\b', stmt.sql, re.I):
+        stmt.findings.append(Finding(
+            "unbounded aggregate", stmt, "GROUP_CONCAT over the whole table (truncated at group_concat_max_len)",
+            "select the rows and join them in the script"))
+    for index in stmt.quoted:
+        stmt.findings.append(Finding(
+            "quoted parameter", stmt, f"%{stmt.params[index]}% is inside quotes: bound as the literal '?'",
+            "remove the quotes around the expression"))
+
+
+def open_standin(path=None):
+    """
+    Connection for audit(): the stand-in at path (with its indexes), or a fresh
+    in-memory one. The statement cache is off because check_statement creates
+    and drops probe indexes, and a cached EXPLAIN prepared while a probe
+    existed would keep reporting its plan after the DROP.
+    """
+    conn = sqlite3.connect(path or ":memory:", isolation_level=None, cached_statements=0)
+    if path:
+        conn.execute("PRAGMA foreign_keys = ON")
+    else:
+        create_standin(conn)
+    return conn
+
+
+def audit(blocks, conn, rates=EVENT_RATES, players=DEFAULT_PLAYERS, loop_size=DEFAULT_LOOP_SIZE):
+    """Audit every statement; returns (statements, roots) with per-hour estimates filled in (conn: open_standin())."""
+    roots = attribute(blocks)
+    statements = [stmt for block in blocks for stmt in block.statements]
+    for stmt in statements:
+        check_statement(conn, stmt)
+        per_iteration_roots = [root for root, (_, per_iteration) in stmt.triggers.items() if per_iteration]
+        if per_iteration_roots:
+            stmt.findings.append(Finding(
+                "per iteration", stmt,
+                "runs once per loop iteration (N+1) from " + ", ".join(r.header for r in per_iteration_roots),
+                "batch it into one query outside the loop"))
+        stmt.per_hour = sum(event_rate(root, rates, players) * (fixed + per_iteration * loop_size)
+                            for root, (fixed, per_iteration) in stmt.triggers.items())
+    return statements, roots
+
+
+# ------------------------------------------------------------
+# Report
+# ------------------------------------------------------------
+
+def _short(sql, width=90):
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= width else sql[:width - 3] + "..."
+
+
+def root_summary(roots, rates, players, loop_size):
+    """[(root, rate/h, fixed queries, per-iteration queries, queries/h)] for roots that query."""
+    rows = []
+    for root in roots:
+        fixed = sum(f for f, _ in root.reached.values())
+        per_iteration = sum(p for _, p in root.reached.values())
+        if fixed or per_iteration:
+            rate = event_rate(root, rates, players)
+            rows.append((root, rate, fixed, per_iteration, rate * (fixed + per_iteration * loop_size)))
+    rows.sort(key=lambda r: (-r[4], -r[1], r[0].where))
+    return rows
+
+
+def suggested_indexes(statements):
+    """{CREATE INDEX sql: [statements it fixes]}, most executed first."""
+    advice = {}
+    for stmt in statements:
+        for finding in stmt.findings:
+            if finding.kind == "full scan" and finding.advice:
+                advice.setdefault(finding.advice, []).append(stmt)
+    return dict(sorted(advice.items(), key=lambda kv: -sum(s.per_hour for s in kv[1])))
+
+
+def report(statements, roots, rates, players, loop_size, top=15):
+    lines = []
+    scripts = {stmt.block.script for stmt in statements}
+    lines.append(f"{len(statements)} statements in {len(scripts)} scripts; "
+                 f"estimates at {players} players, {loop_size} iterations per loop")
+
+    lines.append("")
+    lines.append("Hot statements (executions/hour):")
+    ranked = sorted(statements, key=lambda s: (-s.per_hour, s.where))
+    for stmt in ranked[:top]:
+        access = "; ".join(stmt.plan) if stmt.plan else "-"
+        lines.append(f"  {stmt.per_hour:10.0f}  {stmt.where:28s} {_short(stmt.sql)}")
+        lines.append(f"              plan: {_short(access, 100)}")
+
+    lines.append("")
+    lines.append("Queries per firing (fixed + per loop iteration):")
+    for root, rate, fixed, per_iteration, per_hour in root_summary(roots, rates, players, loop_size):
+        count = f"{fixed}" + (f" + {per_iteration}/iter" if per_iteration else "")
+        lines.append(f"  {per_hour:10.0f}/h  {rate:8.1f} fired/h  {count:>12s}  {root.header} ({root.where})")
+
+    findings = [f for stmt in ranked for f in stmt.findings]
+    lines.append("")
+    lines.append(f"Findings ({len(findings)}):")
+    for finding in findings:
+        lines.append(f"  {finding.kind:19s} {finding.statement.where:28s} {finding.detail}")
+        if finding.advice:
+            lines.append(f"  {'':19s} {'':28s} -> {finding.advice}")
+
+    indexes = suggested_indexes(statements)
+    lines.append("")
+    lines.append("Suggested indexes (checked on the stand-in):")
+    for sql, fixed in indexes.items():
+        lines.append(f"  {sql:50s} {len(fixed)} statements, {sum(s.per_hour for s in fixed):.0f}/h")
+    if not indexes:
+        lines.append("  none")
+    return "\n".join(lines)
+
+
+def to_json(statements, roots, rates, players, loop_size):
+    return {
+        "players": players,
+        "loop_size": loop_size,
+        "statements": [{
+            "where": stmt.where,
+            "block": stmt.block.header,
+            "in_loop": stmt.in_loop,
+            "sql": stmt.sql,
+            "params": stmt.params,
+            "plan": stmt.plan,
+            "per_hour": round(stmt.per_hour, 1),
+            "triggers": {root.where: list(counts) for root, counts in stmt.triggers.items()},
+            "findings": [f.to_dict() for f in stmt.findings],
+        } for stmt in statements],
+        "events": [{
+            "where": root.where, "header": root.header, "rate": round(rate, 2),
+            "queries": fixed, "per_iteration": per_iteration, "per_hour": round(per_hour, 1),
+        } for root, rate, fixed, per_iteration, per_hour in root_summary(roots, rates, players, loop_size)],
+        "indexes": {sql: [s.where for s in fixed] for sql, fixed in suggested_indexes(statements).items()},
+    }
+
+
+def parse_rates(specs):
+    rates = []
+    for spec in specs:
+        pattern, _, value = spec.rpartition('=')
+        rates.append((pattern.strip().lower(), float(value)))
+    return tuple(rates) + EVENT_RATES
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Audit the SQL in the Skript scripts against the SQLite stand-in")
+    parser.add_argument('--scripts', default=os.path.join(base_dir, 'minecraft_server', 'plugins', 'Skript', 'scripts'))
+    parser.add_argument('--sqlite', help="audit against this stand-in (with its indexes) instead of a fresh one")
+    parser.add_argument('--players', type=int, default=DEFAULT_PLAYERS, help="online players for the rates")
+    parser.add_argument('--loop-size', type=int, default=DEFAULT_LOOP_SIZE, help="assumed iterations per loop")
+    parser.add_argument('--rate', action='append', default=[], metavar='PATTERN=PER_HOUR',
+                        help="firings per player-hour for triggers containing PATTERN (repeatable)")
+    parser.add_argument('--top', type=int, default=15, help="hot statements to list")
+    parser.add_argument('--json', help="also write the full audit as JSON here")
+    args = parser.parse_args(argv)
+
+    try:
+        rates = parse_rates(args.rate)
+    except ValueError:
+        parser.error("--rate expects PATTERN=PER_HOUR")
+
+    conn = open_standin(args.sqlite)
+
+    blocks = parse_scripts(args.scripts)
+    statements, roots = audit(blocks, conn, rates, args.players, args.loop_size)
+    print(report(statements, roots, rates, args.players, args.loop_size, args.top))
+    if args.json:
+        from kenkoku.generator import atomic_write
+        data = to_json(statements, roots, rates, args.players, args.loop_size)
+        atomic_write(args.json, json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8'))
+        print(f"Wrote {args.json}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,481 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk SQL exporter for the npc / lottery tables
+Writes request payloads straight into the tables the Skript scripts read
+(npcs, trades, trade_costs, rewards, lotteries, rarities, lottery_items)
+instead of going through the HTTP API one insert at a time.
+
+Every primary key is assigned here, so foreign keys are plain literals and
+the whole load is one transaction of multi-row INSERTs:
+
+  replace  (full season reset) clears the seven tables and numbers rows
+           from 1; patches are attached to the exported NPC of the same name
+  append   numbers rows after the ids already in the database (read from an
+           SQLite stand-in or given with --start-id); patches keep their NPC
+           id, delete sections are applied first
+
+Output is a .sql script, LOAD DATA-ready .tsv files (+ load.sql), or a direct
+load into SQLite. STANDIN_SCHEMA is an SQLite copy of the columns the scripts
+use, for testing a load without MySQL:
+
+    python generate_json.py --sql reload.sql
+    python -m kenkoku.sqlexport --sqlite /tmp/kenkoku.db --create --check
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+# Insert order (parents first); deletes run in reverse
+TABLES = {
+    "npcs": ("id", "name", "level", "biome_id", "profession_id", "npc_type_id", "created_at", "updated_at"),
+    "trades": ("id", "npc_id", "content", "slot", "view_item_id", "created_at", "updated_at"),
+    "trade_costs": ("id", "trade_id", "item_id", "quantity", "price", "created_at", "updated_at"),
+    "rewards": ("id", "trade_id", "item_id", "quantity", "price", "created_at", "updated_at"),
+    "lotteries": ("id", "name", "created_at", "updated_at"),
+    "rarities": ("id", "lottery_id", "name", "probability", "created_at", "updated_at"),
+    "lottery_items": ("id", "lottery_id", "rarity_id", "item_id", "quantity", "created_at", "updated_at"),
+}
+DEFAULT_LEVEL = 1
+DIALECTS = ("mysql", "sqlite")
+
+STANDIN_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY, name TEXT, `key` TEXT NOT NULL, is_original INTEGER NOT NULL DEFAULT 0,
+    nbt TEXT, created_at TEXT, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS biomes (id INTEGER PRIMARY KEY, `key` TEXT NOT NULL, created_at TEXT, updated_at TEXT);
+CREATE TABLE IF NOT EXISTS professions (id INTEGER PRIMARY KEY, `key` TEXT NOT NULL, created_at TEXT, updated_at TEXT);
+CREATE TABLE IF NOT EXISTS npc_types (id INTEGER PRIMARY KEY, name TEXT NOT NULL, created_at TEXT, updated_at TEXT);
+CREATE TABLE IF NOT EXISTS npcs (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL, level INTEGER NOT NULL DEFAULT 1,
+    biome_id INTEGER REFERENCES biomes(id), profession_id INTEGER REFERENCES professions(id),
+    npc_type_id INTEGER REFERENCES npc_types(id), created_at TEXT, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY, npc_id INTEGER NOT NULL REFERENCES npcs(id), content TEXT,
+    slot INTEGER NOT NULL DEFAULT 0, view_item_id INTEGER REFERENCES items(id), created_at TEXT, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS trade_costs (
+    id INTEGER PRIMARY KEY, trade_id INTEGER NOT NULL REFERENCES trades(id), item_id INTEGER REFERENCES items(id),
+    quantity INTEGER, price INTEGER, created_at TEXT, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS rewards (
+    id INTEGER PRIMARY KEY, trade_id INTEGER NOT NULL REFERENCES trades(id), item_id INTEGER REFERENCES items(id),
+    quantity INTEGER, price INTEGER, created_at TEXT, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS lotteries (id INTEGER PRIMARY KEY, name TEXT NOT NULL, created_at TEXT, updated_at TEXT);
+CREATE TABLE IF NOT EXISTS rarities (
+    id INTEGER PRIMARY KEY, lottery_id INTEGER NOT NULL REFERENCES lotteries(id), name TEXT NOT NULL,
+    probability INTEGER NOT NULL, created_at TEXT, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS lottery_items (
+    id INTEGER PRIMARY KEY, lottery_id INTEGER NOT NULL REFERENCES lotteries(id),
+    rarity_id INTEGER NOT NULL REFERENCES rarities(id), item_id INTEGER NOT NULL REFERENCES items(id),
+    quantity INTEGER NOT NULL DEFAULT 1, created_at TEXT, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS player_information (
+    id INTEGER PRIMARY KEY, player_uuid TEXT NOT NULL UNIQUE, player_name TEXT, money INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT, updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS server_infos (
+    id INTEGER PRIMARY KEY, name TEXT, version TEXT, max_players INTEGER, created_at TEXT, updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS trades_npc_id ON trades (npc_id);
+CREATE INDEX IF NOT EXISTS trade_costs_trade_id ON trade_costs (trade_id);
+CREATE INDEX IF NOT EXISTS rewards_trade_id ON rewards (trade_id);
+CREATE INDEX IF NOT EXISTS rarities_lottery_id ON rarities (lottery_id);
+CREATE INDEX IF NOT EXISTS lottery_items_rarity ON lottery_items (lottery_id, rarity_id);
+"""
+
+# Seeded by /insert-villager-settings (database-operation.sk) and the service
+PROFESSIONS = ("armorer", "butcher", "cartographer", "cleric", "farmer", "fisherman", "fletcher",
+               "leatherworker", "librarian", "mason", "nitwit", "none", "shepherd", "toolsmith", "weaponsmith")
+BIOMES = ("desert", "jungle", "plains", "savanna", "snow", "swamp", "taiga")
+NPC_TYPES = ((1, "pawnshop"), (2, "shop"), (3, "quest"))
+
+
+class IdState:
+    """Next primary key per table, next trade slot per NPC and the NPC ids that exist."""
+
+    def __init__(self, next_ids=None, next_slots=None, npc_ids=None):
+        self.next_ids = {table: 1 for table in TABLES}
+        self.next_ids.update(next_ids or {})
+        self.next_slots = dict(next_slots or {})
+        self.npc_ids = set(npc_ids or ())
+
+    @classmethod
+    def from_sqlite(cls, conn):
+        next_ids = {table: conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+                    for table in TABLES}
+        next_slots = dict(conn.execute("SELECT npc_id, MAX(slot) + 1 FROM trades GROUP BY npc_id"))
+        npc_ids = [row[0] for row in conn.execute("SELECT id FROM npcs")]
+        return cls(next_ids, next_slots, npc_ids)
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        """From an npcs.json snapshot (covers every table except the lottery ones)."""
+        top = {table: 0 for table in ("npcs", "trades", "trade_costs", "rewards")}
+        next_slots = {}
+        for npc in snapshot:
+            top["npcs"] = max(top["npcs"], npc["id"])
+            for trade in npc.get("trades", ()):
+                top["trades"] = max(top["trades"], trade["id"])
+                next_slots[npc["id"]] = max(next_slots.get(npc["id"], 0), (trade.get("slot") or 0) + 1)
+                for table, key in (("trade_costs", "costs"), ("rewards", "rewards")):
+                    for row in trade.get(key, ()):
+                        top[table] = max(top[table], row["id"])
+        return cls({table: value + 1 for table, value in top.items()}, next_slots,
+                   [npc["id"] for npc in snapshot])
+
+
+class Export:
+    """Rows per table with every id assigned, plus the deletes to run first."""
+
+    def __init__(self, replace):
+        self.replace = replace
+        self.rows = {table: [] for table in TABLES}
+        self.deletes = []   # (table, column, [ids])
+        self.notes = []     # patches / deletes that could not be placed
+
+    def counts(self):
+        return {table: len(rows) for table, rows in self.rows.items()}
+
+
+def export_from_snapshot(snapshot):
+    """An Export of the npc tables in an npcs.json snapshot, keeping its ids and timestamps."""
+    export = Export(replace=True)
+    rows = export.rows
+    for npc in snapshot:
+        rows["npcs"].append((npc["id"], npc["name"], npc.get("level", DEFAULT_LEVEL), npc.get("biome_id"),
+                             npc.get("profession_id"), npc.get("npc_type_id"),
+                             npc.get("created_at"), npc.get("updated_at")))
+        for trade in npc.get("trades", ()):
+            rows["trades"].append((trade["id"], npc["id"], trade.get("content"), trade.get("slot") or 0,
+                                   trade.get("view_item_id"), trade.get("created_at"), trade.get("updated_at")))
+            for table, key in (("trade_costs", "costs"), ("rewards", "rewards")):
+                for row in trade.get(key, ()):
+                    rows[table].append((row["id"], trade["id"], row.get("item_id"), row.get("quantity"),
+                                        row.get("price"), row.get("created_at"), row.get("updated_at")))
+    return export
+
+
+def apply_export(base, export):
+    """
+    A replace Export of base's rows with export applied (its deletes, then its
+    rows), i.e. what the tables hold after loading export on top of base.
+    """
+    if export.replace:
+        return export
+    gone_npcs = {i for table, _, ids in export.deletes if table == "npcs" for i in ids}
+    gone_trades = {i for table, _, ids in export.deletes if table == "trades" for i in ids}
+    gone_trades.update(row[0] for row in base.rows["trades"] if row[1] in gone_npcs)
+    result = Export(replace=True)
+    for table, rows in base.rows.items():
+        if table == "npcs":
+            rows = [row for row in rows if row[0] not in gone_npcs]
+        elif table == "trades":
+            rows = [row for row in rows if row[0] not in gone_trades]
+        elif table in ("trade_costs", "rewards"):
+            rows = [row for row in rows if row[1] not in gone_trades]
+        result.rows[table] = rows + export.rows[table]
+    return result
+
+
+def build_export(requests, state=None, replace=False, now=None):
+    """
+    Flatten {file name: payload} into table rows.
+
+    state:   IdState of the target database (ignored with replace=True)
+    now:     created_at / updated_at value (default: current local time)
+    """
+    if replace or state is None:
+        state = IdState()
+    if now is None:
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    export = Export(replace)
+    next_ids = dict(state.next_ids)
+    next_slots = dict(state.next_slots)
+
+    def take(table):
+        value = next_ids[table]
+        next_ids[table] = value + 1
+        return value
+
+    def add_trades(npc_id, trades):
+        for trade in trades:
+            trade_id = take("trades")
+            slot = next_slots.get(npc_id, 0)
+            next_slots[npc_id] = slot + 1
+            export.rows["trades"].append((trade_id, npc_id, trade.get("content"), slot,
+                                          trade.get("view_item_id"), now, now))
+            for table, key in (("trade_costs", "costs"), ("rewards", "rewards")):
+                for row in trade.get(key, ()):
+                    export.rows[table].append((take(table), trade_id, row.get("item_id"),
+                                               row.get("quantity"), row.get("price"), now, now))
+
+    def add_lottery(lottery):
+        lottery_id = take("lotteries")
+        export.rows["lotteries"].append((lottery_id, lottery["name"], now, now))
+        for rarity in lottery["rarities"]:
+            rarity_id = take("rarities")
+            export.rows["rarities"].append((rarity_id, lottery_id, rarity["name"], rarity["probability"], now, now))
+            for item in rarity["items"]:
+                if isinstance(item, dict):
+                    item_id, quantity = item["item_id"], item.get("quantity", 1)
+                else:
+                    item_id, quantity = item, 1
+                export.rows["lottery_items"].append((take("lottery_items"), lottery_id, rarity_id,
+                                                     item_id, quantity, now, now))
+
+    # Deletes only make sense against existing rows
+    if not replace:
+        for filename, request in requests.items():
+            for row in request.get("delete", ()):
+                if row.get("trade_ids"):
+                    export.deletes.append(("trades", "id", list(row["trade_ids"])))
+                else:
+                    export.deletes.append(("npcs", "id", [row["id"]]))
+    elif any(request.get("delete") for request in requests.values()):
+        export.notes.append("delete sections ignored: replace clears every table")
+
+    npc_by_name = {}
+    for filename, request in requests.items():
+        for row in request.get("store", ()):
+            if "rarities" in row:
+                add_lottery(row)
+                continue
+            npc_id = take("npcs")
+            npc_by_name.setdefault(row["name"], npc_id)
+            export.rows["npcs"].append((npc_id, row["name"], row.get("level", DEFAULT_LEVEL), row.get("biome_id"),
+                                        row.get("profession_id"), row.get("npc_type_id"), now, now))
+            add_trades(npc_id, row.get("trades", ()))
+
+    for filename, request in requests.items():
+        for row in request.get("patch", ()):
+            if replace:
+                npc_id = npc_by_name.get(row.get("name"))
+            else:
+                npc_id = row["id"] if row["id"] in state.npc_ids else None
+            if npc_id is None:
+                export.notes.append(f"{filename}: patch for NPC {row.get('id')} ({row.get('name')}) "
+                                    f"has no target, skipped")
+                continue
+            add_trades(npc_id, row.get("add_trades", ()))
+    return export
+
+
+# ------------------------------------------------------------
+# Rendering
+# ------------------------------------------------------------
+
+def sql_literal(value, dialect="mysql"):
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    text = str(value).replace("'", "''")
+    if dialect == "mysql":
+        text = text.replace("\\", "\\\\")
+    return f"'{text}'"
+
+
+def _delete_statements(export):
+    """(sql, params-free) DELETE statements, children before parents."""
+    statements = []
+    if export.replace:
+        for table in reversed(TABLES):
+            statements.append(f"DELETE FROM {table};")
+        return statements
+    for table, _, ids in export.deletes:
+        id_list = ", ".join(str(int(i)) for i in ids)
+        if table == "npcs":
+            trade_ids = f"SELECT id FROM trades WHERE npc_id IN ({id_list})"
+            statements.append(f"DELETE FROM trade_costs WHERE trade_id IN ({trade_ids});")
+            statements.append(f"DELETE FROM rewards WHERE trade_id IN ({trade_ids});")
+            statements.append(f"DELETE FROM trades WHERE npc_id IN ({id_list});")
+            statements.append(f"DELETE FROM npcs WHERE id IN ({id_list});")
+        else:
+            statements.append(f"DELETE FROM trade_costs WHERE trade_id IN ({id_list});")
+            statements.append(f"DELETE FROM rewards WHERE trade_id IN ({id_list});")
+            statements.append(f"DELETE FROM trades WHERE id IN ({id_list});")
+    return statements
+
+
+def render_sql(export, dialect="mysql", batch_rows=500, schema_statements=(), extra_statements=()):
+    """
+    The whole load as one transaction of multi-row INSERT statements.
+    schema_statements (DDL) run before the transaction, since MySQL commits
+    implicitly on DDL; extra_statements run inside it, after the inserts.
+    """
+    lines = ["-- generated by kenkoku.sqlexport"]
+    lines.extend(schema_statements)
+    lines.append("BEGIN;")
+    lines.extend(_delete_statements(export))
+    for table, columns in TABLES.items():
+        rows = export.rows[table]
+        column_list = ", ".join(columns)
+        for start in range(0, len(rows), batch_rows):
+            values = ",\n".join("(" + ", ".join(sql_literal(v, dialect) for v in row) + ")"
+                                for row in rows[start:start + batch_rows])
+            lines.append(f"INSERT INTO {table} ({column_list}) VALUES\n{values};")
+    lines.extend(extra_statements)
+    lines.append("COMMIT;")
+    return "\n".join(lines) + "\n"
+
+
+def _tsv_field(value):
+    if value is None:
+        return "\\N"
+    text = str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def write_tsv(export, out_dir):
+    """One <table>.tsv per table plus load.sql (LOAD DATA LOCAL INFILE). Returns the paths."""
+    from kenkoku.generator import atomic_write
+
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    load = ["-- generated by kenkoku.sqlexport; run from this directory", "BEGIN;"]
+    load.extend(_delete_statements(export))
+    for table, columns in TABLES.items():
+        path = os.path.join(out_dir, f"{table}.tsv")
+        data = "".join("\t".join(_tsv_field(v) for v in row) + "\n" for row in export.rows[table])
+        atomic_write(path, data.encode('utf-8'))
+        paths.append(path)
+        load.append(f"LOAD DATA LOCAL INFILE '{table}.tsv' INTO TABLE {table} CHARACTER SET utf8mb4 "
+                    f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(columns)});")
+    load.append("COMMIT;")
+    load_path = os.path.join(out_dir, "load.sql")
+    atomic_write(load_path, ("\n".join(load) + "\n").encode('utf-8'))
+    paths.append(load_path)
+    return paths
+
+
+# ------------------------------------------------------------
+# SQLite stand-in
+# ------------------------------------------------------------
+
+def connect_sqlite(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+
+def create_standin(conn, catalog=None):
+    """Create STANDIN_SCHEMA and seed the lookup tables (+ items from a Catalog)."""
+    conn.executescript(STANDIN_SCHEMA)
+    conn.execute("BEGIN")
+    conn.executemany("INSERT OR IGNORE INTO professions (id, `key`) VALUES (?, ?)",
+                     enumerate(PROFESSIONS, 1))
+    conn.executemany("INSERT OR IGNORE INTO biomes (id, `key`) VALUES (?, ?)", enumerate(BIOMES, 1))
+    conn.executemany("INSERT OR IGNORE INTO npc_types (id, name) VALUES (?, ?)", NPC_TYPES)
+    if catalog is not None:
+        conn.executemany(
+            "INSERT OR REPLACE INTO items (id, name, `key`, is_original, nbt) VALUES (?, ?, ?, ?, ?)",
+            ((db_id, item.get('name'), item.get('key'), item.get('is_original') or 0, item.get('nbt'))
+             for db_id, item in catalog.all_items.items()))
+    conn.execute("COMMIT")
+
+
+def load_sqlite(conn, export):
+    """Apply an Export in one transaction with executemany (rolls back on any error)."""
+    conn.execute("BEGIN")
+    try:
+        for statement in _delete_statements(export):
+            conn.execute(statement)
+        for table, columns in TABLES.items():
+            placeholders = ", ".join("?" for _ in columns)
+            conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                             export.rows[table])
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def check_sqlite(conn):
+    """Foreign key violations as (table, rowid, parent) tuples; empty when consistent."""
+    return [tuple(row[:3]) for row in conn.execute("PRAGMA foreign_key_check")]
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Export request payloads as bulk SQL / TSV or load them into SQLite")
+    parser.add_argument('requests', nargs='*', help="request files or directories (default: generate)")
+    parser.add_argument('--items', default=os.path.join(base_dir, 'items.json'))
+    parser.add_argument('--replace', action='store_true', help="full reload: clear the tables first")
+    parser.add_argument('--npcs', help="npcs.json snapshot to number new rows after (append mode)")
+    parser.add_argument('--start-id', action='append', default=[], metavar='TABLE=N',
+                        help="first id for a table in append mode (repeatable)")
+    parser.add_argument('--dialect', choices=DIALECTS, default="mysql")
+    parser.add_argument('--batch-rows', type=int, default=500, help="rows per INSERT statement")
+    parser.add_argument('--sql', help="write the .sql script here")
+    parser.add_argument('--tsv', help="write <table>.tsv + load.sql into this directory")
+    parser.add_argument('--sqlite', help="load into this SQLite stand-in (ids continue after its rows)")
+    parser.add_argument('--create', action='store_true', help="with --sqlite, create the schema and seed items")
+    parser.add_argument('--check', action='store_true', help="with --sqlite, run a foreign key check afterwards")
+    args = parser.parse_args(argv)
+
+    from kenkoku.catalog import load_catalog
+    from kenkoku.definitions import DEFINITIONS
+    from kenkoku.diff import load_snapshot
+    from kenkoku.generator import build_requests
+    from kenkoku.upload import load_payloads
+
+    catalog = None
+    if args.requests:
+        requests = dict(load_payloads(args.requests))
+    else:
+        catalog = load_catalog(args.items)
+        requests = build_requests(DEFINITIONS, catalog)
+
+    conn = None
+    if args.sqlite:
+        conn = connect_sqlite(args.sqlite)
+        if args.create:
+            create_standin(conn, catalog or load_catalog(args.items))
+        state = IdState.from_sqlite(conn)
+    elif args.npcs:
+        state = IdState.from_snapshot(load_snapshot(args.npcs))
+    else:
+        state = IdState()
+    for spec in args.start_id:
+        table, _, value = spec.partition('=')
+        if table not in TABLES or not value.isdigit():
+            parser.error(f"--start-id expects TABLE=N with TABLE in {', '.join(TABLES)}")
+        state.next_ids[table] = int(value)
+
+    export = build_export(requests, state, replace=args.replace)
+    for note in export.notes:
+        print(f"  NOTE: {note}")
+    counts = export.counts()
+    print("Rows: " + ", ".join(f"{table}={count}" for table, count in counts.items()))
+
+    if args.sql:
+        from kenkoku.generator import atomic_write
+        atomic_write(args.sql, render_sql(export, args.dialect, args.batch_rows).encode('utf-8'))
+        print(f"Wrote {args.sql}")
+    if args.tsv:
+        write_tsv(export, args.tsv)
+        print(f"Wrote {len(TABLES)} TSV files and load.sql to {args.tsv}")
+    if conn is not None:
+        load_sqlite(conn, export)
+        print(f"Loaded into {args.sqlite}")
+        if args.check:
+            problems = check_sqlite(conn)
+            for table, rowid, parent in problems:
+                print(f"  FK violation: {table} row {rowid} -> {parent}")
+            if problems:
+                return 1
+            print("Foreign keys OK")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
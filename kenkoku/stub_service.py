@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for kenkoku-manage-service
+Accepts the same store / patch / delete payloads as the real service
+(POST / PATCH / DELETE with {"store"|"patch"|"delete": [...]}) and keeps
+everything it received in memory. Used to exercise kenkoku/upload.py without
+touching the real service:
+
+    python -m kenkoku.stub_service --port 8000 --fail-first 3
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METHOD_SECTIONS = {"POST": "store", "PATCH": "patch", "DELETE": "delete"}
+
+
+class StubState:
+    """Everything the stub received, shared between handler threads."""
+
+    def __init__(self, fail_first=0, delay=0.0):
+        self.lock = threading.Lock()
+        self.received = []          # (method, path, section, rows)
+        self.idempotency_keys = set()
+        self.requests = 0
+        self.duplicates = 0
+        self.fail_first = fail_first
+        self.delay = delay
+
+    def rows(self, section=None):
+        with self.lock:
+            return [row for _, _, s, rows in self.received if section in (None, s) for row in rows]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real service behind nginx
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self):
+        state = self.state
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if state.delay:
+            time.sleep(state.delay)
+
+        with state.lock:
+            state.requests += 1
+            if state.fail_first > 0:
+                state.fail_first -= 1
+                self._reply(503, {"message": "injected failure"})
+                return
+
+        section = METHOD_SECTIONS[self.command]
+        try:
+            rows = json.loads(body or b'{}').get(section)
+        except ValueError:
+            rows = None
+        if not isinstance(rows, list):
+            self._reply(422, {"message": f"'{section}' must be an array"})
+            return
+
+        key = self.headers.get('Idempotency-Key')
+        with state.lock:
+            if key and key in state.idempotency_keys:
+                state.duplicates += 1
+                self._reply(200, {"message": "duplicate ignored", section: len(rows)})
+                return
+            if key:
+                state.idempotency_keys.add(key)
+            state.received.append((self.command, self.path, section, rows))
+        self._reply(200, {"message": "ok", section: len(rows)})
+
+    do_POST = _handle
+    do_PATCH = _handle
+    do_DELETE = _handle
+
+
+def start_stub(host='127.0.0.1', port=0, fail_first=0, delay=0.0):
+    """Start the stub on a background thread. Returns (server, state, base_url)."""
+    state = StubState(fail_first=fail_first, delay=delay)
+    handler = type('StubHandler', (_Handler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, state, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local stand-in for kenkoku-manage-service")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--fail-first', type=int, default=0, help="answer the first N requests with 503")
+    parser.add_argument('--delay', type=float, default=0.0, help="seconds to sleep per request")
+    args = parser.parse_args(argv)
+
+    server, state, base_url = start_stub(args.host, args.port, args.fail_first, args.delay)
+    print(f"Stub manage service listening on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    print(f"Received {state.requests} requests, {len(state.rows())} rows, {state.duplicates} duplicates")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Offline item name sync from a Minecraft language file
+Replaces /item-update-all in item-translation.sk, which issues one UPDATE per
+vanilla key from inside the running server. Here the language file
+(ja_jp.json) is diffed against items.json / items.csv in memory and only the
+names that actually change are written:
+
+  - as one transactional, batched upsert (.sql, MySQL or SQLite dialect)
+  - directly into an SQLite stand-in (--sqlite)
+  - back into items.json / items.csv, refreshing the catalog index in .cache/
+
+Translation keys follow the game: item.minecraft.<id>, then
+block.minecraft.<id> for block items. Keys without an entry keep their name
+(the Skript fell back to the English name; that is left to the server).
+
+    python -m kenkoku.translation --lang ja_jp.json --sql item_names.sql --write
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from kenkoku.generator import atomic_write
+from kenkoku.sqlexport import DIALECTS, sql_literal
+
+
+class NameChange:
+    def __init__(self, item_id, key, old, new):
+        self.item_id = item_id
+        self.key = key
+        self.old = old
+        self.new = new
+
+
+def load_lang(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def translation_keys(mc_key):
+    """Language file keys for an item key, most specific first."""
+    namespace, _, path = mc_key.partition(':') if ':' in mc_key else ('minecraft', '', mc_key)
+    return (f"item.{namespace}.{path}", f"block.{namespace}.{path}")
+
+
+def translate(mc_key, lang):
+    for key in translation_keys(mc_key):
+        name = lang.get(key)
+        if name:
+            return name
+    return None
+
+
+# ------------------------------------------------------------
+# items.json / items.csv
+# ------------------------------------------------------------
+
+def load_items(path):
+    """Rows (dicts) from items.json or items.csv, by extension."""
+    if path.endswith('.csv'):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            row['id'] = int(row['id'])
+            row['is_original'] = int(row['is_original'] or 0)
+        return rows
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def plan_changes(rows, lang):
+    """([NameChange] for vanilla rows whose name differs, [keys without a translation])."""
+    changes, missing = [], []
+    for row in rows:
+        if row.get('is_original') or not row.get('key'):
+            continue
+        name = translate(row['key'], lang)
+        if name is None:
+            missing.append(row['key'])
+        elif name != (row.get('name') or None):
+            changes.append(NameChange(row['id'], row['key'], row.get('name') or None, name))
+    return changes, missing
+
+
+def _csv_field(value):
+    # Same quoting as the DB export: only fields with spaces / separators are quoted
+    if value is None:
+        return ''
+    text = str(value)
+    if any(c in text for c in ' ,"\n\r'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def apply_to_rows(rows, changes, updated_at):
+    by_id = {change.item_id: change for change in changes}
+    for row in rows:
+        change = by_id.get(row['id'])
+        if change is not None:
+            row['name'] = change.new
+            row['updated_at'] = updated_at
+
+
+def write_items_json(path, rows):
+    atomic_write(path, json.dumps(rows, ensure_ascii=False, indent=4).encode('utf-8'))
+
+
+def write_items_csv(path, rows):
+    columns = ("id", "name", "key", "is_original", "nbt", "created_at", "updated_at")
+    out = io.StringIO()
+    out.write(",".join(f'"{c}"' for c in columns) + "\n")
+    for row in rows:
+        out.write(",".join(_csv_field(row.get(c)) for c in columns) + "\n")
+    atomic_write(path, out.getvalue().encode('utf-8'))
+
+
+def refresh_files(paths, lang):
+    """
+    Rewrite name / updated_at of the rows that change in each of items.json /
+    items.csv (each file is diffed on its own; their ids need not agree).
+    Returns {path: rows changed}.
+    """
+    from kenkoku.catalog import load_catalog
+
+    now = datetime.now(timezone.utc)
+    counts = {}
+    for path in paths:
+        rows = load_items(path)
+        changes, _ = plan_changes(rows, lang)
+        counts[path] = len(changes)
+        if not changes:
+            continue
+        if path.endswith('.csv'):
+            apply_to_rows(rows, changes, now.strftime('%Y-%m-%d %H:%M:%S'))
+            write_items_csv(path, rows)
+        else:
+            apply_to_rows(rows, changes, now.strftime('%Y-%m-%dT%H:%M:%S.000000Z'))
+            write_items_json(path, rows)
+            load_catalog(path)  # rebuild the .cache/ index now rather than on the next run
+    return counts
+
+
+# ------------------------------------------------------------
+# SQL
+# ------------------------------------------------------------
+
+def upsert_sql(changes, dialect="mysql", batch_rows=500):
+    """One transaction of multi-row upserts keyed on items.id (vanilla rows only)."""
+    if dialect == "mysql":
+        conflict = "ON DUPLICATE KEY UPDATE name = VALUES(name), updated_at = VALUES(updated_at)"
+    else:
+        conflict = "ON CONFLICT(id) DO UPDATE SET name = excluded.name, updated_at = excluded.updated_at"
+    lines = ["-- generated by kenkoku.translation", "BEGIN;"]
+    for start in range(0, len(changes), batch_rows):
+        values = ",\n".join(
+            f"({int(c.item_id)}, {sql_literal(c.new, dialect)}, {sql_literal(c.key, dialect)}, 0, CURRENT_TIMESTAMP)"
+            for c in changes[start:start + batch_rows])
+        lines.append(f"INSERT INTO items (id, name, `key`, is_original, updated_at) VALUES\n{values}\n{conflict};")
+    lines.append("COMMIT;")
+    return "\n".join(lines) + "\n"
+
+
+def apply_sqlite(conn, changes):
+    """Upsert into an SQLite stand-in in one transaction (autocommit connection)."""
+    conn.execute("BEGIN")
+    try:
+        conn.executemany(
+            "INSERT INTO items (id, name, `key`, is_original, updated_at) VALUES (?, ?, ?, 0, CURRENT_TIMESTAMP) "
+            "ON CONFLICT(id) DO UPDATE SET name = excluded.name, updated_at = excluded.updated_at",
+            ((c.item_id, c.new, c.key) for c in changes))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Sync vanilla item names from a Minecraft language file")
+    parser.add_argument('--lang', required=True, help="ja_jp.json from the client / server jar")
+    parser.add_argument('--items', default=os.path.join(base_dir, 'items.json'),
+                        help="items.json or items.csv to diff against")
+    parser.add_argument('--sql', help="write the batched upsert here")
+    parser.add_argument('--dialect', choices=DIALECTS, default="mysql")
+    parser.add_argument('--batch-rows', type=int, default=500)
+    parser.add_argument('--sqlite', help="apply to this SQLite stand-in")
+    parser.add_argument('--write', action='store_true',
+                        help="also update items.json and items.csv next to it (and the catalog cache)")
+    parser.add_argument('--show', type=int, default=10, help="changes to list")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    lang = load_lang(args.lang)
+    changes, missing = plan_changes(load_items(args.items), lang)
+    elapsed = time.perf_counter() - start
+    print(f"{len(changes)} names changed, {len(missing)} keys without a translation ({elapsed * 1000:.1f} ms)")
+    for change in changes[:args.show]:
+        print(f"  #{change.item_id} {change.key}: {change.old or '(empty)'} -> {change.new}")
+    if len(changes) > args.show:
+        print(f"  ... {len(changes) - args.show} more")
+
+    if args.sql:
+        atomic_write(args.sql, upsert_sql(changes, args.dialect, args.batch_rows).encode('utf-8'))
+        print(f"Wrote {args.sql}")
+    if args.sqlite:
+        from kenkoku.sqlexport import connect_sqlite
+        apply_sqlite(connect_sqlite(args.sqlite), changes)
+        print(f"Applied {len(changes)} names to {args.sqlite}")
+    if args.write:
+        directory = os.path.dirname(os.path.abspath(args.items))
+        paths = [p for p in (os.path.join(directory, 'items.json'), os.path.join(directory, 'items.csv'))
+                 if os.path.exists(p)]
+        for path, count in refresh_files(paths, lang).items():
+            print(f"Updated {count} rows in {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
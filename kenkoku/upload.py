@@ -0,0 +1,420 @@
+# -*- coding: utf-8 -*-
+"""
+Uploader for request_*.json -> kenkoku-manage-service
+Sends every payload over a small pool of keep-alive HTTP connections with
+bounded concurrency:
+
+  - "store" / "patch" / "delete" are sent as POST / PATCH / DELETE with the
+    same body shape as the request files ({"store": [...]} etc.)
+  - large arrays are split into chunks below --max-bytes
+  - stores go first, then patches, then deletes
+  - failed requests (connection errors, 429, 5xx) are retried with
+    exponential backoff; every chunk carries an Idempotency-Key derived from
+    its body, so a retried chunk is recognisable as the same request
+
+Routes default to /api/npcs and /api/lotteries; adjust --npc-path /
+--lottery-path if the service routes differ.
+
+    python -m kenkoku.upload json_data --base-url http://localhost:8000
+    python -m kenkoku.upload --generate --stub      # rehearse against an in-process stub
+    python -m kenkoku.upload json_data --dirty      # only files changed since the last upload
+
+--dirty uses the manifest written by generate_json.py (kenkoku/manifest.py)
+and records each fully uploaded file there.
+
+Payloads are checked with kenkoku.validate (schema and item ids against
+items.json) first; any error stops the upload unless --no-validate is given.
+Then kenkoku.arbitrage searches their trades for profitable loops; a loop
+stops the upload unless --no-arbitrage-check is given.
+"""
+
+import argparse
+import glob
+import hashlib
+import http.client
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+NPC_PATH = '/api/npcs'
+LOTTERY_PATH = '/api/lotteries'
+SECTION_METHODS = (("store", "POST"), ("patch", "PATCH"), ("delete", "DELETE"))
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class UploadJob:
+    """One HTTP request: a chunk of one section of one payload."""
+
+    def __init__(self, name, section, method, path, rows, chunk, chunks):
+        self.name = name
+        self.section = section
+        self.method = method
+        self.path = path
+        self.rows = len(rows)
+        self.chunk = chunk
+        self.chunks = chunks
+        self.body = json.dumps({section: rows}, ensure_ascii=False).encode('utf-8')
+        self.key = hashlib.sha256(method.encode() + path.encode() + self.body).hexdigest()
+
+
+class UploadResult:
+    def __init__(self, job, status, latency, attempts, error=None):
+        self.job = job
+        self.status = status
+        self.latency = latency
+        self.attempts = attempts
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.status is not None and 200 <= self.status < 300
+
+
+# ------------------------------------------------------------
+# Planning
+# ------------------------------------------------------------
+
+def load_payloads(paths):
+    """[(file name, payload)] from request_*.json files and/or directories."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, 'request_*.json'))))
+        else:
+            files.append(path)
+    payloads = []
+    for path in files:
+        with open(path, 'r', encoding='utf-8') as f:
+            payloads.append((os.path.basename(path), json.load(f)))
+    return payloads
+
+
+def dirty_paths(paths):
+    """
+    Request files under paths whose manifest says they were not uploaded yet,
+    as [(manifest dir, file path)]. Files without a manifest entry are skipped.
+    """
+    from kenkoku.manifest import dirty_files
+
+    selected = []
+    for path in paths:
+        if os.path.isdir(path):
+            selected.extend((path, os.path.join(path, name)) for name in sorted(dirty_files(path)))
+        else:
+            directory = os.path.dirname(path) or '.'
+            if os.path.basename(path) in dirty_files(directory):
+                selected.append((directory, path))
+    return selected
+
+
+def chunk_rows(section, rows, max_bytes):
+    """Split rows so each {section: chunk} body stays under max_bytes (one row minimum)."""
+    overhead = len(json.dumps({section: []}).encode('utf-8'))
+    chunks = []
+    current, size = [], overhead
+    for row in rows:
+        row_size = len(json.dumps(row, ensure_ascii=False).encode('utf-8')) + 2  # ", "
+        if current and size + row_size > max_bytes:
+            chunks.append(current)
+            current, size = [], overhead
+        current.append(row)
+        size += row_size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _resource_path(payload, npc_path, lottery_path):
+    for row in payload.get("store", ()):
+        if "rarities" in row:
+            return lottery_path
+    return npc_path
+
+
+def plan_uploads(payloads, max_bytes=256 * 1024, npc_path=NPC_PATH, lottery_path=LOTTERY_PATH):
+    """Return jobs grouped by phase: [[store jobs], [patch jobs], [delete jobs]]."""
+    phases = []
+    for section, method in SECTION_METHODS:
+        jobs = []
+        for name, payload in payloads:
+            rows = payload.get(section) or []
+            if not rows:
+                continue
+            path = _resource_path(payload, npc_path, lottery_path)
+            chunks = chunk_rows(section, rows, max_bytes)
+            for i, chunk in enumerate(chunks, 1):
+                jobs.append(UploadJob(name, section, method, path, chunk, i, len(chunks)))
+        phases.append(jobs)
+    return phases
+
+
+# ------------------------------------------------------------
+# Sending
+# ------------------------------------------------------------
+
+class ConnectionPool:
+    """Fixed-size pool of keep-alive connections to one host."""
+
+    def __init__(self, base_url, size, timeout=30.0):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or 'http'
+        self.host = parts.hostname or 'localhost'
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def _connect(self):
+        with self._lock:
+            self.opened += 1
+        cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=self.timeout)
+
+    def request(self, method, path, body, headers):
+        """Send one request; returns (status, response body). Raises on connection errors."""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                conn.request(method, self.prefix + path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                self._idle.put(conn)
+            return response.status, data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def send_job(pool, job, retries=5, backoff=0.5):
+    headers = {
+        'Content-Type': 'application/json',
+        'Accept': 'application/json',
+        'Idempotency-Key': job.key,
+    }
+    start = time.perf_counter()
+    status, error = None, None
+    for attempt in range(1, retries + 2):
+        try:
+            status, data = pool.request(job.method, job.path, job.body, headers)
+            error = None if 200 <= status < 300 else data[:200].decode('utf-8', 'replace')
+        except (OSError, http.client.HTTPException) as e:
+            status, error = None, str(e)
+        if status is not None and status not in RETRY_STATUSES:
+            break
+        if attempt <= retries:
+            # Exponential backoff with jitter
+            time.sleep(backoff * (2 ** (attempt - 1)) * (0.5 + random.random() / 2))
+    return UploadResult(job, status, time.perf_counter() - start, attempt, error)
+
+
+def upload(phases, base_url, concurrency=4, retries=5, backoff=0.5, timeout=30.0, on_result=None):
+    """Run the phases in order (each phase in parallel). Returns (results, wall seconds, pool)."""
+    pool = ConnectionPool(base_url, concurrency, timeout)
+    results = []
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for jobs in phases:
+                for result in executor.map(lambda j: send_job(pool, j, retries, backoff), jobs):
+                    results.append(result)
+                    if on_result:
+                        on_result(result)
+                if any(not r.ok for r in results):
+                    break  # do not patch/delete on top of a failed store
+    finally:
+        pool.close()
+    return results, time.perf_counter() - start, pool
+
+
+# ------------------------------------------------------------
+# Reporting
+# ------------------------------------------------------------
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def format_result(result):
+    job = result.job
+    status = result.status if result.status is not None else 'ERR'
+    line = (f"  [{job.section:6}] {job.name} {job.chunk}/{job.chunks}  {status}  "
+            f"{result.latency * 1000:7.1f} ms  {len(job.body) / 1024:7.1f} KB  "
+            f"rows={job.rows} attempts={result.attempts}")
+    if result.error:
+        line += f"  ({result.error})"
+    return line
+
+
+def summarize(results, wall):
+    latencies = [r.latency * 1000 for r in results]
+    sent = sum(len(r.job.body) for r in results)
+    wall = wall or 1e-9
+    return {
+        "requests": len(results),
+        "failed": sum(1 for r in results if not r.ok),
+        "rows": sum(r.job.rows for r in results),
+        "bytes": sent,
+        "wall_seconds": wall,
+        "requests_per_second": len(results) / wall,
+        "kb_per_second": sent / 1024 / wall,
+        "latency_ms_p50": _percentile(latencies, 50),
+        "latency_ms_p95": _percentile(latencies, 95),
+        "latency_ms_max": max(latencies, default=0.0),
+    }
+
+
+def _record_uploaded(selected, phases, results):
+    """Mark files whose every planned request succeeded as uploaded."""
+    from kenkoku.manifest import mark_uploaded
+
+    planned, succeeded = {}, {}
+    for jobs in phases:
+        for job in jobs:
+            planned[job.name] = planned.get(job.name, 0) + 1
+    for result in results:
+        if result.ok:
+            succeeded[result.job.name] = succeeded.get(result.job.name, 0) + 1
+    by_dir = {}
+    for directory, path in selected:
+        name = os.path.basename(path)
+        if succeeded.get(name, 0) == planned.get(name, 0):
+            by_dir.setdefault(directory, []).append(name)
+    for directory, names in by_dir.items():
+        mark_uploaded(directory, names)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upload request_*.json to kenkoku-manage-service")
+    parser.add_argument('paths', nargs='*', help="request files or directories (default: json_data)")
+    parser.add_argument('--generate', action='store_true', help="upload freshly generated payloads instead of files")
+    parser.add_argument('--items', help="items.json for --generate and the item id check (default: items.json)")
+    parser.add_argument('--no-validate', action='store_true',
+                        help="upload even if the payloads fail kenkoku.validate's schema / item id checks")
+    parser.add_argument('--no-arbitrage-check', action='store_true',
+                        help="upload even if kenkoku.arbitrage finds a profitable trade loop in the payloads")
+    parser.add_argument('--base-url', default=os.environ.get('KENKOKU_API_URL', 'http://localhost:8000'))
+    parser.add_argument('--npc-path', default=NPC_PATH)
+    parser.add_argument('--lottery-path', default=LOTTERY_PATH)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--max-bytes', type=int, default=256 * 1024, help="max body size per request")
+    parser.add_argument('--retries', type=int, default=5)
+    parser.add_argument('--backoff', type=float, default=0.5, help="initial retry delay in seconds")
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--dry-run', action='store_true', help="only print the planned requests")
+    parser.add_argument('--stub', action='store_true', help="upload to an in-process stub service")
+    parser.add_argument('--json', action='store_true', help="print the summary as JSON")
+    parser.add_argument('--dirty', action='store_true',
+                        help="only upload files the manifest marks as changed since the last upload")
+    args = parser.parse_args(argv)
+    if args.dirty and args.generate:
+        parser.error("--dirty works on request files, not --generate")
+
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = args.paths or [os.path.join(base_dir, 'json_data')]
+    selected = None
+    if args.dirty:
+        selected = dirty_paths(paths)
+        paths = [path for _, path in selected]
+        if not paths:
+            print("Nothing to upload: every request file matches its last upload")
+            return 0
+    if args.generate:
+        from kenkoku.catalog import load_catalog
+        from kenkoku.definitions import DEFINITIONS
+        from kenkoku.generator import build_requests
+        catalog = load_catalog(args.items or os.path.join(base_dir, 'items.json'))
+        payloads = list(build_requests(DEFINITIONS, catalog).items())
+    else:
+        payloads = load_payloads(paths)
+
+    catalog = None
+    items_path = args.items or os.path.join(base_dir, 'items.json')
+    if not (args.no_validate and args.no_arbitrage_check) and os.path.exists(items_path):
+        from kenkoku.catalog import load_catalog
+        catalog = load_catalog(items_path)
+    if not args.no_validate:
+        from kenkoku.validate import validate_payloads
+        errors = validate_payloads(payloads, set(catalog.all_items) if catalog is not None else None)
+        if errors:
+            for error in errors:
+                print(error)
+            print(f"Not uploading: {len(errors)} validation errors (--no-validate to upload anyway)")
+            return 1
+    if not args.no_arbitrage_check:
+        from kenkoku.arbitrage import check_payloads, cycle_names, describe_cycle
+        checked, cycles = check_payloads(payloads, catalog)
+        if cycles:
+            names = cycle_names(cycles, catalog) if catalog is not None else {}
+            for i, cycle in enumerate(cycles, 1):
+                print(f"  #{i} {describe_cycle(cycle, names)}")
+            print(f"Not uploading: {len(cycles)} profitable trade loop(s) in {checked} trades "
+                  f"(--no-arbitrage-check to upload anyway)")
+            return 1
+
+    phases = plan_uploads(payloads, args.max_bytes, args.npc_path, args.lottery_path)
+    total = sum(len(jobs) for jobs in phases)
+    print(f"Planned {total} requests from {len(payloads)} payloads")
+    if args.dry_run:
+        for jobs in phases:
+            for job in jobs:
+                print(f"  [{job.section:6}] {job.method} {job.path} {job.name} "
+                      f"{job.chunk}/{job.chunks} rows={job.rows} {len(job.body) / 1024:.1f} KB")
+        return 0
+
+    server = None
+    base_url = args.base_url
+    if args.stub:
+        from kenkoku.stub_service import start_stub
+        server, _, base_url = start_stub()
+    try:
+        results, wall, pool = upload(phases, base_url, args.concurrency, args.retries,
+                                     args.backoff, args.timeout, on_result=lambda r: print(format_result(r)))
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    summary = summarize(results, wall)
+    summary["connections_opened"] = pool.opened
+    if selected is not None:
+        _record_uploaded(selected, phases, results)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"\n{summary['requests']} requests ({summary['failed']} failed), {summary['rows']} rows, "
+              f"{summary['bytes'] / 1024:.1f} KB in {summary['wall_seconds']:.2f} s "
+              f"over {pool.opened} connections")
+        print(f"  throughput: {summary['requests_per_second']:.1f} req/s, {summary['kb_per_second']:.1f} KB/s")
+        print(f"  latency:    p50 {summary['latency_ms_p50']:.1f} ms, p95 {summary['latency_ms_p95']:.1f} ms, "
+              f"max {summary['latency_ms_max']:.1f} ms")
+    if len(results) < total:
+        print(f"Stopped after a failed phase; {total - len(results)} requests not sent", file=sys.stderr)
+    return 1 if summary["failed"] or len(results) < total else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+Schema and reference validator for request_*.json payloads
+Checks payloads before they reach kenkoku-manage-service, so that a typo
+shows up as an error with its JSON path instead of as a rejected request or a
+broken trade in game:
+
+  schema      store / patch / delete arrays; NPCs with trades / add_trades;
+              lotteries with rarities; every cost and reward holds either
+              price or item_id + quantity. Hand-made files may give the NPC
+              type as "type" instead of "npc_type_id" (both must agree when
+              given together). Unknown fields are errors.
+  references  every item_id, view_item_id and lottery item must exist in
+              items.json; with --npcs, patched / deleted NPC ids and deleted
+              trade ids must exist in that npcs.json snapshot. The ids of all
+              files are collected first and checked as one set difference.
+  duplicates  an NPC name stored by more than one payload
+
+The schema below is plain data, compiled once into nested check functions.
+
+    python -m kenkoku.validate                        # json_data/ (recursively)
+    python -m kenkoku.validate json_data/main/request_shop.json --npcs npcs.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+NPC_TYPE_IDS = (1, 2, 3)
+
+
+# ------------------------------------------------------------
+# Schema
+# ------------------------------------------------------------
+
+class Int:
+    def __init__(self, minimum=None, choices=None, ref=None):
+        self.minimum = minimum
+        self.choices = choices
+        self.ref = ref            # reference kind recorded for the batch checks ('item', 'npc', 'trade')
+
+
+class Num:
+    def __init__(self, minimum=None):
+        self.minimum = minimum
+
+
+class Str:
+    pass
+
+
+class Array:
+    def __init__(self, item, min_items=0):
+        self.item = item
+        self.min_items = min_items
+
+
+class Object:
+    """required / optional: {field: spec}; rules: callables(obj) -> error message or None."""
+
+    def __init__(self, required=None, optional=None, rules=()):
+        self.required = required or {}
+        self.optional = optional or {}
+        self.rules = rules
+
+
+class Switch:
+    """One of two specs, chosen by predicate(value)."""
+
+    def __init__(self, predicate, if_true, if_false):
+        self.predicate = predicate
+        self.if_true = if_true
+        self.if_false = if_false
+
+
+def _cost_shape(obj):
+    if "price" in obj:
+        if "item_id" in obj or "quantity" in obj:
+            return "price cannot be combined with item_id / quantity"
+    elif "item_id" not in obj or "quantity" not in obj:
+        return "expected either price or item_id + quantity"
+    return None
+
+
+def _npc_type(obj):
+    if "npc_type_id" not in obj and "type" not in obj:
+        return "missing npc_type_id (or type)"
+    if "npc_type_id" in obj and "type" in obj and obj["npc_type_id"] != obj["type"]:
+        return f"npc_type_id {obj['npc_type_id']} and type {obj['type']} disagree"
+    return None
+
+
+def _patch_has_changes(obj):
+    return None if len(obj) > 1 else "patch changes nothing besides id"
+
+
+def _request_has_sections(obj):
+    return None if obj else "expected at least one of store / patch / delete"
+
+
+COST = Object(optional={"price": Int(minimum=1), "item_id": Int(ref='item'), "quantity": Int(minimum=1)},
+              rules=(_cost_shape,))
+TRADE = Object(
+    required={"content": Str(), "view_item_id": Int(ref='item'),
+              "costs": Array(COST, min_items=1), "rewards": Array(COST, min_items=1)},
+    optional={"slot": Int(minimum=0)},
+)
+NPC_FIELDS = {"name": Str(), "biome_id": Int(minimum=1), "profession_id": Int(minimum=1),
+              "npc_type_id": Int(choices=NPC_TYPE_IDS), "type": Int(choices=NPC_TYPE_IDS), "level": Int(minimum=1)}
+STORE_NPC = Object(
+    required={"name": Str(), "biome_id": Int(minimum=1), "profession_id": Int(minimum=1),
+              "trades": Array(TRADE, min_items=1)},
+    optional={field: spec for field, spec in NPC_FIELDS.items() if field not in ("name", "biome_id", "profession_id")},
+    rules=(_npc_type,),
+)
+LOTTERY = Object(required={
+    "name": Str(),
+    "rarities": Array(Object(required={"name": Str(), "probability": Num(minimum=0),
+                                       "items": Array(Int(ref='item'))}), min_items=1),
+})
+PATCH_NPC = Object(
+    required={"id": Int(minimum=1, ref='npc')},
+    optional=dict(NPC_FIELDS, trades=Array(TRADE), add_trades=Array(TRADE, min_items=1)),
+    rules=(_patch_has_changes,),
+)
+DELETE = Object(required={"id": Int(minimum=1, ref='npc')},
+                optional={"trade_ids": Array(Int(minimum=1, ref='trade'), min_items=1)})
+REQUEST = Object(
+    optional={"store": Array(Switch(lambda row: isinstance(row, dict) and "rarities" in row, LOTTERY, STORE_NPC)),
+              "patch": Array(PATCH_NPC), "delete": Array(DELETE)},
+    rules=(_request_has_sections,),
+)
+
+
+# ------------------------------------------------------------
+# Compiler
+# ------------------------------------------------------------
+# A compiled check is check(value, path, errors, refs). path is a linked
+# (parent, segment) tuple, only turned into a string for an error; refs
+# collects (kind, id, path) for the batch reference checks.
+
+def _kind(value):
+    return {dict: "object", list: "array", str: "string", bool: "boolean", type(None): "null"}.get(
+        type(value), type(value).__name__)
+
+
+def compile_schema(spec):
+    """Nested check function for a schema spec."""
+    if isinstance(spec, Int):
+        minimum, choices, ref = spec.minimum, spec.choices, spec.ref
+
+        def check(value, path, errors, refs):
+            if type(value) is not int:
+                errors.append((path, f"expected integer, got {_kind(value)}"))
+            elif minimum is not None and value < minimum:
+                errors.append((path, f"{value} is below {minimum}"))
+            elif choices is not None and value not in choices:
+                errors.append((path, f"{value} is not one of {', '.join(map(str, choices))}"))
+            elif ref is not None:
+                refs.append((ref, value, path))
+        return check
+
+    if isinstance(spec, Num):
+        minimum = spec.minimum
+
+        def check(value, path, errors, refs):
+            if type(value) not in (int, float):
+                errors.append((path, f"expected number, got {_kind(value)}"))
+            elif minimum is not None and value < minimum:
+                errors.append((path, f"{value} is below {minimum}"))
+        return check
+
+    if isinstance(spec, Str):
+        def check(value, path, errors, refs):
+            if type(value) is not str:
+                errors.append((path, f"expected string, got {_kind(value)}"))
+            elif not value.strip():
+                errors.append((path, "empty string"))
+        return check
+
+    if isinstance(spec, Array):
+        item, min_items = compile_schema(spec.item), spec.min_items
+
+        def check(value, path, errors, refs):
+            if type(value) is not list:
+                errors.append((path, f"expected array, got {_kind(value)}"))
+                return
+            if len(value) < min_items:
+                errors.append((path, f"expected at least {min_items} element(s)"))
+            for i, element in enumerate(value):
+                item(element, (path, i), errors, refs)
+        return check
+
+    if isinstance(spec, Object):
+        fields = {name: compile_schema(s) for name, s in spec.optional.items()}
+        fields.update((name, compile_schema(s)) for name, s in spec.required.items())
+        required = frozenset(spec.required)
+        rules = spec.rules
+
+        def check(value, path, errors, refs):
+            if type(value) is not dict:
+                errors.append((path, f"expected object, got {_kind(value)}"))
+                return
+            for name, field in value.items():
+                field_check = fields.get(name)
+                if field_check is None:
+                    errors.append(((path, name), "unknown field"))
+                else:
+                    field_check(field, (path, name), errors, refs)
+            missing = required.difference(value)
+            if missing:
+                errors.append((path, "missing " + ", ".join(sorted(missing))))
+            for rule in rules:
+                message = rule(value)
+                if message:
+                    errors.append((path, message))
+        return check
+
+    if isinstance(spec, Switch):
+        predicate, if_true, if_false = spec.predicate, compile_schema(spec.if_true), compile_schema(spec.if_false)
+
+        def check(value, path, errors, refs):
+            (if_true if predicate(value) else if_false)(value, path, errors, refs)
+        return check
+
+    raise TypeError(f"unknown schema node {spec!r}")
+
+
+def format_path(path):
+    """'$.store[0].trades[2].costs[0]' for a linked (parent, segment) path."""
+    parts = []
+    while path is not None:
+        path, segment = path
+        parts.append(f"[{segment}]" if isinstance(segment, int) else f".{segment}")
+    return "$" + "".join(reversed(parts))
+
+
+_check_request = compile_schema(REQUEST)
+
+
+# ------------------------------------------------------------
+# Validation
+# ------------------------------------------------------------
+
+class ValidationError:
+    __slots__ = ('file', 'path', 'message')
+
+    def __init__(self, file, path, message):
+        self.file = file
+        self.path = path
+        self.message = message
+
+    def to_dict(self):
+        return {"file": self.file, "path": self.path, "message": self.message}
+
+    def __str__(self):
+        return f"{self.file}: {self.path}: {self.message}"
+
+
+def request_files(paths):
+    """request_*.json under paths (directories are searched recursively), in sorted order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '**', 'request_*.json'), recursive=True)))
+        else:
+            files.append(path)
+    return files
+
+
+def validate_payloads(payloads, item_ids=None, npc_ids=None, trade_ids=None):
+    """
+    [ValidationError] for [(file name, payload)].
+
+    item_ids / npc_ids / trade_ids: sets of existing ids, or None to skip that
+    reference check.
+    """
+    errors = []
+    refs = []
+    names = {}
+    for filename, payload in payloads:
+        found, found_refs = [], []
+        _check_request(payload, None, found, found_refs)
+        errors.extend(ValidationError(filename, format_path(path), message) for path, message in found)
+        refs.extend((filename, kind, value, path) for kind, value, path in found_refs)
+        if isinstance(payload, dict) and isinstance(payload.get("store"), list):
+            for i, row in enumerate(payload["store"]):
+                if isinstance(row, dict) and isinstance(row.get("name"), str) and "rarities" not in row:
+                    names.setdefault(row["name"], []).append((filename, f"$.store[{i}].name"))
+
+    known = {'item': item_ids, 'npc': npc_ids, 'trade': trade_ids}
+    labels = {'item': "items.json", 'npc': "the npcs snapshot", 'trade': "the npcs snapshot"}
+    for kind, existing in known.items():
+        if existing is None:
+            continue
+        unknown = {value for _, ref_kind, value, _ in refs if ref_kind == kind} - existing
+        if unknown:
+            errors.extend(ValidationError(filename, format_path(path), f"{kind} id {value} is not in {labels[kind]}")
+                          for filename, ref_kind, value, path in refs if ref_kind == kind and value in unknown)
+
+    for name, places in names.items():
+        for filename, path in places[1:]:
+            errors.append(ValidationError(filename, path, f"NPC {name!r} is also stored by {places[0][0]}"))
+    return errors
+
+
+def snapshot_ids(npcs_path):
+    """(npc ids, trade ids) of an npcs.json snapshot."""
+    from kenkoku.jsonstream import iter_array
+
+    npc_ids, trade_ids = set(), set()
+    for npc in iter_array(npcs_path):
+        npc_ids.add(npc["id"])
+        trade_ids.update(trade["id"] for trade in npc.get("trades") or ())
+    return npc_ids, trade_ids
+
+
+def validate_paths(paths, items_path=None, npcs_path=None):
+    """(file count, [ValidationError]) for request files and directories; unreadable files are errors too."""
+    payloads, errors = [], []
+    files = request_files(paths)
+    for path in files:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                payloads.append((path, json.load(f)))
+        except (OSError, ValueError) as e:
+            errors.append(ValidationError(path, "$", f"cannot read: {e}"))
+    item_ids = None
+    if items_path:
+        from kenkoku.catalog import load_catalog
+        item_ids = set(load_catalog(items_path).all_items)
+    npc_ids = trade_ids = None
+    if npcs_path:
+        npc_ids, trade_ids = snapshot_ids(npcs_path)
+    return len(files), errors + validate_payloads(payloads, item_ids, npc_ids, trade_ids)
+
+
+def main(argv=None):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="Validate request_*.json payloads (schema and item references)")
+    parser.add_argument('paths', nargs='*', help="request files or directories (default: json_data)")
+    parser.add_argument('--items', default=os.path.join(base_dir, 'items.json'),
+                        help="items.json the item ids must exist in")
+    parser.add_argument('--no-items', action='store_true', help="skip the item reference check")
+    parser.add_argument('--npcs', metavar='NPCS_JSON', help="also check patch / delete ids against this snapshot")
+    parser.add_argument('--json', action='store_true', help="print the errors as JSON")
+    args = parser.parse_args(argv)
+
+    paths = args.paths or [os.path.join(base_dir, 'json_data')]
+    count, errors = validate_paths(paths, None if args.no_items else args.items, args.npcs)
+    if args.json:
+        print(json.dumps([e.to_dict() for e in errors], ensure_ascii=False, indent=1))
+    else:
+        for error in errors:
+            print(error)
+        print(f"{count} files, {len(errors)} errors")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
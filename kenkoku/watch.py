@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+"""
+Watch mode for generate_json.py --watch
+Keeps the definitions, the items.json catalog and a warm Resolver in memory
+and regenerates on every save of items.json or kenkoku/definitions.py:
+
+  definitions.py   re-executed from source (a syntax error is reported and
+                   the previous definitions are kept); only the request files
+                   whose definitions changed are rebuilt (manifest inputs hash)
+  items.json       reloaded only if its content changed (checked on every
+                   event, so a burst that failed halfway is caught up); only
+                   the files with a lookup that now resolves differently are
+                   rebuilt
+
+Changes are picked up with inotify on Linux (watching the directories, since
+editors save by rename) or by polling stats elsewhere / with --poll, and a
+burst of saves within the debounce window is handled as one change. Output
+files and the manifest are updated exactly like a normal incremental run.
+
+Editing the compiler itself (generator.py, resolver.py, ...) or constants the
+compiler imports at startup (NPC type ids, PAPER_KEY) restarts the process.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+import traceback
+
+from kenkoku.catalog import file_hash, load_catalog
+from kenkoku.manifest import regenerate
+from kenkoku.resolver import Resolver, format_miss
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFINITIONS_PATH = os.path.join(PACKAGE_DIR, 'definitions.py')
+# Code that is imported once: a change to any of these needs a fresh process
+RESTART_SOURCES = ('generator.py', 'resolver.py', 'originals.py', 'catalog.py', 'manifest.py', 'watch.py')
+# Definition constants passed to regenerate() on every run ...
+SETTINGS = {'biome_id': 'BIOME_ID', 'profession_id': 'PROFESSION_ID', 'lottery_ticket_id': 'LOTTERY_TICKET_ID'}
+# ... and the ones kenkoku.generator binds at import
+IMPORTED_CONSTANTS = ('NPC_TYPE_PAWNSHOP', 'NPC_TYPE_SHOP', 'NPC_TYPE_QUEST', 'PAPER_KEY')
+
+DEBOUNCE = 0.03
+MAX_DEBOUNCE = 0.5
+POLL_INTERVAL = 0.05
+
+
+# ------------------------------------------------------------
+# Watchers
+# ------------------------------------------------------------
+
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_DELETE = 0x200
+_IN_EVENT = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """inotify on the parent directories of paths, filtered to paths."""
+
+    def __init__(self, paths):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.paths = {os.path.abspath(p) for p in paths}
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        for directory in sorted({os.path.dirname(p) for p in self.paths}):
+            wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_DELETE)
+            if wd < 0:
+                err = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(err, f"inotify_add_watch {directory} failed")
+            self.dirs[wd] = directory
+
+    def wait(self, timeout=None):
+        """Watched paths changed within timeout seconds (None: block), possibly empty."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        pos = 0
+        while pos < len(data):
+            wd, _, _, length = _IN_EVENT.unpack_from(data, pos)
+            pos += _IN_EVENT.size
+            name = os.fsdecode(data[pos:pos + length].rstrip(b'\0'))
+            pos += length
+            path = os.path.join(self.dirs.get(wd, ''), name)
+            if path in self.paths:
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Stats paths every interval seconds; a change is a new (mtime, size, inode)."""
+
+    def __init__(self, paths, interval=POLL_INTERVAL):
+        self.interval = interval
+        self.stamps = {os.path.abspath(p): None for p in paths}
+        for path in self.stamps:
+            self.stamps[path] = self._stamp(path)
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path, stamp in self.stamps.items():
+                now = self._stamp(path)
+                if now != stamp:
+                    self.stamps[path] = now
+                    changed.add(path)
+            if changed:
+                return changed
+            remaining = self.interval if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return changed
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+def make_watcher(paths, poll=False, interval=POLL_INTERVAL):
+    """InotifyWatcher where available, else a PollingWatcher."""
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError, TypeError):
+            pass
+    return PollingWatcher(paths, interval)
+
+
+def collect(watcher, first, debounce=DEBOUNCE, max_wait=MAX_DEBOUNCE):
+    """first plus everything else changed until debounce seconds pass quietly (at most max_wait)."""
+    changed = set(first)
+    deadline = time.monotonic() + max_wait
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return changed
+        more = watcher.wait(min(debounce, remaining))
+        if not more:
+            return changed
+        changed |= more
+
+
+# ------------------------------------------------------------
+# Session
+# ------------------------------------------------------------
+
+class Restart(Exception):
+    """Raised when a change cannot be applied in this process."""
+
+
+def read_definitions(path=DEFINITIONS_PATH):
+    """Namespace of definitions.py executed from source (not the import cache, so rapid saves are never stale)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    namespace = {'__name__': 'kenkoku.definitions', '__file__': path}
+    exec(compile(source, path, 'exec'), namespace)
+    return namespace
+
+
+class WatchSession:
+    """Definitions, catalog and Resolver kept between regenerations."""
+
+    def __init__(self, items_path, output_dir, summarize, use_cache=True, definitions_path=DEFINITIONS_PATH):
+        self.items_path = items_path
+        self.output_dir = output_dir
+        self.summarize = summarize
+        self.use_cache = use_cache
+        self.definitions_path = definitions_path
+        self.namespace = read_definitions(definitions_path)
+        self.items_hash = file_hash(items_path)
+        self.catalog = load_catalog(items_path, use_cache=use_cache)
+        self.resolver = Resolver(self.catalog)
+        # definitions.py changed but its reload was not attempted yet
+        self.definitions_pending = False
+
+    def reload_definitions(self):
+        """Re-read definitions.py; raises on errors (the old definitions stay) or Restart."""
+        namespace = read_definitions(self.definitions_path)
+        for name in IMPORTED_CONSTANTS:
+            if namespace.get(name) != self.namespace.get(name):
+                raise Restart(f"{name} changed")
+        self.namespace = namespace
+
+    def reload_catalog(self):
+        """Reload items.json if its content changed. Returns True if it did."""
+        digest = file_hash(self.items_path)
+        if digest == self.items_hash:
+            return False
+        self.catalog = load_catalog(self.items_path, use_cache=self.use_cache)
+        self.resolver = Resolver(self.catalog)
+        self.items_hash = digest
+        return True
+
+    def apply(self, changed):
+        """
+        Reload what changed; returns the reasons to regenerate (empty: nothing
+        did). items.json is checked on every call, since that is hash-guarded
+        and cheap, and a definitions.py change stays pending until its reload
+        was attempted, so a burst that fails halfway leaves neither stale.
+        """
+        if self.definitions_path in changed:
+            self.definitions_pending = True
+        reasons = []
+        if self.reload_catalog():
+            reasons.append(os.path.basename(self.items_path))
+        if self.definitions_pending:
+            self.definitions_pending = False
+            self.reload_definitions()
+            reasons.append("definitions.py")
+        return reasons
+
+    def regenerate(self):
+        settings = {arg: self.namespace[name] for arg, name in SETTINGS.items()}
+        return regenerate(self.namespace['DEFINITIONS'], self.items_path, self.output_dir, self.summarize,
+                          use_cache=self.use_cache, catalog=self.catalog, resolver=self.resolver, **settings)
+
+
+def _report(result, seconds, reason, reported):
+    """Print what a run did; misses already in reported (updated in place) are not repeated."""
+    stamp = time.strftime('%H:%M:%S')
+    for miss in result.misses:
+        if miss not in reported:
+            print(format_miss(miss))
+    fixed = reported - set(result.misses)
+    if fixed:
+        print(f"  Resolved now: {', '.join(value for _, value in sorted(fixed))}")
+    reported.clear()
+    reported.update(result.misses)
+    if not result.rebuilt:
+        print(f"[{stamp}] {reason}: up to date ({seconds * 1000:.1f} ms)")
+        return
+    for filename in result.rebuilt:
+        print(result.summaries[filename] if filename in result.written else f"  Rebuilt {filename} (no changes)")
+    print(f"[{stamp}] {reason}: rebuilt {len(result.rebuilt)}, wrote {len(result.written)} "
+          f"({seconds * 1000:.1f} ms)")
+
+
+def _restart(why):
+    print(f"{why}: restarting")
+    sys.stdout.flush()
+    os.execv(sys.executable, sys.orig_argv)
+
+
+def watch(items_path, output_dir, summarize, use_cache=True, poll=False, debounce=DEBOUNCE):
+    """Regenerate output_dir whenever items.json or definitions.py changes, until interrupted."""
+    restart_paths = {os.path.join(PACKAGE_DIR, name) for name in RESTART_SOURCES}
+    paths = {os.path.abspath(items_path), DEFINITIONS_PATH} | restart_paths
+    # Watch first, so a save during the initial build is not missed
+    watcher = make_watcher(paths, poll=poll)
+    try:
+        start = time.perf_counter()
+        session = WatchSession(items_path, output_dir, summarize, use_cache=use_cache)
+        reported = set()
+        _report(session.regenerate(), time.perf_counter() - start, "start", reported)
+        print(f"Watching {items_path} and {DEFINITIONS_PATH} ({type(watcher).__name__}); Ctrl-C to stop")
+        while True:
+            changed = watcher.wait()
+            if not changed:
+                continue
+            start = time.perf_counter()
+            changed = collect(watcher, changed, debounce)
+            if changed & restart_paths:
+                _restart(", ".join(sorted(os.path.basename(p) for p in changed & restart_paths)) + " changed")
+            try:
+                reasons = session.apply(changed)
+                if not reasons:
+                    continue
+                result = session.regenerate()
+            except Restart as e:
+                _restart(str(e))
+            except Exception:
+                # Half-saved or broken input: keep the last good state and wait for the next save
+                traceback.print_exc()
+                print(f"[{time.strftime('%H:%M:%S')}] not regenerated; fix the error and save again")
+                continue
+            _report(result, time.perf_counter() - start, " + ".join(reasons) + " changed", reported)
+    except KeyboardInterrupt:
+        print()
+    finally:
+        watcher.close()
@@ -0,0 +1,16 @@
+import os
+import sqlite3
+import sys
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_ROOT)
+
+from kenkoku.sqlexport import create_standin  # noqa: E402
+
+
+def standin(catalog=None):
+    """In-memory SQLite stand-in (kenkoku.sqlexport schema, items from catalog) with foreign keys on."""
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.execute("PRAGMA foreign_keys = ON")
+    create_standin(conn, catalog)
+    return conn
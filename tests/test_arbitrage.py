@@ -0,0 +1,26 @@
+import os
+
+from conftest import REPO_ROOT
+from kenkoku.arbitrage import MONEY, lottery_edges
+from kenkoku.catalog import load_catalog
+
+CATALOG = load_catalog(os.path.join(REPO_ROOT, 'items.json'))
+DIAMOND = CATALOG.key_to_id["minecraft:diamond"]
+COBBLESTONE = CATALOG.key_to_id["minecraft:cobblestone"]
+
+
+def _lottery(name, item_id):
+    return {"name": name, "rarities": [{"name": "当たり", "probability": 100, "items": [item_id]}]}
+
+
+def test_tickets_are_priced_by_their_own_lottery():
+    pawnshop = {"name": "買取屋", "trades": [
+        {"content": "Buy ダイヤ", "costs": [{"item_id": DIAMOND, "quantity": 1}], "rewards": [{"price": 100}]},
+    ]}
+    # 福引ガチャ tickets name 福引; the first lottery only pays unsellable cobblestone
+    requests = {"request_pawnshop.json": {"store": [pawnshop]},
+                "request_lottery.json": {"store": [_lottery("年末福引", COBBLESTONE), _lottery("福引", DIAMOND)]}}
+    edges = {edge.src: edge for edge in lottery_edges(requests, CATALOG)}
+    assert edges[1532].dst == MONEY and edges[1532].rate == 10 * 100     # 10連
+    assert edges[1533].rate == 100
+    assert all(edge.label.startswith("福引 ") for edge in edges.values())
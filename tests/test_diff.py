@@ -0,0 +1,52 @@
+import os
+
+from conftest import REPO_ROOT
+from kenkoku.catalog import load_catalog
+from kenkoku.definitions import DEFINITIONS
+from kenkoku.diff import diff_requests, load_snapshot
+from kenkoku.generator import build_requests
+
+NPCS_JSON = os.path.join(REPO_ROOT, 'npcs.json')
+
+
+def _generate():
+    incomplete = set()
+    requests = build_requests(DEFINITIONS, load_catalog(os.path.join(REPO_ROOT, 'items.json')), incomplete=incomplete)
+    return requests, incomplete
+
+
+def _deleted_trades(diff):
+    return {trade_id for d in diff["delete"] for trade_id in d.get("trade_ids", ())}
+
+
+def test_missed_lookup_does_not_delete_the_live_trade():
+    # definitions name 鉱夫じゃがいも, the item is 炭鉱夫じゃがいも: the trade is skipped, not removed
+    requests, incomplete = _generate()
+    assert ("name", "お食事処") in incomplete
+    diff = diff_requests(requests, load_snapshot(NPCS_JSON), incomplete=incomplete)
+    assert 87 not in _deleted_trades(diff)
+    assert not any(d["id"] == 16 for d in diff["delete"])
+
+
+def test_complete_npcs_still_get_trade_deletes():
+    requests, incomplete = _generate()
+    snapshot = load_snapshot(NPCS_JSON)
+    i = next(i for i, npc in enumerate(snapshot) if npc["name"] == "雑貨屋")
+    stale = dict(snapshot[i]["trades"][0], id=999999, content="retired trade")
+    snapshot[i] = dict(snapshot[i], trades=snapshot[i]["trades"] + [stale])
+    assert ("name", "雑貨屋") not in incomplete
+    diff = diff_requests(requests, snapshot, incomplete=incomplete)
+    assert 999999 in _deleted_trades(diff)
+
+
+def test_prune_only_deletes_npcs_the_generator_produced():
+    requests, incomplete = _generate()
+    snapshot = load_snapshot(NPCS_JSON)
+    retired = dict(snapshot[0], id=424242, name="retired shop", trades=[])
+    snapshot.append(retired)
+    generated = {npc["name"] for r in requests.values() for npc in r["store"] if "trades" in npc}
+    diff = diff_requests(requests, snapshot, prune_npcs=generated | {"retired shop"}, incomplete=incomplete)
+    deleted = {d["id"] for d in diff["delete"] if "trade_ids" not in d}
+    assert deleted == {424242}
+    # hand-made NPCs (NPC販売, 冬休み終了記念GIFT) are never candidates
+    assert {14, 15}.isdisjoint(deleted)
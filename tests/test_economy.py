@@ -0,0 +1,62 @@
+import os
+
+from conftest import REPO_ROOT
+from kenkoku.catalog import load_catalog
+from kenkoku.definitions import NPC_TYPE_PAWNSHOP, NPC_TYPE_QUEST
+from kenkoku.economy import EconomyParams, _Trades, simulate_economy, ticket_lotteries
+
+CATALOG = load_catalog(os.path.join(REPO_ROOT, 'items.json'))
+TICKET = 1532   # 福引ガチャ (10連), custom_data lotteryName:"福引"
+DIAMOND = CATALOG.key_to_id["minecraft:diamond"]
+COBBLESTONE = CATALOG.key_to_id["minecraft:cobblestone"]
+
+
+def _lottery(name, item_id):
+    return {"name": name, "rarities": [{"name": "当たり", "probability": 100, "items": [item_id]}]}
+
+
+def _requests(*lotteries, quest_reward=None):
+    pawnshop = {"name": "買取屋", "npc_type_id": NPC_TYPE_PAWNSHOP, "trades": [
+        {"content": "Buy ダイヤ", "costs": [{"item_id": DIAMOND, "quantity": 1}], "rewards": [{"price": 100}]},
+    ]}
+    quest = {"name": "クエスト", "npc_type_id": NPC_TYPE_QUEST, "trades": [
+        {"content": "ダイヤ x5", "costs": [{"item_id": DIAMOND, "quantity": 5}],
+         "rewards": [quest_reward or {"item_id": COBBLESTONE, "quantity": 1}]},
+    ]}
+    return {"request_pawnshop.json": {"store": [pawnshop], "patch": []},
+            "request_quest.json": {"store": [quest], "patch": []},
+            "request_lottery.json": {"store": list(lotteries), "patch": []}}
+
+
+def test_tickets_draw_from_the_lottery_they_name():
+    requests = _requests(_lottery("通常福引", COBBLESTONE), _lottery("福引", DIAMOND))
+    assert ticket_lotteries(requests, CATALOG)[TICKET]["name"] == "福引"
+
+
+def test_a_single_lottery_takes_tickets_naming_another():
+    requests = _requests(_lottery("通常福引", COBBLESTONE))
+    assert ticket_lotteries(requests, CATALOG)[TICKET]["name"] == "通常福引"
+    requests = _requests(_lottery("通常福引", COBBLESTONE), _lottery("年末福引", DIAMOND))
+    assert TICKET not in ticket_lotteries(requests, CATALOG)
+
+
+def test_quest_tickets_use_their_own_lottery():
+    requests = _requests(_lottery("年末福引", COBBLESTONE), _lottery("福引", DIAMOND),
+                         quest_reward={"item_id": TICKET, "quantity": 1})
+    trades = _Trades(requests, CATALOG, EconomyParams())
+    assert [table.name for table in trades.lotteries] == ["福引"]
+    assert list(trades.quest_lottery) == [0]
+    # Every draw of 福引 is a diamond, sold at 100
+    result = simulate_economy(requests, CATALOG, EconomyParams(players=500, days=3, seed=1))
+    quests = sum(row["total"] for row in result["top_quests"])
+    assert result["lottery_money"] == quests * 10 * 100
+
+
+def test_quest_costs_are_taken_from_the_player():
+    trades = _Trades(_requests(), CATALOG, EconomyParams())
+    assert list(trades.quest_cost_value) == [500.0]
+    result = simulate_economy(_requests(), CATALOG, EconomyParams(players=500, days=3, seed=1))
+    quests = sum(row["total"] for row in result["top_quests"])
+    assert quests > 0
+    assert result["quest_cost_value"] == quests * 500
+    assert sum(day["quest_costs"] for day in result["daily"]) == result["quest_cost_value"]
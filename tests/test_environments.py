@@ -0,0 +1,31 @@
+import os
+
+from conftest import REPO_ROOT
+from kenkoku.definitions import DEFINITIONS
+from kenkoku.environments import Environment, format_report, generate_all, resolution_differences
+
+ITEMS_JSON = os.path.join(REPO_ROOT, 'items.json')
+
+
+def _summarize(filename, request):
+    return f"  Created {filename}"
+
+
+def test_explicit_paper_id_is_compared_as_a_setting(tmp_path):
+    environments = [Environment("main", ITEMS_JSON, str(tmp_path / "main")),
+                    Environment("staging", ITEMS_JSON, str(tmp_path / "staging"), paper_id=1402)]
+    outcomes = generate_all(environments, DEFINITIONS, _summarize, workers=1)
+    assert [o["error"] for o in outcomes] == [None, None]
+
+    differences = resolution_differences(outcomes)
+    # staging never looks minecraft:paper up, so that is not reported as missing there
+    assert differences == {"setting:paper_id": {"main": 326, "staging": 1402}}
+    report = format_report(outcomes, 0.0, differences)
+    assert "1 lookups resolve differently" in report
+
+
+def test_identical_profiles_have_no_differences(tmp_path):
+    environments = [Environment(name, ITEMS_JSON, str(tmp_path / name)) for name in ("main", "season1")]
+    outcomes = generate_all(environments, DEFINITIONS, _summarize, workers=1)
+    assert resolution_differences(outcomes) == {}
+    assert outcomes[0]["lookups"]["setting:paper_id"] == 326
@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from conftest import REPO_ROOT
+from kenkoku.catalog import load_catalog
+from kenkoku.definitions import DEFINITIONS
+from kenkoku.generator import REQUEST_FILES, build_requests, dump_request
+
+# Output of the original generate_json.py for the repo's items.json, plus what
+# the original item compiler resolves now (attribute specs and seed aliases):
+# the アクセサリー lottery items, the 防具交換所 (無制限) store and the
+# 赤くてデカくなるアレ quest trade
+EXPECTED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'expected')
+
+
+@pytest.fixture(scope='module')
+def requests():
+    return build_requests(DEFINITIONS, load_catalog(os.path.join(REPO_ROOT, 'items.json'), use_cache=False))
+
+
+def test_every_request_file_is_built(requests):
+    assert list(requests) == list(REQUEST_FILES)
+    assert sorted(requests) == sorted(f for f in os.listdir(EXPECTED_DIR) if f.endswith('.json'))
+
+
+@pytest.mark.parametrize('filename', sorted(REQUEST_FILES))
+def test_output_is_byte_identical(requests, filename):
+    with open(os.path.join(EXPECTED_DIR, filename), 'r', encoding='utf-8') as f:
+        expected = f.read()
+    assert dump_request(requests[filename]) == expected
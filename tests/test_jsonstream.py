@@ -0,0 +1,46 @@
+import json
+import os
+
+import pytest
+
+from conftest import REPO_ROOT
+from kenkoku.jsonstream import StreamError, iter_array
+
+
+def _write(tmp_path, text):
+    path = tmp_path / "array.json"
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize("name", ["npcs.json", "items.json"])
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+def test_matches_json_load(name, chunk_size):
+    path = os.path.join(REPO_ROOT, name)
+    with open(path, encoding='utf-8-sig') as f:
+        expected = json.load(f)
+    assert list(iter_array(path, chunk_size=chunk_size)) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    (" [1]", [1]),
+    ("\n\n  \t[ ]", []),
+    ("[ 12 , 345 ,\n6]  ", [12, 345, 6]),
+])
+def test_whitespace_across_chunks(tmp_path, text, expected):
+    path = _write(tmp_path, text)
+    for chunk_size in (1, 2, 3):
+        assert list(iter_array(path, chunk_size=chunk_size)) == expected
+
+
+@pytest.mark.parametrize("text", ["[1,]", "[1, ]", "[,]", "{}", "   ", "[1"])
+def test_rejects_malformed(tmp_path, text):
+    path = _write(tmp_path, text)
+    for chunk_size in (1, 64):
+        with pytest.raises(ValueError):
+            list(iter_array(path, chunk_size=chunk_size))
+
+
+def test_trailing_comma_message(tmp_path):
+    with pytest.raises(StreamError, match="trailing ','"):
+        list(iter_array(_write(tmp_path, "[1,]"), chunk_size=1))
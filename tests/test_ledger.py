@@ -0,0 +1,86 @@
+import glob
+import os
+import sqlite3
+
+import pytest
+
+from conftest import REPO_ROOT
+from kenkoku.ledger import Ledger, sqlite_connector
+from kenkoku.sqlexport import create_standin
+
+ALICE = "00000000-0000-0000-0000-00000000a11c"
+BOB = "00000000-0000-0000-0000-000000000b0b"
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "kenkoku.db")
+    conn = sqlite3.connect(path, isolation_level=None)
+    create_standin(conn)
+    conn.execute("INSERT INTO player_information (player_uuid, money) VALUES (?, 100)", (ALICE,))
+    conn.close()
+    return path
+
+
+def money(path, uuid):
+    conn = sqlite3.connect(path)
+    try:
+        row = conn.execute("SELECT money FROM player_information WHERE player_uuid = ?", (uuid,)).fetchone()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def crash(ledger):
+    # What survives a kill: the journaled ops, but no flush
+    ledger.journal.close()
+    ledger.conn.close()
+
+
+def test_crash_without_flush_replays_on_restart(db, tmp_path):
+    journal = str(tmp_path / "journal")
+    ledger = Ledger(sqlite_connector(db), journal, fsync=False)
+    ledger.submit([{"uuid": ALICE, "delta": -30}, {"uuid": BOB, "set": 50}, {"uuid": BOB, "delta": 5}])
+    crash(ledger)
+    assert money(db, ALICE) == 100
+
+    restarted = Ledger(sqlite_connector(db), journal, fsync=False)
+    assert restarted.stats["recovered"] == 3
+    assert (money(db, ALICE), money(db, BOB)) == (70, 55)
+    assert restarted.pending_ops == 0
+    restarted.close()
+
+    # Nothing is replayed twice
+    again = Ledger(sqlite_connector(db), journal, fsync=False)
+    assert again.stats["recovered"] == 0
+    assert money(db, ALICE) == 70
+    assert len(glob.glob(os.path.join(journal, "*.journal"))) == 1
+    again.close()
+
+
+def test_failed_flush_requeues_the_batch(db, tmp_path):
+    journal = str(tmp_path / "journal")
+    ledger = Ledger(sqlite_connector(db), journal, fsync=False)
+    ledger.submit([{"uuid": ALICE, "delta": -10}, {"uuid": ALICE, "delta": -20}, {"uuid": ALICE, "delta": 5}])
+    ledger.conn.execute("CREATE TEMP TRIGGER fail BEFORE UPDATE ON player_information "
+                        "BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+    with pytest.raises(sqlite3.DatabaseError):
+        ledger.flush()
+    # The ops, not the players, go back on the count
+    assert ledger.pending_ops == 3
+    assert ledger.balance(ALICE) == 75
+    assert money(db, ALICE) == 100
+
+    ledger.submit([{"uuid": ALICE, "delta": 1}])
+    assert ledger.pending_ops == 4
+    ledger.conn.execute("DROP TRIGGER fail")
+    assert ledger.flush() == 1
+    assert money(db, ALICE) == 76
+    assert ledger.pending_ops == 0
+    ledger.close()
+
+    # The retried flush committed every journaled op: a restart has nothing left to replay
+    restarted = Ledger(sqlite_connector(db), journal, fsync=False)
+    assert restarted.stats["recovered"] == 0
+    assert money(db, ALICE) == 76
+    restarted.close()
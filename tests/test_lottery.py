@@ -0,0 +1,26 @@
+import json
+import os
+
+from conftest import REPO_ROOT
+from kenkoku import lottery
+from kenkoku.catalog import load_catalog
+from kenkoku.definitions import DEFINITIONS
+from kenkoku.generator import build_requests
+
+
+def test_export_and_sql_keep_every_lottery(tmp_path):
+    requests = build_requests(DEFINITIONS, load_catalog(os.path.join(REPO_ROOT, 'items.json')))
+    first = requests["request_lottery.json"]["store"][0]
+    second = dict(first, name="年末福引", rarities=first["rarities"][:2])
+    request = tmp_path / "request_lottery.json"
+    request.write_text(json.dumps({"store": [first, second]}, ensure_ascii=False), encoding="utf-8")
+    export, sql = tmp_path / "alias.json", tmp_path / "alias.sql"
+
+    assert lottery.main(["--request", str(request), "--draws", "1000", "--seed", "1", "--json",
+                         "--export", str(export), "--sql", str(sql)]) == 0
+
+    tables = json.loads(export.read_text(encoding="utf-8"))
+    assert [table["lottery"] for table in tables] == [first["name"], "年末福引"]
+    text = sql.read_text(encoding="utf-8")
+    assert text.count("START TRANSACTION;") == 2
+    assert "WHERE name = '年末福引'" in text
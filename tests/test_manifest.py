@@ -0,0 +1,31 @@
+import os
+import shutil
+
+from conftest import REPO_ROOT
+from kenkoku import manifest, resolver
+from kenkoku.definitions import DEFINITIONS
+from kenkoku.manifest import regenerate
+
+ITEMS_JSON = os.path.join(REPO_ROOT, 'items.json')
+
+
+def _summarize(filename, request):
+    return f"  Created {filename}"
+
+
+def test_seed_script_change_rebuilds(tmp_path, monkeypatch):
+    seeds = tmp_path / 'seed-items.sk'
+    shutil.copy(resolver.SEED_SCRIPT, seeds)
+    monkeypatch.setattr(resolver, 'SEED_SCRIPT', str(seeds))
+    monkeypatch.setattr(manifest, 'SEED_SCRIPT', str(seeds))
+    out = str(tmp_path / 'out')
+
+    assert regenerate(DEFINITIONS, ITEMS_JSON, out, _summarize).rebuilt
+    assert regenerate(DEFINITIONS, ITEMS_JSON, out, _summarize).rebuilt == []
+
+    # Without its seed, health_boost_1 no longer resolves to #1492
+    lines = seeds.read_text(encoding='utf-8').splitlines(keepends=True)
+    seeds.write_text("".join(line for line in lines if '"health_boost_1"' not in line), encoding='utf-8')
+    result = regenerate(DEFINITIONS, ITEMS_JSON, out, _summarize)
+    assert 'request_lottery.json' in result.written
+    assert ('name', 'health_boost_1') in result.misses
@@ -0,0 +1,27 @@
+import os
+
+from conftest import REPO_ROOT
+from kenkoku.catalog import load_catalog
+from kenkoku.definitions import DEFINITIONS
+from kenkoku.generator import build_requests
+from kenkoku.resolver import Resolver
+
+
+def test_deduplicated_seed_names_resolve_to_the_kept_original():
+    resolver = Resolver(load_catalog(os.path.join(REPO_ROOT, 'items.json')))
+    # health_boost_1 is never seeded: it is identical to §l体力増強(10)
+    assert resolver.get_id_by_name('health_boost_1') == 1492
+    assert resolver.get_id_by_name('§l体力増強(10)') == 1492
+    assert resolver.stats()['name']['seed_aliases'] == 1
+
+
+def test_definitions_only_miss_what_is_really_missing():
+    resolver = Resolver(load_catalog(os.path.join(REPO_ROOT, 'items.json')))
+    build_requests(DEFINITIONS, resolver.catalog, resolver=resolver)
+    assert [value for kind, value in resolver.misses if kind == 'name'] == ['鉱夫じゃがいも']
+
+
+def test_missing_seed_script_means_no_aliases(tmp_path):
+    resolver = Resolver(load_catalog(os.path.join(REPO_ROOT, 'items.json')),
+                        seed_script=str(tmp_path / 'seed-items.sk'))
+    assert resolver.get_id_by_name('health_boost_1') is None
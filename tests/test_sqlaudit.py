@@ -0,0 +1,32 @@
+import os
+
+from conftest import REPO_ROOT
+from kenkoku.sqlaudit import audit, open_standin, parse_scripts, suggested_indexes
+
+SCRIPTS = os.path.join(REPO_ROOT, 'minecraft_server', 'plugins', 'Skript', 'scripts')
+
+
+def _audit():
+    conn = open_standin()
+    try:
+        return audit(parse_scripts(SCRIPTS), conn)[0]
+    finally:
+        conn.close()
+
+
+def test_probe_indexes_do_not_leak_into_later_plans():
+    # lottery-system.sk:132 repeats the SQL of an earlier statement that was probed
+    # with a temporary index; a cached EXPLAIN used to report that dropped index
+    statements = _audit()
+    stmt = next(s for s in statements if s.where == 'lottery-system.sk:132')
+    assert not any('sqlaudit_' in detail for detail in stmt.plan)
+    assert any(f.kind == "full scan" and f.advice and "lotteries_name" in f.advice for f in stmt.findings)
+
+
+def test_lotteries_name_is_the_top_index_suggestion():
+    statements = _audit()
+    assert not any('sqlaudit_' in detail for s in statements for detail in s.plan)
+    advice, fixed = next(iter(suggested_indexes(statements).items()))
+    assert advice.startswith("CREATE INDEX lotteries_name ")
+    assert {s.where for s in fixed} >= {'lottery-system.sk:132'}
+    assert sum(s.per_hour for s in fixed) == 18010
@@ -0,0 +1,77 @@
+import os
+
+from conftest import REPO_ROOT, standin
+from kenkoku.catalog import load_catalog
+from kenkoku.definitions import DEFINITIONS
+from kenkoku.diff import diff_requests, load_snapshot
+from kenkoku.generator import build_requests
+from kenkoku.snapshot import snapshots_from_db, snapshots_from_export
+from kenkoku.sqlexport import (TABLES, IdState, apply_export, build_export, check_sqlite, export_from_snapshot,
+                               load_sqlite, render_sql, write_tsv)
+
+NOW = '2026-01-01 00:00:00'
+
+
+def _tables(conn):
+    return {table: conn.execute(f"SELECT * FROM {table} ORDER BY id").fetchall() for table in TABLES}
+
+
+def _setup():
+    catalog = load_catalog(os.path.join(REPO_ROOT, 'items.json'))
+    incomplete = set()
+    return catalog, build_requests(DEFINITIONS, catalog, incomplete=incomplete), incomplete
+
+
+def test_rendered_sql_loads_the_same_rows_as_load_sqlite():
+    catalog, requests, _ = _setup()
+    export = build_export(requests, replace=True, now=NOW)
+
+    script = standin(catalog)
+    script.executescript(render_sql(export, dialect="sqlite", batch_rows=7))
+    direct = standin(catalog)
+    load_sqlite(direct, export)
+
+    assert _tables(script) == _tables(direct)
+    assert {table: len(rows) for table, rows in _tables(script).items()} == export.counts()
+    assert check_sqlite(script) == []
+
+
+def test_replace_clears_what_was_loaded_before():
+    catalog, requests, _ = _setup()
+    conn = standin(catalog)
+    load_sqlite(conn, export_from_snapshot(load_snapshot(os.path.join(REPO_ROOT, 'npcs.json'))))
+    export = build_export(requests, replace=True, now=NOW)
+    conn.executescript(render_sql(export, dialect="sqlite"))
+    assert conn.execute("SELECT COUNT(*) FROM npcs").fetchone()[0] == export.counts()["npcs"]
+    assert conn.execute("SELECT MIN(id) FROM npcs").fetchone()[0] == 1
+
+
+def test_diff_appends_after_the_live_rows():
+    catalog, requests, incomplete = _setup()
+    snapshot = load_snapshot(os.path.join(REPO_ROOT, 'npcs.json'))
+    conn = standin(catalog)
+    base = export_from_snapshot(snapshot)
+    load_sqlite(conn, base)
+
+    diff = diff_requests(requests, snapshot, incomplete=incomplete)
+    export = build_export({"request_diff.json": diff}, IdState.from_snapshot(snapshot), now=NOW)
+    conn.executescript(render_sql(export, dialect="sqlite"))
+
+    assert check_sqlite(conn) == []
+    # Hand-made NPCs keep their ids and trades; new rows are numbered after the snapshot
+    names = dict(conn.execute("SELECT id, name FROM npcs"))
+    assert names[14] == "NPC販売" and names[15] == "冬休み終了記念GIFT"
+    assert min(row[0] for row in export.rows["npcs"]) == max(npc["id"] for npc in snapshot) + 1
+    # The snapshot tables built from snapshot + export match the loaded tables
+    built = snapshots_from_export(apply_export(base, export), catalog)
+    assert sorted(built, key=lambda snap: snap["id"]) == snapshots_from_db(conn)
+
+
+def test_tsv_has_one_line_per_row(tmp_path):
+    _, requests, _ = _setup()
+    export = build_export(requests, replace=True, now=NOW)
+    write_tsv(export, str(tmp_path))
+    for table, count in export.counts().items():
+        with open(tmp_path / f"{table}.tsv", encoding='utf-8') as f:
+            assert sum(1 for _ in f) == count
+    assert "DELETE FROM npcs;" in (tmp_path / "load.sql").read_text(encoding='utf-8')
@@ -0,0 +1,53 @@
+import json
+import os
+import shutil
+
+from conftest import REPO_ROOT, standin
+from kenkoku.catalog import load_catalog
+from kenkoku.translation import apply_sqlite, load_items, plan_changes, refresh_files, upsert_sql
+
+ITEMS_JSON = os.path.join(REPO_ROOT, 'items.json')
+LANG = {
+    "item.minecraft.acacia_boat": "アカシアのいかだ",                     # item key
+    "block.minecraft.acacia_button": "アカシアのボタン",                  # unchanged
+    "block.minecraft.acacia_chest_boat": "チェスト付きアカシアのいかだ",  # block fallback
+}
+
+
+def _names(conn, ids):
+    return dict(conn.execute(f"SELECT id, name FROM items WHERE id IN ({', '.join(map(str, ids))})"))
+
+
+def test_only_changed_names_are_planned():
+    changes, missing = plan_changes(load_items(ITEMS_JSON), LANG)
+    assert {(c.item_id, c.old, c.new) for c in changes} == {
+        (1, "アカシアのボート", "アカシアのいかだ"),
+        (2, "チェスト付きのアカシアのボート", "チェスト付きアカシアのいかだ"),
+    }
+    assert "minecraft:acacia_button" not in missing
+    assert "minecraft:stone" in missing
+
+
+def test_sqlite_and_sql_upserts_agree_on_the_standin():
+    changes, _ = plan_changes(load_items(ITEMS_JSON), LANG)
+    catalog = load_catalog(ITEMS_JSON)
+    direct = standin(catalog)
+    apply_sqlite(direct, changes)
+    script = standin(catalog)
+    script.executescript(upsert_sql(changes, dialect="sqlite", batch_rows=1))
+
+    expected = {1: "アカシアのいかだ", 2: "チェスト付きアカシアのいかだ", 477: "アカシアのボタン"}
+    assert _names(direct, expected) == _names(script, expected) == expected
+    # Upserts of existing ids update in place, they add no rows
+    for conn in (direct, script):
+        assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == len(catalog.all_items)
+
+
+def test_refresh_files_rewrites_items_json(tmp_path):
+    path = str(tmp_path / 'items.json')
+    shutil.copy(ITEMS_JSON, path)
+    assert refresh_files([path], LANG) == {path: 2}
+    with open(path, encoding='utf-8') as f:
+        rows = {row['id']: row for row in json.load(f)}
+    assert rows[1]['name'] == "アカシアのいかだ"
+    assert refresh_files([path], LANG) == {path: 0}
@@ -0,0 +1,83 @@
+import json
+import os
+
+from conftest import REPO_ROOT
+from kenkoku import upload
+from kenkoku.catalog import load_catalog
+from kenkoku.definitions import DEFINITIONS
+from kenkoku.generator import build_requests
+from kenkoku.stub_service import start_stub
+
+
+def _shop(buy_price, sell_price, item_id=1):
+    """An NPC selling item_id for buy_price and buying it back for sell_price."""
+    return {"store": [{"name": "loop shop", "npc_type_id": 2, "trades": [
+        {"content": "buy", "view_item_id": item_id, "costs": [{"price": buy_price}],
+         "rewards": [{"item_id": item_id, "quantity": 1}]},
+        {"content": "sell", "view_item_id": item_id, "costs": [{"item_id": item_id, "quantity": 1}],
+         "rewards": [{"price": sell_price}]},
+    ]}], "patch": []}
+
+
+def _write(tmp_path, payload):
+    path = tmp_path / "request_loop.json"
+    path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+def test_profitable_loop_stops_the_upload(tmp_path, capsys):
+    path = _write(tmp_path, _shop(100, 150))
+    assert upload.main([path, "--dry-run", "--no-validate"]) == 1
+    out = capsys.readouterr().out
+    assert "profit x1.5000" in out
+    assert "Not uploading: 1 profitable trade loop(s)" in out
+    assert "Planned" not in out
+
+
+def test_no_arbitrage_check_uploads_anyway(tmp_path, capsys):
+    path = _write(tmp_path, _shop(100, 150))
+    assert upload.main([path, "--dry-run", "--no-validate", "--no-arbitrage-check"]) == 0
+    assert "Planned 1 requests" in capsys.readouterr().out
+
+
+def test_losing_loop_passes(tmp_path, capsys):
+    path = _write(tmp_path, _shop(150, 100))
+    assert upload.main([path, "--dry-run", "--no-validate"]) == 0
+
+
+def _upload_to_stub(payloads, fail_first=0, max_bytes=256 * 1024):
+    server, state, base_url = start_stub(fail_first=fail_first)
+    try:
+        phases = upload.plan_uploads(payloads, max_bytes)
+        results, _, _ = upload.upload(phases, base_url, concurrency=4, retries=5, backoff=0.001, timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return phases, results, state
+
+
+def test_upload_delivers_every_row_to_the_stub():
+    payloads = list(build_requests(DEFINITIONS, load_catalog(os.path.join(REPO_ROOT, 'items.json'))).items())
+    phases, results, state = _upload_to_stub(payloads, max_bytes=2048)
+    assert all(result.ok for result in results)
+    assert len(results) == sum(len(jobs) for jobs in phases) == state.requests
+    for section in ("store", "patch", "delete"):
+        sent = [row for _, payload in payloads for row in payload.get(section, ())]
+        assert sorted(map(json.dumps, state.rows(section))) == sorted(map(json.dumps, sent))
+    # Stores are sent before any patch
+    sections = [section for _, _, section, _ in state.received]
+    assert sections.index("patch") > len(sections) - 1 - sections[::-1].index("store")
+
+
+def test_failed_requests_are_retried_with_the_same_idempotency_key():
+    payloads = [("request_loop.json", _shop(150, 100))]
+    _, results, state = _upload_to_stub(payloads, fail_first=3)
+    assert [result.ok for result in results] == [True]
+    assert results[0].attempts == 4
+    assert state.duplicates == 0 and len(state.rows("store")) == 1
+
+
+def test_main_uploads_to_the_stub(tmp_path, capsys):
+    path = _write(tmp_path, _shop(150, 100))
+    assert upload.main([path, "--stub", "--no-validate", "--backoff", "0.001"]) == 0
+    assert "1 requests (0 failed)" in capsys.readouterr().out
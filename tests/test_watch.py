@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from conftest import REPO_ROOT
+from kenkoku.watch import WatchSession
+
+
+def _summarize(filename, request):
+    return f"  Created {filename}"
+
+
+@pytest.fixture
+def session(tmp_path):
+    items = tmp_path / 'items.json'
+    definitions = tmp_path / 'definitions.py'
+    shutil.copy(os.path.join(REPO_ROOT, 'items.json'), items)
+    shutil.copy(os.path.join(REPO_ROOT, 'kenkoku', 'definitions.py'), definitions)
+    return WatchSession(str(items), str(tmp_path / 'out'), _summarize, definitions_path=str(definitions))
+
+
+def _rename_item(path, item_id, name):
+    with open(path, encoding='utf-8') as f:
+        rows = json.load(f)
+    for row in rows:
+        if row['id'] == item_id:
+            row['name'] = name
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(rows, f, ensure_ascii=False)
+
+
+def test_catalog_is_reloaded_when_definitions_fail_in_the_same_burst(session):
+    good = open(session.definitions_path, encoding='utf-8').read()
+    _rename_item(session.items_path, 1, "renamed boat")
+    with open(session.definitions_path, 'a', encoding='utf-8') as f:
+        f.write("\nDEFINITIONS = {\n")  # half-saved
+    with pytest.raises(SyntaxError):
+        session.apply({session.items_path, session.definitions_path})
+    assert session.catalog.all_items[1]['name'] == "renamed boat"
+
+    # The fix-up save touches only definitions.py
+    with open(session.definitions_path, 'w', encoding='utf-8') as f:
+        f.write(good)
+    assert session.apply({session.definitions_path}) == ["definitions.py"]
+    assert session.catalog.all_items[1]['name'] == "renamed boat"
+
+
+def test_definitions_stay_pending_when_the_catalog_fails(session):
+    with open(session.definitions_path, 'a', encoding='utf-8') as f:
+        f.write("\nBIOME_ID = 7\n")
+    with open(session.items_path, 'w', encoding='utf-8') as f:
+        f.write("[{")  # half-saved
+    with pytest.raises(ValueError):
+        session.apply({session.items_path, session.definitions_path})
+
+    # The fix-up save touches only items.json
+    shutil.copy(os.path.join(REPO_ROOT, 'items.json'), session.items_path)
+    assert session.apply({session.items_path}) == ["definitions.py"]
+    assert session.namespace['BIOME_ID'] == 7
+
+
+def test_unchanged_save_needs_no_regeneration(session):
+    assert session.apply({session.items_path}) == []